@@ -0,0 +1,99 @@
+"""
+Benchmark: clasificador de keywords (urgencia / intención / acción)
+
+Compara el clasificador multi-patrón contra el método anterior
+(tres barridos de `kw in text` por asunto) sobre asuntos sintéticos.
+
+Uso:
+    python benchmarks/bench_keyword_classifier.py
+    python benchmarks/bench_keyword_classifier.py --n 100000 --seed 7
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from learning.keyword_classifier import (
+    KeywordClassifier, URGENCY_KEYWORDS, INTENT_KEYWORDS, ACTION_KEYWORDS
+)
+
+
+FILLER = [
+    'cobertor', 'malla', 'cuartel', 'hileras', 'metros', 'entrega', 'despacho',
+    'fundo', 'sector', 'campo', 'playa', 'stock', 'reunión', 'semana', 'factura',
+    'Re:', 'Fwd:', 'RV:', 'C0000019127', 'COB-001', 'OC-2025-001', '15', '22', '120m'
+]
+
+
+def synthetic_subjects(n: int, seed: int = 42):
+    """Asuntos deterministas: relleno + 0-2 keywords"""
+    rng = random.Random(seed)
+    keywords = [kw for cats in (URGENCY_KEYWORDS, INTENT_KEYWORDS, ACTION_KEYWORDS)
+                for kws in cats.values() for kw in kws]
+    subjects = []
+    for _ in range(n):
+        words = rng.choices(FILLER, k=rng.randint(3, 9))
+        for _ in range(rng.randint(0, 2)):
+            words.insert(rng.randint(0, len(words)), rng.choice(keywords))
+        subject = ' '.join(words)
+        subjects.append(subject.upper() if rng.random() < 0.1 else subject)
+    return subjects
+
+
+def legacy_classify(text: str):
+    """Método anterior: un barrido de substrings por dimensión"""
+    text = text.lower()
+    result = {}
+    for dim, categories, default in (
+        ('urgency', URGENCY_KEYWORDS, 'media'),
+        ('intent', INTENT_KEYWORDS, 'otro'),
+        ('action', ACTION_KEYWORDS, 'crear_tarea'),
+    ):
+        result[dim] = default
+        for label, keywords in categories.items():
+            if any(kw in text for kw in keywords):
+                result[dim] = label
+                break
+    return result
+
+
+def timed(fn, subjects):
+    start = time.perf_counter()
+    results = [fn(s) for s in subjects]
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del clasificador de keywords')
+    parser.add_argument('--n', type=int, default=100_000, help='Cantidad de asuntos')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    subjects = synthetic_subjects(args.n, args.seed)
+
+    start = time.perf_counter()
+    classifier = KeywordClassifier()
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    legacy_s, legacy_results = timed(legacy_classify, subjects)
+    new_s, new_results = timed(classifier.classify, subjects)
+
+    differences = sum(1 for a, b in zip(legacy_results, new_results) if a != b)
+
+    print("=" * 60)
+    print(f"📊 Clasificador de keywords — {args.n:,} asuntos")
+    print("=" * 60)
+    print(f"Compilación:          {compile_ms:8.2f} ms")
+    print(f"Anterior (3 barridos): {legacy_s:8.3f} s  ({args.n / legacy_s:,.0f} asuntos/s)")
+    print(f"Multi-patrón:          {new_s:8.3f} s  ({args.n / new_s:,.0f} asuntos/s)")
+    print(f"Speedup:               {legacy_s / new_s:8.2f}x")
+    print(f"Clasificaciones distintas (falsos positivos de substring corregidos): {differences:,}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark: tiempo de arranque de los puntos de entrada
+
+Importa cada punto de entrada en un intérprete nuevo (como al lanzar el
+CLI o un worker del dashboard) y mide:
+
+- tiempo de import del módulo (mediana y mínimo de N procesos)
+- tiempo total del proceso, incluido el arranque de Python
+- dependencias pesadas cargadas solo por importar
+
+Una dependencia pesada cargada al importar (pandas, openpyxl, PyPDF2,
+google-genai, discovery de Gmail, OAuth) se reporta como regresión: deben
+importarse recién al procesar un adjunto, crear el cliente de Gemini o
+autenticar con Gmail. Con --update se guardan los tiempos en
+benchmarks/baselines.json (sección "arranque") y las corridas siguientes
+se comparan contra ellos.
+
+Uso:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --only email_processor
+    python benchmarks/bench_startup.py --update
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'src')
+BASELINES_PATH = os.path.join(BENCH_DIR, 'baselines.json')
+
+# nombre → (directorio a agregar al path, módulo)
+ENTRY_POINTS = {
+    'email_processor': (SRC_DIR, 'data_processing.email_processor'),
+    'historical_scraper': (SRC_DIR, 'learning.historical_scraper'),
+    'dashboard': (os.path.join(SRC_DIR, 'dashboard'), 'app'),
+}
+
+# No deben cargarse solo por importar un punto de entrada
+HEAVY_MODULES = (
+    'pandas', 'openpyxl', 'PyPDF2', 'google.genai',
+    'googleapiclient.discovery', 'google_auth_oauthlib',
+)
+
+# Diferencias menores que esto son ruido del sistema de archivos / CPU
+SLACK_SECONDS = 0.05
+
+PROBE = """
+import sys, time, json
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'import_s': elapsed,
+                   'pesados': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def probe(name: str, env: dict) -> dict:
+    """Importa un punto de entrada en un proceso nuevo"""
+    path, module = ENTRY_POINTS[name]
+    code = PROBE.format(path=path, module=module, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], env=env, cwd=os.path.dirname(BENCH_DIR),
+                            capture_output=True, text=True)
+    total = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{name}: {result.stderr.strip().splitlines()[-1]}")
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    data['proceso_s'] = total
+    return data
+
+
+def measure(name: str, runs: int, env: dict) -> dict:
+    """
+    Mide un punto de entrada
+
+    Returns:
+        Dict con import_mediana_s, import_min_s, proceso_mediana_s y pesados
+    """
+    # Primera corrida descartada: compila .pyc y calienta la caché de disco
+    probe(name, env)
+    samples = [probe(name, env) for _ in range(runs)]
+    imports = [sample['import_s'] for sample in samples]
+    return {
+        'import_mediana_s': round(statistics.median(imports), 4),
+        'import_min_s': round(min(imports), 4),
+        'proceso_mediana_s': round(statistics.median(s['proceso_s'] for s in samples), 4),
+        'pesados': samples[-1]['pesados'],
+    }
+
+
+def load_baselines() -> dict:
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tiempo de arranque de los puntos de entrada')
+    parser.add_argument('--only', nargs='+', choices=list(ENTRY_POINTS), help='Puntos de entrada a medir')
+    parser.add_argument('--runs', type=int, default=5, help='Procesos por punto de entrada')
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='Variación permitida respecto de la línea base (0.3 = 30%%)')
+    parser.add_argument('--update', action='store_true', help='Guardar los resultados como líneas base')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_startup_')
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(work_dir, 'startup.db')}"
+    env['SIMILARITY_INDEX_PATH'] = os.path.join(work_dir, 'sin_indice.npz')
+    env.pop('MAIL_SOURCE', None)
+
+    baselines = load_baselines().get('arranque', {})
+    names = args.only or list(ENTRY_POINTS)
+    results, problems = {}, []
+
+    print("=" * 78)
+    print(f"🚀 Arranque de puntos de entrada (mediana de {args.runs} procesos)")
+    print("=" * 78)
+    print(f"{'Punto de entrada':<22}{'import (s)':>12}{'mín (s)':>10}{'proceso (s)':>13}  vs base  pesados")
+
+    try:
+        for name in names:
+            result = measure(name, args.runs, env)
+            results[name] = result
+            base = baselines.get(name)
+            delta = f"{result['import_mediana_s'] / base['import_mediana_s'] - 1:+.0%}" if base else '—'
+            print(f"{name:<22}{result['import_mediana_s']:>12.3f}{result['import_min_s']:>10.3f}"
+                  f"{result['proceso_mediana_s']:>13.3f}  {delta:>7}  {', '.join(result['pesados']) or '—'}")
+
+            if result['pesados']:
+                problems.append(f"{name}: importa {', '.join(result['pesados'])} al arrancar")
+            limite = base and max(base['import_mediana_s'] * (1 + args.tolerance),
+                                  base['import_mediana_s'] + SLACK_SECONDS)
+            if limite and result['import_mediana_s'] > limite:
+                problems.append(f"{name}: import {result['import_mediana_s']:.3f}s "
+                                f"> línea base {base['import_mediana_s']:.3f}s (+{args.tolerance:.0%})")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("=" * 78)
+
+    if args.update:
+        data = load_baselines()
+        data.setdefault('arranque', {}).update(results)
+        data['meta'] = {
+            'fecha': datetime.now().strftime('%Y-%m-%d'),
+            'python': platform.python_version(),
+            'maquina': platform.machine(),
+        }
+        with open(BASELINES_PATH, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"💾 Líneas base actualizadas: {BASELINES_PATH}")
+        return 0
+
+    if problems:
+        print("❌ Regresiones detectadas:")
+        for problem in problems:
+            print(f"   - {problem}")
+        return 1
+
+    print("✅ Arranque sin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
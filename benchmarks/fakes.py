@@ -0,0 +1,433 @@
+"""
+Servicios simulados de Gmail y Gemini para pruebas de carga sin red
+
+- FakeGmailService: misma interfaz que el servicio de googleapiclient
+  (users().messages().list/get/modify/batchModify/attachments().get,
+  users().labels().list, users().history().list); se usa envuelto en
+  GmailMailSource, de modo que el backoff y el batching que se prueban
+  son los del código real
+- FakeGeminiClient: misma interfaz que genai.Client
+  (client.models.generate_content)
+
+Ambos sirven respuestas de un cassette grabado (JSON) o sintéticas
+(SyntheticCorpus / StubGeminiClient), con latencia, tasa de errores 5xx
+y tasa de 429 configurables (FaultInjector). Las fallas son
+deterministas para una misma semilla y orden de llamadas.
+
+Grabar un cassette desde una fuente real (Gmail API o MAIL_SOURCE):
+    from fakes import record_mail_cassette
+    record_mail_cassette(GmailClient().authenticate().source, 'cassette.json', limit=200)
+"""
+
+import base64
+import copy
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+import httplib2
+from googleapiclient.errors import HttpError
+from google.genai import errors as genai_errors
+
+from synthetic import SyntheticCorpus, StubGeminiClient, LABEL_ID, LABEL_NAME
+
+
+# =============================================================================
+# INYECCIÓN DE FALLAS
+# =============================================================================
+
+class FaultInjector:
+    """Latencia y errores simulados, compartidos entre hilos"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_after: Optional[int] = None,
+                 seed: int = 42, sleep=time.sleep):
+        """
+        Args:
+            latency: Latencia base por llamada (segundos)
+            jitter: Variación uniforme adicional (segundos)
+            error_rate: Probabilidad de un 503 por llamada
+            rate_limit_rate: Probabilidad de un 429 por llamada
+            retry_after: Segundos de Retry-After en los 429 (None = sin header)
+            seed: Semilla de las fallas
+            sleep: Función de espera
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.calls = Counter()
+        self.injected = Counter()
+
+    def check(self, operacion: str) -> Optional[int]:
+        """
+        Simula la latencia de una llamada y decide si falla
+
+        Returns:
+            Código HTTP de la falla (429 o 503) o None
+        """
+        with self._lock:
+            self.calls[operacion] += 1
+            roll = self._rng.random()
+            delay = self.latency + (self._rng.random() * self.jitter if self.jitter else 0.0)
+            status = None
+            if roll < self.rate_limit_rate:
+                status = 429
+            elif roll < self.rate_limit_rate + self.error_rate:
+                status = 503
+            if status:
+                self.injected[(operacion, status)] += 1
+        if delay:
+            self._sleep(delay)
+        return status
+
+    def summary(self) -> Dict:
+        return {
+            'llamadas': dict(self.calls),
+            'fallas': {f'{op}:{status}': n for (op, status), n in sorted(self.injected.items())},
+        }
+
+
+# =============================================================================
+# GMAIL
+# =============================================================================
+
+def _http_error(status: int, retry_after: Optional[int] = None) -> HttpError:
+    headers = {'status': status}
+    if retry_after is not None:
+        headers['retry-after'] = str(retry_after)
+    if status == 429:
+        error = {'code': 429, 'message': 'Too many concurrent requests for user',
+                 'errors': [{'reason': 'rateLimitExceeded', 'domain': 'usageLimits'}]}
+    else:
+        error = {'code': status, 'message': 'The service is currently unavailable.',
+                 'errors': [{'reason': 'backendError', 'domain': 'global'}]}
+    return HttpError(httplib2.Response(headers), json.dumps({'error': error}).encode('utf-8'))
+
+
+def _not_found(what: str) -> HttpError:
+    content = {'error': {'code': 404, 'message': f'{what} not found',
+                         'errors': [{'reason': 'notFound', 'domain': 'global'}]}}
+    return HttpError(httplib2.Response({'status': 404}), json.dumps(content).encode('utf-8'))
+
+
+class _Request:
+    """Equivalente a googleapiclient.http.HttpRequest"""
+
+    def __init__(self, service: 'FakeGmailService', operacion: str, handler):
+        self._service = service
+        self._operacion = operacion
+        self._handler = handler
+
+    def execute(self, num_retries: int = 0):
+        status = self._service.faults.check(self._operacion)
+        if status:
+            raise _http_error(status, self._service.faults.retry_after if status == 429 else None)
+        with self._service._lock:
+            return self._handler()
+
+
+class _Resource:
+    """Recurso con métodos que devuelven _Request (users(), messages(), ...)"""
+
+    def __init__(self, **methods):
+        self._methods = methods
+
+    def __getattr__(self, name):
+        try:
+            return self._methods[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class FakeGmailService:
+    """
+    Servicio de Gmail en memoria
+
+    Cada evento (llegada de un mensaje, cambio de etiquetas) recibe un
+    historyId; history().list los devuelve como lo hace Gmail. Con
+    `initial` solo llegan los primeros mensajes y el resto se entrega
+    con deliver(), para simular correo que sigue llegando.
+    """
+
+    def __init__(self, messages: Dict[str, Dict], attachments: Dict[str, bytes],
+                 labels: Iterable[Dict] = (), faults: Optional[FaultInjector] = None,
+                 page_size_max: int = 500, initial: Optional[int] = None):
+        """
+        Args:
+            messages: Mensajes format='full' por ID
+            attachments: Datos de adjuntos por attachmentId
+            labels: Etiquetas [{'id', 'name'}]
+            faults: Fallas a inyectar (por defecto ninguna)
+            page_size_max: Máximo de maxResults (Gmail limita a 500)
+            initial: Mensajes presentes al inicio (None = todos)
+        """
+        self.messages = messages
+        self.attachments = attachments
+        self.labels = list(labels) or [{'id': 'INBOX', 'name': 'INBOX'},
+                                       {'id': 'UNREAD', 'name': 'UNREAD'},
+                                       {'id': LABEL_ID, 'name': LABEL_NAME}]
+        self.faults = faults or FaultInjector()
+        self.page_size_max = page_size_max
+        self._lock = threading.RLock()
+        self._order = []
+        self._delivered = set()
+        self._pending = list(messages)
+        self.history = []
+        self.deliver(len(self._pending) if initial is None else initial)
+
+    @classmethod
+    def from_corpus(cls, corpus: SyntheticCorpus, **kwargs) -> 'FakeGmailService':
+        return cls(corpus.messages, corpus.attachments, **kwargs)
+
+    @classmethod
+    def from_cassette(cls, path: str, **kwargs) -> 'FakeGmailService':
+        with open(path, encoding='utf-8') as f:
+            cassette = json.load(f)
+        attachments = {key: base64.urlsafe_b64decode(value)
+                       for key, value in cassette.get('attachments', {}).items()}
+        messages = {message['id']: message for message in cassette['messages']}
+        return cls(messages, attachments, labels=cassette.get('labels', ()), **kwargs)
+
+    # -------------------------------------------------------------------------
+    # Estado
+    # -------------------------------------------------------------------------
+
+    @property
+    def history_id(self) -> str:
+        return str(len(self.history))
+
+    def _record(self, tipo: str, msg_id: str, label_ids: Iterable[str] = ()):
+        message = self.messages[msg_id]
+        event = {'id': str(len(self.history) + 1),
+                 tipo: [{'message': {'id': msg_id, 'threadId': message['threadId'],
+                                     'labelIds': list(message['labelIds'])}}]}
+        if label_ids:
+            event[tipo][0]['labelIds'] = list(label_ids)
+        self.history.append(event)
+
+    def deliver(self, count: int) -> int:
+        """Entrega mensajes pendientes (llegan al buzón y a history().list)"""
+        with self._lock:
+            arrived, self._pending = self._pending[:count], self._pending[count:]
+            for msg_id in arrived:
+                self._order.append(msg_id)
+                self._delivered.add(msg_id)
+                self._record('messagesAdded', msg_id)
+            return len(arrived)
+
+    def _visible(self, query: str):
+        ids = self._order
+        if 'is:unread' in query:
+            ids = [i for i in ids if 'UNREAD' in self.messages[i]['labelIds']]
+        if 'label:' in query:
+            names = {label['name'].lower(): label['id'] for label in self.labels}
+            for token in query.split():
+                if token.startswith('label:'):
+                    label_id = names.get(token[6:].lower(), token[6:])
+                    ids = [i for i in ids if label_id in self.messages[i]['labelIds']]
+        return ids
+
+    def _apply_labels(self, msg_id: str, body: Dict):
+        if msg_id not in self._delivered:
+            raise _not_found(f'Message {msg_id}')
+        message = self.messages[msg_id]
+        add, remove = body.get('addLabelIds') or [], body.get('removeLabelIds') or []
+        message['labelIds'] = sorted((set(message['labelIds']) | set(add)) - set(remove))
+        if add:
+            self._record('labelsAdded', msg_id, add)
+        if remove:
+            self._record('labelsRemoved', msg_id, remove)
+        return {'id': msg_id, 'threadId': message['threadId'], 'labelIds': message['labelIds']}
+
+    # -------------------------------------------------------------------------
+    # Interfaz de googleapiclient
+    # -------------------------------------------------------------------------
+
+    def users(self):
+        return _Resource(
+            messages=lambda: _Resource(
+                list=self._list, get=self._get, modify=self._modify,
+                batchModify=self._batch_modify,
+                attachments=lambda: _Resource(get=self._attachment),
+            ),
+            labels=lambda: _Resource(list=self._labels),
+            history=lambda: _Resource(list=self._history),
+        )
+
+    def _list(self, userId='me', q='', maxResults=100, pageToken=None, **kwargs):
+        def handler():
+            ids = self._visible(q or '')
+            size = min(maxResults, self.page_size_max)
+            start = int(pageToken or 0)
+            page = ids[start:start + size]
+            response = {'resultSizeEstimate': len(ids)}
+            if page:
+                response['messages'] = [{'id': i, 'threadId': self.messages[i]['threadId']} for i in page]
+            if start + size < len(ids):
+                response['nextPageToken'] = str(start + size)
+            return response
+        return _Request(self, 'list', handler)
+
+    def _get(self, userId='me', id=None, format='full', **kwargs):
+        def handler():
+            if id not in self._delivered:
+                raise _not_found(f'Message {id}')
+            return copy.deepcopy(self.messages[id])
+        return _Request(self, 'get', handler)
+
+    def _modify(self, userId='me', id=None, body=None):
+        return _Request(self, 'modify', lambda: self._apply_labels(id, body or {}))
+
+    def _batch_modify(self, userId='me', body=None):
+        body = body or {}
+
+        def handler():
+            ids = body.get('ids') or []
+            if len(ids) > 1000:
+                raise HttpError(httplib2.Response({'status': 400}), b'{"error": {"code": 400}}')
+            for msg_id in ids:
+                self._apply_labels(msg_id, body)
+            return ''
+        return _Request(self, 'batch_modify', handler)
+
+    def _attachment(self, userId='me', messageId=None, id=None):
+        def handler():
+            if id not in self.attachments:
+                raise _not_found(f'Attachment {id}')
+            data = self.attachments[id]
+            return {'size': len(data), 'data': base64.urlsafe_b64encode(data).decode('ascii')}
+        return _Request(self, 'attachment', handler)
+
+    def _labels(self, userId='me'):
+        return _Request(self, 'labels', lambda: {'labels': list(self.labels)})
+
+    def _history(self, userId='me', startHistoryId=None, historyTypes=None, labelId=None,
+                 maxResults=100, pageToken=None):
+        def handler():
+            start = int(pageToken or startHistoryId or 0)
+            events = self.history[start:]
+            if historyTypes:
+                types = [historyTypes] if isinstance(historyTypes, str) else historyTypes
+                events = [event for event in events if any(t in event for t in types)]
+            if labelId:
+                events = [event for event in events
+                          if any(labelId in item['message']['labelIds']
+                                 for key, items in event.items() if key != 'id' for item in items)]
+            page = events[:maxResults]
+            response = {'historyId': self.history_id}
+            if page:
+                response['history'] = page
+            if len(events) > maxResults:
+                response['nextPageToken'] = page[-1]['id']
+            return response
+        return _Request(self, 'history', handler)
+
+
+def record_mail_cassette(source, path: str, query: str = '', limit: int = 200,
+                         include_attachments: bool = True) -> int:
+    """
+    Graba mensajes de una MailSource (Gmail API, mbox, ...) a un cassette JSON
+
+    Args:
+        source: MailSource de origen
+        path: Archivo destino
+        query: Query de Gmail
+        limit: Máximo de mensajes
+        include_attachments: Descargar también los adjuntos
+
+    Returns:
+        Mensajes grabados
+    """
+    messages, attachments = [], {}
+    page_token = None
+    while len(messages) < limit:
+        response = source.list_messages(query, page_token, min(500, limit - len(messages)))
+        for item in response.get('messages', []):
+            message = source.get_message(item['id'])
+            messages.append(message)
+            if include_attachments:
+                stack = [message['payload']]
+                while stack:
+                    part = stack.pop()
+                    stack.extend(part.get('parts', []))
+                    attachment_id = part.get('body', {}).get('attachmentId')
+                    if attachment_id and part.get('filename'):
+                        attachments[attachment_id] = source.get_attachment(item['id'], attachment_id)['data']
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'messages': messages, 'attachments': attachments,
+                   'labels': source.list_labels()}, f, ensure_ascii=False)
+    return len(messages)
+
+
+# =============================================================================
+# GEMINI
+# =============================================================================
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha1(prompt.encode('utf-8')).hexdigest()
+
+
+class FakeGeminiClient(StubGeminiClient):
+    """
+    Cliente de Gemini simulado con fallas
+
+    Reproduce la respuesta grabada para el mismo prompt si existe en el
+    cassette; si no, genera una sintética (StubGeminiClient).
+    """
+
+    def __init__(self, faults: Optional[FaultInjector] = None, cassette: Optional[str] = None):
+        super().__init__()
+        self.faults = faults or FaultInjector()
+        self.responses = {}
+        if cassette:
+            with open(cassette, encoding='utf-8') as f:
+                self.responses = json.load(f)
+
+    def generate_content(self, model: str, contents: str, **kwargs):
+        status = self.faults.check('gemini')
+        if status == 429:
+            raise genai_errors.ClientError(429, {'error': {
+                'code': 429, 'message': 'Resource has been exhausted (e.g. check quota).',
+                'status': 'RESOURCE_EXHAUSTED'}})
+        if status:
+            raise genai_errors.ServerError(status, {'error': {
+                'code': status, 'message': 'The model is overloaded. Please try again later.',
+                'status': 'UNAVAILABLE'}})
+
+        recorded = self.responses.get(prompt_key(contents))
+        if recorded is not None:
+            self.calls += 1
+            return super()._response(contents, recorded)
+        return super().generate_content(model, contents, **kwargs)
+
+
+class RecordingGeminiClient:
+    """Envuelve un genai.Client real y guarda cada respuesta por prompt"""
+
+    def __init__(self, client, path: str):
+        self.client = client
+        self.path = path
+        self.responses = {}
+        self.models = self
+
+    def generate_content(self, model: str, contents: str, **kwargs):
+        response = self.client.models.generate_content(model=model, contents=contents, **kwargs)
+        self.responses[prompt_key(contents)] = response.text
+        return response
+
+    def save(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.responses, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,241 @@
+"""
+Prueba de carga offline: EmailProcessor (y opcionalmente HistoricalScraper)
+contra Gmail y Gemini simulados (benchmarks/fakes.py)
+
+Varios hilos procesan el mismo buzón simulado, con latencia, errores 503
+y 429 inyectados, y se verifica al final que:
+- cada email quedó en un estado final, sin tareas ni adjuntos repetidos
+  (un email procesado por dos workers duplicaría ambos)
+- ningún email quedó sin leer en el buzón
+- los re-intentos con backoff absorbieron las fallas inyectadas
+
+Modos:
+- inline: cada hilo ejecuta process_new_emails (compiten vía _claim_email)
+- cola:   un hilo captura a cola_trabajos y el resto ejecuta process_queue
+
+El backoff real (GMAIL_BACKOFF_SECONDS / GEMINI_BACKOFF_SECONDS) se reduce
+por defecto a 0.05 / 0.1 s para que la prueba sea corta; exportarlos para
+probar con los valores de producción.
+
+Uso:
+    python benchmarks/load_test.py --emails 1000 --workers 8
+    python benchmarks/load_test.py --mode cola --rate-limit-rate 0.1 --gemini-latency 0.5
+    python benchmarks/load_test.py --cassette cassette.json --historico
+"""
+
+import os
+import sys
+import io
+import time
+import atexit
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from contextlib import redirect_stdout
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+WORK_DIR = tempfile.mkdtemp(prefix='load_test_')
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+
+os.environ.setdefault('GMAIL_BACKOFF_SECONDS', '0.05')
+os.environ.setdefault('GEMINI_BACKOFF_SECONDS', '0.1')
+os.environ['SIMILARITY_INDEX_PATH'] = os.path.join(WORK_DIR, 'sin_indice.npz')
+os.environ['ATTACHMENTS_DIR'] = os.path.join(WORK_DIR, 'adjuntos')
+os.environ.pop('MAIL_SOURCE', None)
+
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'src'))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Prueba de carga con Gmail y Gemini simulados')
+    parser.add_argument('--emails', type=int, default=500, help='Mensajes del corpus sintético')
+    parser.add_argument('--cassette', help='Cassette de Gmail grabado (en vez del corpus sintético)')
+    parser.add_argument('--gemini-cassette', help='Respuestas grabadas de Gemini')
+    parser.add_argument('--mode', choices=['inline', 'cola'], default='inline')
+    parser.add_argument('--workers', type=int, default=4, help='Hilos de procesamiento')
+    parser.add_argument('--batch', type=int, default=50, help='Emails por ciclo de cada hilo')
+    parser.add_argument('--gmail-latency', type=float, default=0.02, help='Segundos por llamada a Gmail')
+    parser.add_argument('--gemini-latency', type=float, default=0.2, help='Segundos por llamada a Gemini')
+    parser.add_argument('--error-rate', type=float, default=0.02, help='Probabilidad de 503 por llamada')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.05, help='Probabilidad de 429 por llamada')
+    parser.add_argument('--retry-after', type=int, help='Retry-After de los 429 de Gmail (segundos)')
+    parser.add_argument('--historico', action='store_true', help='Ejecutar también HistoricalScraper')
+    parser.add_argument('--timeout', type=float, default=600, help='Tiempo máximo (segundos)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', help='BD a usar (por defecto SQLite temporal)')
+    parser.add_argument('--verbose', action='store_true', help='Mostrar logs del pipeline')
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ['DATABASE_URL'] = ARGS.database_url or f"sqlite:///{os.path.join(WORK_DIR, 'load.db')}"
+
+from sqlalchemy import func
+
+from fakes import FakeGmailService, FakeGeminiClient, FaultInjector
+from synthetic import SyntheticCorpus
+from gmail_capture.gmail_client import GmailClient
+from gmail_capture.mail_source import GmailMailSource
+from data_processing.gpt_parser import GeminiParser
+from data_processing.email_processor import EmailProcessor
+from database.connection import db_manager, session_scope
+from database.email_states import FINAL_STATUSES
+from database.models import ArchivoAdjunto, EmailProcesado, Tarea
+from database import work_queue
+from monitoring.metrics import API_RETRIES, GMAIL_ERRORS
+
+
+def build_processor(service, gemini):
+    return EmailProcessor(
+        gmail_client=GmailClient(GmailMailSource(service)).authenticate(),
+        gpt_parser=GeminiParser(client=gemini)
+    )
+
+
+def loop(name, cycle, stop, errors):
+    """Ejecuta ciclos hasta stop; sin trabajo espera un poco antes de reintentar"""
+    try:
+        while not stop.is_set():
+            stats = cycle()
+            if not (stats.get('emails_procesados') or stats.get('emails_encolados')):
+                stop.wait(0.1)
+    except Exception as e:
+        errors.append(f"{name}: {e}")
+
+
+def progress():
+    with session_scope() as session:
+        return session.query(func.count(EmailProcesado.id)).filter(
+            EmailProcesado.status.in_(FINAL_STATUSES)
+        ).scalar()
+
+
+def run_pipeline(service, gemini, total):
+    processors = [build_processor(service, gemini) for _ in range(ARGS.workers + (ARGS.mode == 'cola'))]
+    stop = threading.Event()
+    errors = []
+
+    if ARGS.mode == 'inline':
+        targets = [(f'inline-{i}', lambda p=p: p.process_new_emails(ARGS.batch))
+                   for i, p in enumerate(processors)]
+    else:
+        capture, workers = processors[0], processors[1:]
+        targets = [('captura', lambda: capture.capture_to_queue(ARGS.batch))] + [
+            (f'worker-{i}', lambda p=p, i=i: p.process_queue(ARGS.batch, worker_id=f'worker-{i}'))
+            for i, p in enumerate(workers)
+        ]
+
+    threads = [threading.Thread(target=loop, args=(name, cycle, stop, errors), name=name)
+               for name, cycle in targets]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    done, last_change, last_done = 0, time.perf_counter(), -1
+    while time.perf_counter() - start < ARGS.timeout:
+        time.sleep(0.5)
+        done = progress()
+        if done != last_done:
+            last_done, last_change = done, time.perf_counter()
+        if done >= total or time.perf_counter() - last_change > 30:
+            break
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    for processor in processors:
+        if processor.learner:
+            processor.learner.flush()
+    return elapsed, done, errors
+
+
+def report_pipeline(service, elapsed, done, total, errors):
+    with session_scope() as session:
+        estados = dict(session.query(EmailProcesado.status, func.count(EmailProcesado.id))
+                       .group_by(EmailProcesado.status).all())
+        # Un email con adjuntos crea una tarea por registro (pueden repetirse
+        # entre adjuntos): ahí el duplicado es el mismo adjunto dos veces
+        con_adjuntos = session.query(ArchivoAdjunto.email_id)
+        duplicados = session.query(Tarea.email_id).filter(~Tarea.email_id.in_(con_adjuntos)).group_by(
+            Tarea.email_id
+        ).having(func.count(Tarea.id) > 1).count() + session.query(ArchivoAdjunto.email_id).group_by(
+            ArchivoAdjunto.email_id, ArchivoAdjunto.filename
+        ).having(func.count(ArchivoAdjunto.id) > 1).count()
+        cola = work_queue.queue_stats(session) if ARGS.mode == 'cola' else None
+
+    sin_leer = sum(1 for msg_id in service._order if 'UNREAD' in service.messages[msg_id]['labelIds'])
+
+    print(f"⏱️ {done}/{total} emails terminados en {elapsed:.1f}s ({done / elapsed:.1f} emails/s)")
+    print(f"📊 Estados: {estados}")
+    if cola:
+        print(f"📥 Cola: {cola}")
+    print(f"🔁 Emails con tareas o adjuntos repetidos (duplicados): {duplicados}")
+    print(f"📭 Sin leer en el buzón simulado: {sin_leer}")
+    for thread_error in errors:
+        print(f"❌ {thread_error}")
+    return done >= total and duplicados == 0 and sin_leer == 0 and not errors
+
+
+def run_historico(service):
+    from learning.historical_scraper import HistoricalScraper
+
+    start = time.perf_counter()
+    scraper = HistoricalScraper(months=6, workers=1, source=GmailMailSource(service))
+    stats = scraper.run_full_analysis()
+    return stats, time.perf_counter() - start
+
+
+def main():
+    if not ARGS.verbose:
+        logging.disable(logging.WARNING)
+    db_manager.initialize()
+
+    gmail_faults = FaultInjector(ARGS.gmail_latency, ARGS.gmail_latency / 2, ARGS.error_rate,
+                                 ARGS.rate_limit_rate, ARGS.retry_after, seed=ARGS.seed)
+    gemini_faults = FaultInjector(ARGS.gemini_latency, ARGS.gemini_latency / 2, ARGS.error_rate,
+                                  ARGS.rate_limit_rate, seed=ARGS.seed + 1)
+
+    if ARGS.cassette:
+        service = FakeGmailService.from_cassette(ARGS.cassette, faults=gmail_faults)
+    else:
+        service = FakeGmailService.from_corpus(SyntheticCorpus(ARGS.emails, seed=ARGS.seed),
+                                               faults=gmail_faults)
+    gemini = FakeGeminiClient(gemini_faults, ARGS.gemini_cassette)
+    total = len(service.messages)
+
+    print("=" * 70)
+    print(f"🧪 Prueba de carga: {total} emails, modo {ARGS.mode}, {ARGS.workers} workers")
+    print(f"   Gmail {ARGS.gmail_latency * 1000:.0f} ms, Gemini {ARGS.gemini_latency * 1000:.0f} ms, "
+          f"503 {ARGS.error_rate:.0%}, 429 {ARGS.rate_limit_rate:.0%}")
+    print("=" * 70)
+
+    output = sys.stdout if ARGS.verbose else io.StringIO()
+    with redirect_stdout(output):
+        elapsed, done, errors = run_pipeline(service, gemini, total)
+    ok = report_pipeline(service, elapsed, done, total, errors)
+
+    if ARGS.historico:
+        with redirect_stdout(output):
+            stats, elapsed = run_historico(service)
+        print(f"📚 Histórico: {stats['emails_analyzed']} emails en {elapsed:.1f}s, "
+              f"{stats['senders_identified']} remitentes, {stats['rules_generated']} reglas")
+        ok = ok and stats['emails_analyzed'] > 0
+
+    print(f"🌩️ Gmail: {gmail_faults.summary()}")
+    print(f"🌩️ Gemini: {gemini_faults.summary()}")
+    retries = {f"{labels['api']}:{labels['codigo']}": int(value) for labels, value in API_RETRIES.series()}
+    agotados = {labels['operacion']: int(value) for labels, value in GMAIL_ERRORS.series()}
+    print(f"🔁 Re-intentos: {retries}")
+    print(f"⚠️ Llamadas a Gmail fallidas tras re-intentos: {agotados}")
+    print("=" * 70)
+    print("✅ Prueba de carga OK" if ok else "❌ Prueba de carga con problemas")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""
+Suite de benchmarks del pipeline con corpus sintético
+
+Mide throughput (unidades/s, mejor de N repeticiones) y memoria pico
+(tracemalloc, en una corrida aparte) de:
+
+- extract_body:       mime.walk_payload (texto, HTML y adjuntos en una pasada)
+- mime_anidado:       walk_payload sobre reenvíos anidados 12 niveles, la mitad
+                      solo HTML (conversión HTML → texto)
+- adjunto_xlsx/csv/pdf: AttachmentProcessor.process_file
+- gemini_postproceso: GeminiParser.parse_email_text con Gemini simulado
+                      (prompt, limpieza del JSON y normalización)
+- email_processor:    EmailProcessor.process_new_emails de punta a punta
+                      (fuente sintética, Gemini simulado, SQLite temporal)
+- historico_analisis: HistoricalScraper (detalles + análisis + tiempos de
+                      respuesta, sin guardar perfiles)
+
+y compara contra benchmarks/baselines.json: una caída de throughput o
+un aumento de memoria mayor que --tolerance se reporta como regresión
+(código de salida 1). Las líneas base dependen de la máquina; regenerarlas
+con --update al cambiar de equipo.
+
+Uso:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --only email_processor --scale 2
+    python benchmarks/run_benchmarks.py --update
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import random
+import logging
+import atexit
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINES_PATH = os.path.join(BENCH_DIR, 'baselines.json')
+WORK_DIR = tempfile.mkdtemp(prefix='bench_')
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+
+# Diferencias de memoria menores que esto son ruido del intérprete
+MEMORY_SLACK_KB = 64
+
+# Nunca tocar la BD real ni el índice de similitud del proyecto
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORK_DIR, 'bench.db')}"
+os.environ['SIMILARITY_INDEX_PATH'] = os.path.join(WORK_DIR, 'sin_indice.npz')
+os.environ['ATTACHMENTS_DIR'] = os.path.join(WORK_DIR, 'adjuntos_descargados')
+os.environ.pop('MAIL_SOURCE', None)
+
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'src'))
+
+from synthetic import SyntheticCorpus, SyntheticMailSource, StubGeminiClient, write_attachments, nest_payload
+from gmail_capture.gmail_client import GmailClient
+from gmail_capture.mime import walk_payload
+from data_processing.attachment_processor import AttachmentProcessor
+from data_processing.gpt_parser import GeminiParser
+from database.connection import db_manager
+
+
+# =============================================================================
+# CASOS
+# =============================================================================
+# Cada caso recibe n (ya escalado) y un contador de corridas, y retorna
+# (run, unidades): run() ejecuta el trabajo medido. El setup no se mide.
+
+def case_extract_body(n, corrida):
+    corpus = SyntheticCorpus(n, seed=1, attachment_ratio=0.3)
+    payloads = [message['payload'] for message in corpus.messages.values()]
+
+    def run():
+        for payload in payloads:
+            walk_payload(payload)
+    return run, n
+
+
+def case_mime_anidado(n, corrida):
+    corpus = SyntheticCorpus(n, seed=6, attachment_ratio=0.5)
+    payloads = [nest_payload(message['payload'], depth=12, html_only=i % 2 == 1)
+                for i, message in enumerate(corpus.messages.values())]
+
+    def run():
+        for payload in payloads:
+            assert walk_payload(payload)['body_text']
+    return run, n
+
+
+def _case_attachment(tipo):
+    def case(n, corrida):
+        paths = write_attachments(os.path.join(WORK_DIR, f'adjuntos_{tipo}_{corrida}'), n,
+                                  seed=2, tipos=(tipo,))[tipo]
+        processor = AttachmentProcessor()
+
+        def run():
+            for path in paths:
+                processor.process_file(path)
+        return run, n
+    return case
+
+
+def case_gemini(n, corrida):
+    corpus = SyntheticCorpus(n, seed=3, attachment_ratio=0)
+    client = GmailClient(SyntheticMailSource(corpus))
+    emails = [client.get_email(msg_id) for msg_id in corpus.messages]
+    parser = GeminiParser(client=StubGeminiClient())
+
+    def run():
+        for email in emails:
+            parser.parse_email_text(email['body_text'], email['subject'])
+    return run, n
+
+
+def case_email_processor(n, corrida):
+    from data_processing.email_processor import EmailProcessor
+
+    corpus = SyntheticCorpus(n, seed=4, id_prefix=f'ep{corrida}-')
+    processor = EmailProcessor(
+        gmail_client=GmailClient(SyntheticMailSource(corpus)).authenticate(),
+        gpt_parser=GeminiParser(client=StubGeminiClient())
+    )
+
+    def run():
+        stats = processor.process_new_emails(max_emails=n)
+        if processor.learner:
+            processor.learner.flush()
+        assert stats['emails_procesados'] == n, stats
+    return run, n
+
+
+def case_historico(n, corrida):
+    from learning.historical_scraper import HistoricalScraper
+
+    corpus = SyntheticCorpus(n, seed=5, attachment_ratio=0.1)
+    source = SyntheticMailSource(corpus)
+
+    def run():
+        scraper = HistoricalScraper(months=6, workers=1, source=source)
+        scraper._query = 'after:2026/01/01'
+        page_token = None
+        while True:
+            response = scraper._list_page(page_token)
+            scraper._analyze_emails([
+                scraper._get_email_details(msg['id']) for msg in response.get('messages', [])
+            ])
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        scraper.aggregate.compute_response_times()
+        scraper.session.close()
+    return run, n
+
+
+# nombre → (función, n base, unidad)
+CASES = {
+    'extract_body': (case_extract_body, 5000, 'emails'),
+    'mime_anidado': (case_mime_anidado, 2000, 'emails'),
+    'adjunto_xlsx': (_case_attachment('xlsx'), 20, 'archivos'),
+    'adjunto_csv': (_case_attachment('csv'), 80, 'archivos'),
+    'adjunto_pdf': (_case_attachment('pdf'), 80, 'archivos'),
+    'gemini_postproceso': (case_gemini, 4000, 'emails'),
+    'email_processor': (case_email_processor, 200, 'emails'),
+    'historico_analisis': (case_historico, 10000, 'emails'),
+}
+
+
+# =============================================================================
+# MEDICIÓN
+# =============================================================================
+
+def measure(name, scale=1.0, repeat=5):
+    """
+    Mide un caso
+
+    Returns:
+        Dict con n, unidad, mejor_s, ops_por_s y memoria_pico_kb
+    """
+    case, base_n, unidad = CASES[name]
+    n = max(int(base_n * scale), 1)
+
+    # Descartar la salida por consola del código medido
+    with redirect_stdout(io.StringIO()):
+        tiempos = []
+        for corrida in range(repeat):
+            run, unidades = case(n, corrida)
+            start = time.perf_counter()
+            run()
+            tiempos.append(time.perf_counter() - start)
+
+        run, unidades = case(n, repeat)
+        tracemalloc.start()
+        run()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    mejor = min(tiempos)
+    return {
+        'n': unidades,
+        'unidad': unidad,
+        'mejor_s': round(mejor, 4),
+        'ops_por_s': round(unidades / mejor, 1),
+        'memoria_pico_kb': round(pico / 1024, 1),
+    }
+
+
+def compare(name, result, baseline, tolerance):
+    """Regresiones de un caso contra su línea base (lista de mensajes)"""
+    if not baseline:
+        return []
+    problems = []
+    if result['ops_por_s'] < baseline['ops_por_s'] * (1 - tolerance):
+        problems.append(
+            f"{name}: throughput {result['ops_por_s']:,.1f} {result['unidad']}/s "
+            f"< línea base {baseline['ops_por_s']:,.1f} (-{tolerance:.0%})"
+        )
+    limite_kb = max(baseline['memoria_pico_kb'] * (1 + tolerance), baseline['memoria_pico_kb'] + MEMORY_SLACK_KB)
+    if result['memoria_pico_kb'] > limite_kb:
+        problems.append(
+            f"{name}: memoria pico {result['memoria_pico_kb']:,.0f} KB "
+            f"> línea base {baseline['memoria_pico_kb']:,.0f} KB (+{tolerance:.0%})"
+        )
+    return problems
+
+
+def load_baselines():
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks del pipeline con corpus sintético')
+    parser.add_argument('--only', nargs='+', choices=list(CASES), help='Casos a ejecutar')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplicador del tamaño de cada caso')
+    parser.add_argument('--repeat', type=int, default=5, help='Repeticiones (se reporta la mejor)')
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='Variación permitida respecto de la línea base (0.3 = 30%%)')
+    parser.add_argument('--update', action='store_true', help='Guardar los resultados como líneas base')
+    args = parser.parse_args()
+
+    random.seed(0)
+    logging.disable(logging.WARNING)
+    db_manager.initialize()
+
+    baselines = load_baselines()
+    names = args.only or list(CASES)
+    results, problems = {}, []
+
+    print("=" * 78)
+    print(f"📊 Benchmarks del pipeline (escala {args.scale}, mejor de {args.repeat})")
+    print("=" * 78)
+    print(f"{'Caso':<22}{'n':>7}{'mejor (s)':>12}{'unidades/s':>14}{'pico (KB)':>12}  vs base")
+
+    for name in names:
+        result = measure(name, args.scale, args.repeat)
+        results[name] = result
+        base = baselines.get('casos', {}).get(name)
+        delta = f"{result['ops_por_s'] / base['ops_por_s'] - 1:+.0%}" if base else '—'
+        print(f"{name:<22}{result['n']:>7}{result['mejor_s']:>12.3f}"
+              f"{result['ops_por_s']:>14,.1f}{result['memoria_pico_kb']:>12,.0f}  {delta}")
+        if args.scale == 1.0:
+            problems.extend(compare(name, result, base, args.tolerance))
+
+    print("=" * 78)
+
+    if args.update:
+        baselines.setdefault('casos', {}).update(results)
+        baselines['meta'] = {
+            'fecha': datetime.now().strftime('%Y-%m-%d'),
+            'python': platform.python_version(),
+            'maquina': platform.machine(),
+        }
+        with open(BASELINES_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"💾 Líneas base actualizadas: {BASELINES_PATH}")
+        return 0
+
+    if problems:
+        print("❌ Regresiones detectadas:")
+        for problem in problems:
+            print(f"   - {problem}")
+        return 1
+
+    if args.scale != 1.0:
+        print("ℹ️ Con --scale distinto de 1 no se compara contra las líneas base")
+    else:
+        print("✅ Sin regresiones respecto de las líneas base")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
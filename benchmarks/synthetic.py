@@ -0,0 +1,489 @@
+"""
+Corpus sintético determinista para benchmarks
+
+Genera, a partir de una semilla:
+- mensajes en el formato de messages.get(format='full') de la Gmail API,
+  con partes anidadas (mixed → related → alternative), cuerpos en base64
+  url-safe y adjuntos referenciados por attachmentId
+- hilos con respuestas internas (In-Reply-To / References) para el
+  análisis histórico
+- adjuntos Excel, CSV y PDF con el formato que espera AttachmentProcessor
+- un cliente de Gemini simulado (misma interfaz que genai.Client) que
+  responde JSON sin red
+
+Uso:
+    from synthetic import SyntheticCorpus, SyntheticMailSource, StubGeminiClient
+    corpus = SyntheticCorpus(1000, seed=42)
+    client = GmailClient(SyntheticMailSource(corpus)).authenticate()
+"""
+
+import base64
+import io
+import json
+import os
+import random
+import re
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from gmail_capture.mail_source import MailSource
+
+
+LABEL_NAME = os.getenv('GMAIL_LABEL', 'bot-cobertores')
+LABEL_ID = 'Label_bench'
+INTERNAL_DOMAIN = os.getenv('INTERNAL_DOMAIN', '@usach.cl').lstrip('@')
+START_DATE = datetime(2026, 1, 5, 8, 0)
+
+CLIENT_DOMAINS = ['agricola-sur.cl', 'frutas-del-valle.cl', 'exportadora-maule.cl',
+                  'fundo-los-robles.cl', 'gmail.com', 'viveros-central.cl']
+FIRST_NAMES = ['Juan', 'María', 'Pedro', 'Camila', 'Jorge', 'Valentina', 'Luis', 'Francisca']
+LAST_NAMES = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva']
+INTERNAL_USERS = ['produccion', 'bodega', 'ventas', 'operaciones', 'jefe.taller']
+
+SUBJECTS = [
+    'Solicitud cobertor cuartel {cuartel}',
+    'URGENTE: cobertor roto en sector {cuartel}',
+    'Pedido {codigo} - {hileras} hileras',
+    'Cotización malla antigranizo {largo}m',
+    'Confirmación despacho {codigo}',
+    'Re: Reparación cobertores fundo',
+    'Fwd: Orden de compra {codigo}',
+    'Consulta stock malla raschel',
+    'Reporte trabajos realizados semana',
+    'Reclamo: entrega atrasada {codigo}',
+]
+BODY_LINES = [
+    'Estimados, junto con saludar solicito cobertor para el cuartel {cuartel}.',
+    'Son {hileras} hileras de {largo} metros cada una.',
+    'El código del pedido es {codigo}.',
+    'Favor confirmar fecha de entrega a la brevedad.',
+    'Adjunto planilla con el detalle de los cuarteles.',
+    'La malla quedó dañada después del temporal del fin de semana.',
+    'Necesitamos el despacho antes del viernes.',
+    'Quedo atento a sus comentarios.',
+    'Prioridad: {prioridad}',
+]
+SIGNATURE = '\n--\n{nombre}\n{empresa}\nEnviado desde mi iPhone'
+QUOTE = '\n\nEl {fecha}, {nombre} escribió:\n> ' + '\n> '.join(BODY_LINES[:4])
+
+PRIORIDADES = ['NORMAL', 'NORMAL', 'ALTA', 'URGENTE', 'BAJA']
+ATTACHMENT_TYPES = ('xlsx', 'csv', 'pdf')
+MIME_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'pdf': 'application/pdf',
+}
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def _fields(rng: random.Random) -> Dict:
+    return {
+        'cuartel': rng.randint(1, 60),
+        'hileras': rng.randint(4, 40),
+        'largo': rng.choice([80, 95.5, 120, 145.5, 160, 210]),
+        'codigo': rng.choice(['COB-{:03d}', 'C00000{:05d}', 'OC-2026-{:03d}']).format(rng.randint(1, 999)),
+        'prioridad': rng.choice(PRIORIDADES),
+    }
+
+
+# =============================================================================
+# ADJUNTOS
+# =============================================================================
+
+def _rows(rng: random.Random, n_rows: int) -> Dict[str, list]:
+    fields = [_fields(rng) for _ in range(n_rows)]
+    return {
+        'Código': [f['codigo'] for f in fields],
+        'Cuartel': [str(f['cuartel']) for f in fields],
+        'Hileras': [f['hileras'] for f in fields],
+        'Largo (m)': [f['largo'] for f in fields],
+        'Prioridad': [f['prioridad'] for f in fields],
+    }
+
+
+def make_xlsx(rng: random.Random, n_rows: int = 50) -> bytes:
+    buffer = io.BytesIO()
+    pd.DataFrame(_rows(rng, n_rows)).to_excel(buffer, index=False, engine='openpyxl')
+    return buffer.getvalue()
+
+
+def make_csv(rng: random.Random, n_rows: int = 50) -> bytes:
+    return pd.DataFrame(_rows(rng, n_rows)).to_csv(index=False).encode('utf-8')
+
+
+def make_pdf(rng: random.Random, pages: int = 2, lines_per_page: int = 40) -> bytes:
+    """PDF mínimo (Helvetica, texto ASCII) legible por PyPDF2"""
+    def escape(text):
+        return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None,
+               '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for _ in range(pages):
+        lines = []
+        for _ in range(lines_per_page):
+            f = _fields(rng)
+            lines.append(f"Cuartel {f['cuartel']} - {f['hileras']} hileras de {f['largo']} m - "
+                         f"codigo {f['codigo']} - prioridad {f['prioridad']}")
+        content = 'BT /F1 10 Tf 40 800 Td 12 TL ' + ''.join(f'({escape(l)}) Tj T* ' for l in lines) + 'ET'
+        objects.append(f'<< /Length {len(content)} >>\nstream\n{content}\nendstream')
+        content_ref = len(objects)
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                       f'/Contents {content_ref} 0 R /Resources << /Font << /F1 3 0 R >> >> >>')
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1'))
+    xref = out.tell()
+    out.write(f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('latin-1'))
+    for offset in offsets:
+        out.write(f'{offset:010d} 00000 n \n'.encode('latin-1'))
+    out.write(f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('latin-1'))
+    return out.getvalue()
+
+
+ATTACHMENT_MAKERS = {'xlsx': make_xlsx, 'csv': make_csv, 'pdf': make_pdf}
+
+
+def write_attachments(directory: str, per_type: int, seed: int = 42,
+                      tipos=ATTACHMENT_TYPES) -> Dict[str, List[str]]:
+    """
+    Escribe adjuntos de cada tipo en un directorio
+
+    Args:
+        directory: Directorio destino
+        per_type: Archivos por tipo
+        seed: Semilla
+        tipos: Tipos a generar ('xlsx', 'csv', 'pdf')
+
+    Returns:
+        Dict tipo → rutas
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for tipo in tipos:
+        paths[tipo] = []
+        for i in range(per_type):
+            path = os.path.join(directory, f'bench_{i:04d}.{tipo}')
+            with open(path, 'wb') as f:
+                f.write(ATTACHMENT_MAKERS[tipo](rng))
+            paths[tipo].append(path)
+    return paths
+
+
+# =============================================================================
+# MENSAJES (formato de la Gmail API)
+# =============================================================================
+
+class SyntheticCorpus:
+    """
+    Buzón sintético: mensajes 'full' por ID y datos de adjuntos
+
+    Los mensajes se agrupan en hilos de 1 a 4 mensajes; las respuestas
+    vienen del dominio interno y citan el mensaje anterior.
+    """
+
+    def __init__(self, n: int, seed: int = 42, attachment_ratio: float = 0.3,
+                 id_prefix: str = 'syn', attachment_rows: int = 20):
+        """
+        Args:
+            n: Número de mensajes
+            seed: Semilla (mismo seed → mismo corpus)
+            attachment_ratio: Fracción de mensajes con adjuntos
+            id_prefix: Prefijo de los IDs (distintos prefijos → IDs distintos)
+            attachment_rows: Filas por planilla adjunta
+        """
+        self.rng = random.Random(seed)
+        self.attachment_ratio = attachment_ratio
+        self.attachment_rows = attachment_rows
+        self.messages: Dict[str, Dict] = {}
+        self.attachments: Dict[str, bytes] = {}
+        self._attachment_cache: Dict[str, bytes] = {}
+
+        date = START_DATE
+        thread = None
+        for i in range(n):
+            msg_id = f'{id_prefix}{i:07x}'
+            if thread is None or self.rng.random() < 0.45 or len(thread['ids']) >= 4:
+                thread = {'id': msg_id, 'ids': [], 'fields': _fields(self.rng), 'client': self._person()}
+            date += timedelta(minutes=self.rng.randint(3, 240))
+            self.messages[msg_id] = self._message(msg_id, thread, date)
+            thread['ids'].append(msg_id)
+
+    def _person(self, internal: bool = False) -> Dict:
+        nombre = f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+        if internal:
+            return {'nombre': nombre, 'email': f"{self.rng.choice(INTERNAL_USERS)}@{INTERNAL_DOMAIN}",
+                    'empresa': 'Cobertores'}
+        domain = self.rng.choice(CLIENT_DOMAINS)
+        user = nombre.lower().replace(' ', '.').encode('ascii', 'ignore').decode()
+        return {'nombre': nombre, 'email': f'{user}@{domain}', 'empresa': domain.split('.')[0]}
+
+    def _body(self, fields: Dict, person: Dict, quote: Optional[Dict]) -> str:
+        lines = self.rng.sample(BODY_LINES, self.rng.randint(3, len(BODY_LINES)))
+        text = '\n'.join(line.format(**fields) for line in lines)
+        text += SIGNATURE.format(**person)
+        if quote:
+            text += QUOTE.format(fecha=quote['fecha'], nombre=quote['nombre'], **fields)
+        return text
+
+    @staticmethod
+    def _html(text: str) -> str:
+        paragraphs = ''.join(f'<p>{line}</p>' for line in text.split('\n') if line)
+        return (f'<html><head><style>p{{margin:0}}</style></head>'
+                f'<body><div dir="ltr">{paragraphs}</div></body></html>')
+
+    @staticmethod
+    def _text_part(part_id: str, mime_type: str, text: str) -> Dict:
+        data = text.encode('utf-8')
+        return {
+            'partId': part_id,
+            'mimeType': mime_type,
+            'filename': '',
+            'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; charset="UTF-8"'}],
+            'body': {'size': len(data), 'data': _b64(data)},
+        }
+
+    def _attachment_part(self, msg_id: str, part_id: str, tipo: str, index: int) -> Dict:
+        # Se reutiliza un archivo por tipo (generar xlsx domina el tiempo de setup)
+        if tipo not in self._attachment_cache:
+            self._attachment_cache[tipo] = ATTACHMENT_MAKERS[tipo](self.rng, self.attachment_rows) \
+                if tipo != 'pdf' else make_pdf(self.rng)
+        data = self._attachment_cache[tipo]
+        attachment_id = f'att-{msg_id}-{index}'
+        self.attachments[attachment_id] = data
+        filename = f'detalle_{msg_id}_{index}.{tipo}'
+        return {
+            'partId': part_id,
+            'mimeType': MIME_TYPES[tipo],
+            'filename': filename,
+            'headers': [
+                {'name': 'Content-Type', 'value': f'{MIME_TYPES[tipo]}; name="{filename}"'},
+                {'name': 'Content-Disposition', 'value': f'attachment; filename="{filename}"'},
+            ],
+            'body': {'attachmentId': attachment_id, 'size': len(data)},
+        }
+
+    def _message(self, msg_id: str, thread: Dict, date: datetime) -> Dict:
+        reply = bool(thread['ids'])
+        fields = thread['fields']
+        if reply and self.rng.random() < 0.6:
+            sender = self._person(internal=True)
+        else:
+            sender = thread['client']
+        quote = {'fecha': date.strftime('%d-%m-%Y'), 'nombre': thread['client']['nombre']} if reply else None
+
+        subject = self.rng.choice(SUBJECTS).format(**fields)
+        if reply:
+            subject = 'Re: ' + subject
+        text = self._body(fields, sender, quote)
+
+        headers = [
+            {'name': 'From', 'value': f'"{sender["nombre"]}" <{sender["email"]}>'},
+            {'name': 'To', 'value': f'ventas@{INTERNAL_DOMAIN}'},
+            {'name': 'Subject', 'value': subject},
+            {'name': 'Date', 'value': format_datetime(date)},
+            {'name': 'Message-ID', 'value': f'<{msg_id}@bench.local>'},
+        ]
+        if reply:
+            previous = thread['ids'][-1]
+            headers.append({'name': 'In-Reply-To', 'value': f'<{previous}@bench.local>'})
+            headers.append({'name': 'References',
+                            'value': ' '.join(f'<{ref}@bench.local>' for ref in thread['ids'])})
+        if self.rng.random() < 0.3:
+            headers.append({'name': 'Cc', 'value': f'bodega@{INTERNAL_DOMAIN}'})
+
+        alternative = {
+            'partId': '0',
+            'mimeType': 'multipart/alternative',
+            'filename': '',
+            'headers': [],
+            'body': {'size': 0},
+            'parts': [self._text_part('0.0', 'text/plain', text),
+                      self._text_part('0.1', 'text/html', self._html(text))],
+        }
+
+        n_attachments = 0
+        if self.rng.random() < self.attachment_ratio:
+            n_attachments = self.rng.randint(1, 3)
+        if n_attachments:
+            body = alternative
+            if self.rng.random() < 0.3:
+                # Firma con imagen inline: mixed → related → alternative
+                body = {'partId': '0', 'mimeType': 'multipart/related', 'filename': '',
+                        'headers': [], 'body': {'size': 0}, 'parts': [alternative]}
+            parts = [body] + [
+                self._attachment_part(msg_id, str(i + 1), self.rng.choice(ATTACHMENT_TYPES), i)
+                for i in range(n_attachments)
+            ]
+            payload = {'partId': '', 'mimeType': 'multipart/mixed', 'filename': '',
+                       'headers': headers, 'body': {'size': 0}, 'parts': parts}
+        else:
+            payload = {**alternative, 'partId': '', 'headers': headers}
+
+        return {
+            'id': msg_id,
+            'threadId': thread['id'],
+            'labelIds': ['INBOX', 'UNREAD', LABEL_ID],
+            'snippet': text[:100],
+            'internalDate': str(int(date.timestamp() * 1000)),
+            'sizeEstimate': len(text) * 3,
+            'payload': payload,
+        }
+
+
+def _without_plain(part: Dict) -> Dict:
+    if 'parts' not in part:
+        return part
+    parts = [_without_plain(sub) for sub in part['parts'] if sub.get('mimeType') != 'text/plain']
+    return {**part, 'parts': parts}
+
+
+def nest_payload(payload: Dict, depth: int, html_only: bool = False) -> Dict:
+    """
+    Envuelve un payload en `depth` niveles multipart (como una cadena de
+    reenvíos con firmas): cada nivel es mixed → related con una imagen
+    inline y un adjunto chico con los datos inline (body.data)
+
+    Args:
+        payload: Payload de un mensaje del corpus (no se modifica)
+        depth: Niveles de anidamiento
+        html_only: Quitar las partes text/plain (emails solo HTML)
+
+    Returns:
+        Payload nuevo con el cuerpo original en el nivel más profundo
+    """
+    inner = _without_plain(payload) if html_only else payload
+    inner = {**inner, 'headers': []}
+    image = _b64(b'\x89PNG\r\n\x1a\n' + bytes(64))
+    for level in range(depth):
+        logo = {
+            'partId': f'{level}.1', 'mimeType': 'image/png', 'filename': f'logo_{level}.png',
+            'headers': [{'name': 'Content-ID', 'value': f'<logo{level}@bench.local>'},
+                        {'name': 'Content-Disposition', 'value': f'inline; filename="logo_{level}.png"'}],
+            'body': {'size': 72, 'attachmentId': f'att-logo-{level}'},
+        }
+        firma = {
+            'partId': f'{level}.2', 'mimeType': 'image/png', 'filename': f'firma_{level}.png',
+            'headers': [{'name': 'Content-Disposition', 'value': f'attachment; filename="firma_{level}.png"'}],
+            'body': {'size': 72, 'data': image},
+        }
+        related = {'partId': f'{level}', 'mimeType': 'multipart/related', 'filename': '',
+                   'headers': [], 'body': {'size': 0}, 'parts': [inner, logo]}
+        inner = {'partId': '', 'mimeType': 'multipart/mixed', 'filename': '',
+                 'headers': [], 'body': {'size': 0}, 'parts': [related, firma]}
+    return {**inner, 'headers': payload.get('headers', [])}
+
+
+class SyntheticMailSource(MailSource):
+    """MailSource en memoria sobre un SyntheticCorpus"""
+
+    def __init__(self, corpus: SyntheticCorpus):
+        self.corpus = corpus
+        self._order = list(corpus.messages)
+
+    def list_messages(self, query='', page_token=None, max_results=500):
+        ids = self._order
+        if 'is:unread' in query:
+            ids = [i for i in ids if 'UNREAD' in self.corpus.messages[i]['labelIds']]
+        start = int(page_token or 0)
+        page = ids[start:start + max_results]
+        response = {'messages': [{'id': i, 'threadId': self.corpus.messages[i]['threadId']} for i in page],
+                    'resultSizeEstimate': len(ids)}
+        if start + max_results < len(ids):
+            response['nextPageToken'] = str(start + max_results)
+        return response
+
+    def get_message(self, msg_id):
+        return self.corpus.messages[msg_id]
+
+    def get_attachment(self, msg_id, attachment_id):
+        data = self.corpus.attachments[attachment_id]
+        return {'data': _b64(data), 'size': len(data)}
+
+    def modify(self, msg_id, add_labels=(), remove_labels=()):
+        message = self.corpus.messages[msg_id]
+        labels = (set(message['labelIds']) | set(add_labels)) - set(remove_labels)
+        message['labelIds'] = sorted(labels)
+        return {'id': msg_id, 'labelIds': message['labelIds']}
+
+    def list_labels(self):
+        return [{'id': 'INBOX', 'name': 'INBOX'}, {'id': 'UNREAD', 'name': 'UNREAD'},
+                {'id': LABEL_ID, 'name': LABEL_NAME}]
+
+    def __len__(self):
+        return len(self._order)
+
+
+# =============================================================================
+# GEMINI SIMULADO
+# =============================================================================
+
+_FIELD_RES = {
+    'codigo_cobertor': re.compile(r'\b(COB-\d+|C0{3,}\d+|OC-\d{4}-\d+)\b'),
+    'cuartel': re.compile(r'cuartel (\d+)', re.IGNORECASE),
+    'hileras': re.compile(r'(\d+) hileras', re.IGNORECASE),
+    'largo_metros': re.compile(r'(\d+(?:\.\d+)?) ?m(?:etros)?\b', re.IGNORECASE),
+}
+
+
+class StubGeminiClient:
+    """
+    Cliente con la interfaz de genai.Client (client.models.generate_content)
+
+    Extrae los campos del prompt con expresiones regulares y responde un
+    JSON como el de Gemini (a veces dentro de un bloque ```json, como hace
+    el modelo real). Sin red; `latency` simula el tiempo de respuesta.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, model: str, contents: str, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        # Solo asunto y contenido (el resto del prompt trae ejemplos de códigos)
+        email = contents.split('**ASUNTO:**')[-1].split('**TU TAREA:**')[0]
+        data = {}
+        for field, pattern in _FIELD_RES.items():
+            match = pattern.search(email)
+            data[field] = match.group(1) if match else None
+        urgent = re.search(r'URGENTE|ALTA', email)
+        data['prioridad'] = 'alta' if urgent else 'normal'
+        data['descripcion'] = 'Solicitud de cobertor'
+        data['notas'] = None
+
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+        if zlib.crc32(contents.encode('utf-8')) % 3 == 0:
+            text = f'```json\n{text}\n```'
+        return self._response(contents, text)
+
+    @staticmethod
+    def _response(contents: str, text: str):
+        """Respuesta con .text y .usage_metadata (tokens estimados)"""
+        usage = SimpleNamespace(prompt_token_count=len(contents) // 4,
+                                candidates_token_count=len(text) // 4,
+                                thoughts_token_count=0)
+        return SimpleNamespace(text=text, usage_metadata=usage)
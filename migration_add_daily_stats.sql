@@ -0,0 +1,20 @@
+-- ============================================
+-- MIGRACIÓN: Rollup diario para tendencias
+-- Base de datos: bot_cobertores (EXISTENTE)
+-- Fecha: 2026-10-19
+-- ============================================
+--
+-- Después de crear la tabla, poblarla con:
+--     python scripts/backfill_daily_stats.py
+
+USE bot_cobertores;
+
+CREATE TABLE IF NOT EXISTS daily_stats (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    fecha DATE NOT NULL,
+    metrica VARCHAR(50) NOT NULL,
+    clave VARCHAR(255) NOT NULL DEFAULT '',
+    cantidad INT DEFAULT 0,
+    suma FLOAT DEFAULT 0.0,
+    UNIQUE KEY uq_daily_stats (metrica, fecha, clave)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,18 @@
+-- ============================================
+-- MIGRACIÓN: Índices FULLTEXT para búsqueda
+-- Base de datos: bot_cobertores (EXISTENTE)
+-- Fecha: 2026-10-19
+-- ============================================
+--
+-- Nota: InnoDB ignora términos más cortos que innodb_ft_min_token_size
+-- (por defecto 3). Para encontrar cuarteles como "22" configurar
+-- innodb_ft_min_token_size = 1 en my.cnf ANTES de ejecutar esta migración
+-- (o reconstruir los índices después de cambiarlo).
+
+USE bot_cobertores;
+
+ALTER TABLE emails_procesados
+    ADD FULLTEXT INDEX ft_emails_busqueda (subject, body_text);
+
+ALTER TABLE tareas
+    ADD FULLTEXT INDEX ft_tareas_busqueda (codigo_cobertor, cuartel, observaciones);
@@ -0,0 +1,29 @@
+-- ============================================
+-- MIGRACIÓN: Cuerpos HTML comprimidos
+-- Base de datos: bot_cobertores (EXISTENTE)
+-- Fecha: 2026-10-19
+-- ============================================
+--
+-- El HTML de cada email pasa de emails_procesados.body_html (TEXT) a
+-- email_cuerpos, comprimido con zstd o zlib (ver src/database/bodies.py).
+-- La compresión se hace en Python, así que después de esta migración:
+--
+--   python scripts/backfill_email_bodies.py                      # copia y comprime
+--   python scripts/backfill_email_bodies.py --eliminar-columna   # + DROP body_html
+--
+-- Hasta el backfill, el detalle de los emails antiguos sale sin HTML.
+
+USE bot_cobertores;
+
+CREATE TABLE IF NOT EXISTS email_cuerpos (
+    email_id INT PRIMARY KEY,
+    codec VARCHAR(10) NOT NULL,
+    body_html MEDIUMBLOB NULL,
+    size_original INT DEFAULT 0,
+    size_comprimido INT DEFAULT 0,
+    CONSTRAINT fk_cuerpo_email FOREIGN KEY (email_id)
+        REFERENCES emails_procesados(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Las filas nuevas ya no escriben body_html en emails_procesados
+ALTER TABLE emails_procesados MODIFY body_html TEXT NULL;
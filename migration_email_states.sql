@@ -0,0 +1,37 @@
+-- ============================================
+-- MIGRACIÓN: Vocabulario de status/alertas y máquina de estados
+-- Base de datos: bot_cobertores (EXISTENTE)
+-- Fecha: 2026-10-19
+-- ============================================
+--
+-- EmailProcessor escribe status 'processing'/'no_data' y alertas
+-- 'tarea_urgente'/'error_procesamiento', que no existían en los ENUM.
+
+USE bot_cobertores;
+
+ALTER TABLE emails_procesados
+    MODIFY COLUMN status ENUM('pending','processing','processed','no_data','error') DEFAULT 'pending';
+
+ALTER TABLE alertas
+    MODIFY COLUMN tipo ENUM('conflicto','urgente','vencimiento','informativa','tarea_urgente','error_procesamiento') NOT NULL;
+
+SET @sql = 'ALTER TABLE emails_procesados ADD COLUMN status_changed_at DATETIME DEFAULT NULL';
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @sql = 'ALTER TABLE emails_procesados ADD COLUMN processing_started_at DATETIME DEFAULT NULL';
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @sql = 'ALTER TABLE emails_procesados ADD COLUMN attempts INT DEFAULT 0';
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+CREATE INDEX idx_status_changed ON emails_procesados (status, status_changed_at);
+
+UPDATE emails_procesados
+SET status_changed_at = processed_date
+WHERE status_changed_at IS NULL;
@@ -0,0 +1,20 @@
+-- ============================================
+-- MIGRACIÓN: Checkpoints del aprendizaje histórico
+-- Base de datos: bot_cobertores (EXISTENTE)
+-- Fecha: 2026-10-19
+-- ============================================
+--
+-- HistoricalScraper guarda su avance en la fila de learning_sessions
+-- para poder reanudar con --resume.
+
+USE bot_cobertores;
+
+SET @sql = 'ALTER TABLE learning_sessions ADD COLUMN checkpoint JSON DEFAULT NULL';
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @sql = 'ALTER TABLE learning_sessions ADD COLUMN checkpoint_at DATETIME DEFAULT NULL';
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,28 @@
+-- ============================================
+-- MIGRACIÓN: Claves naturales del aprendizaje histórico
+-- Base de datos: bot_cobertores (EXISTENTE)
+-- Fecha: 2026-10-19
+-- ============================================
+--
+-- HistoricalScraper guarda perfiles, reglas y keywords con
+-- INSERT ... ON DUPLICATE KEY UPDATE; learned_rules y keyword_patterns
+-- necesitan índices únicos sobre su clave natural. Antes se eliminan los
+-- duplicados de ejecuciones previas (se conserva la fila más reciente).
+
+USE bot_cobertores;
+
+DELETE older FROM learned_rules older
+JOIN learned_rules newer
+  ON older.rule_name = newer.rule_name AND older.id < newer.id;
+
+DELETE older FROM keyword_patterns older
+JOIN keyword_patterns newer
+  ON older.keyword = newer.keyword
+ AND older.category = newer.category
+ AND older.id < newer.id;
+
+ALTER TABLE learned_rules
+    ADD UNIQUE KEY uq_learned_rules_name (rule_name);
+
+ALTER TABLE keyword_patterns
+    ADD UNIQUE KEY uq_keyword_category (keyword, category);
@@ -0,0 +1,15 @@
+-- ============================================
+-- MIGRACIÓN: Aprendizaje continuo
+-- Base de datos: bot_cobertores (EXISTENTE)
+-- Fecha: 2026-10-19
+-- ============================================
+--
+-- OnlineLearner mantiene success_rate como promedio incremental sobre
+-- las tareas resueltas (completadas + canceladas) de cada regla.
+
+USE bot_cobertores;
+
+SET @sql = 'ALTER TABLE learned_rules ADD COLUMN times_resolved INT DEFAULT 0 AFTER times_triggered';
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,21 @@
+-- ============================================
+-- MIGRACIÓN: Conteos de urgencia / intención por remitente
+-- Base de datos: bot_cobertores (EXISTENTE)
+-- Fecha: 2026-10-19
+-- ============================================
+--
+-- OnlineLearner suma a estos conteos y recalcula typical_urgency,
+-- inferred_intent y confidence_score desde ellos. Los perfiles existentes
+-- se siembran desde typical_urgency / confidence_score en el primer flush.
+
+USE bot_cobertores;
+
+SET @sql = 'ALTER TABLE sender_profiles ADD COLUMN urgency_counts JSON NULL AFTER confidence_score';
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @sql = 'ALTER TABLE sender_profiles ADD COLUMN intent_counts JSON NULL AFTER urgency_counts';
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
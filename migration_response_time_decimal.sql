@@ -0,0 +1,12 @@
+-- ============================================
+-- MIGRACIÓN: Tiempo de respuesta con una decimal
+-- Base de datos: bot_cobertores (EXISTENTE)
+-- Fecha: 2026-10-19
+-- ============================================
+--
+-- sender_profiles.avg_response_time_hours era INT: las respuestas de
+-- menos de 30 minutos quedaban en 0 horas. Se guarda con una decimal.
+
+USE bot_cobertores;
+
+ALTER TABLE sender_profiles MODIFY avg_response_time_hours DECIMAL(6,1) NULL;
@@ -0,0 +1,31 @@
+-- ============================================
+-- MIGRACIÓN: Cola durable de trabajos
+-- Base de datos: bot_cobertores (EXISTENTE)
+-- Fecha: 2026-10-19
+-- ============================================
+--
+-- La captura (email_processor.py --mode capture) encola los emails y
+-- los workers (--mode worker) los reclaman con SELECT ... FOR UPDATE
+-- SKIP LOCKED (MySQL 8.0+).
+
+USE bot_cobertores;
+
+CREATE TABLE IF NOT EXISTS cola_trabajos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    gmail_id VARCHAR(255) NOT NULL,
+    payload MEDIUMTEXT NOT NULL,
+    estado ENUM('pendiente', 'en_proceso', 'completado', 'fallido') DEFAULT 'pendiente',
+    prioridad INT DEFAULT 0,
+    intentos INT DEFAULT 0,
+    max_intentos INT DEFAULT 5,
+    disponible_desde DATETIME NULL,
+    lease_hasta DATETIME NULL,
+    worker_id VARCHAR(100) NULL,
+    error TEXT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    completado_at DATETIME NULL,
+    UNIQUE KEY uq_cola_gmail_id (gmail_id),
+    INDEX idx_cola_reclamo (estado, prioridad, disponible_desde),
+    INDEX idx_cola_lease (estado, lease_hasta)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
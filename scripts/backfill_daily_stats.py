@@ -0,0 +1,44 @@
+"""
+Backfill del rollup diario (daily_stats)
+Recalcula las tendencias desde emails_procesados y tareas
+
+Uso:
+    python scripts/backfill_daily_stats.py
+    python scripts/backfill_daily_stats.py --desde 2025-01-01 --hasta 2025-12-31
+"""
+
+import sys
+import argparse
+from datetime import date
+from pathlib import Path
+
+# Agregar src del proyecto al path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from database.connection import session_scope
+from database.rollups import backfill_daily_stats
+
+
+def parse_date(value: str) -> date:
+    return date.fromisoformat(value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Backfill del rollup daily_stats')
+    parser.add_argument('--desde', type=parse_date, default=None, help='Fecha inicial (YYYY-MM-DD)')
+    parser.add_argument('--hasta', type=parse_date, default=None, help='Fecha final inclusive (YYYY-MM-DD)')
+    
+    args = parser.parse_args()
+    
+    print("🔄 Reconstruyendo daily_stats...")
+    
+    try:
+        with session_scope() as session:
+            filas = backfill_daily_stats(session, desde=args.desde, hasta=args.hasta)
+        
+        print(f"✅ Rollup reconstruido: {filas} filas")
+        
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,129 @@
+"""
+Backfill de cuerpos HTML comprimidos (email_cuerpos)
+Mueve emails_procesados.body_html a email_cuerpos por lotes y reporta tamaños
+
+Correr después de migration_email_bodies.sql (MySQL). Es re-ejecutable:
+cada lote comprime, guarda y deja body_html en NULL en la misma transacción.
+
+Uso:
+    python scripts/backfill_email_bodies.py
+    python scripts/backfill_email_bodies.py --lote 1000
+    python scripts/backfill_email_bodies.py --eliminar-columna   # DROP body_html + compactar
+    python scripts/backfill_email_bodies.py --solo-reporte
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Agregar src del proyecto al path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from sqlalchemy import inspect, text
+
+from database.connection import get_engine, session_scope
+from database.bodies import CODEC, store_bodies, storage_report, table_sizes
+
+TABLES = ('emails_procesados', 'email_cuerpos')
+
+
+def has_legacy_column(engine) -> bool:
+    columns = inspect(engine).get_columns('emails_procesados')
+    return any(column['name'] == 'body_html' for column in columns)
+
+
+def backfill(batch_size: int) -> int:
+    """
+    Copia el HTML pendiente a email_cuerpos
+
+    Returns:
+        Número de cuerpos movidos
+    """
+    moved, last_id = 0, 0
+    while True:
+        with session_scope() as session:
+            rows = session.execute(text(
+                "SELECT id, body_html FROM emails_procesados "
+                "WHERE id > :last_id AND body_html IS NOT NULL ORDER BY id LIMIT :limit"
+            ), {'last_id': last_id, 'limit': batch_size}).all()
+            if not rows:
+                return moved
+
+            ids = [row.id for row in rows]
+            store_bodies(session, [{'email_id': row.id, 'body_html': row.body_html} for row in rows])
+            session.execute(text(
+                "UPDATE emails_procesados SET body_html = NULL WHERE id IN "
+                f"({', '.join(str(email_id) for email_id in ids)})"
+            ))
+            last_id = ids[-1]
+
+        moved += len(rows)
+        print(f"   📦 {moved} cuerpos movidos (hasta id {last_id})")
+
+
+def drop_legacy_column(engine):
+    """Elimina emails_procesados.body_html y compacta la tabla"""
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE emails_procesados DROP COLUMN body_html"))
+
+    # Liberar el espacio: InnoDB reconstruye la tabla, SQLite compacta el archivo
+    if engine.dialect.name == 'mysql':
+        with engine.begin() as conn:
+            conn.execute(text("OPTIMIZE TABLE emails_procesados"))
+    elif engine.dialect.name == 'sqlite':
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text("VACUUM"))
+
+
+def print_report(title: str):
+    with session_scope() as session:
+        report = storage_report(session)
+        sizes = table_sizes(session, TABLES)
+
+    print(f"\n📊 {title}")
+    for table in TABLES:
+        if table in sizes:
+            print(f"   {table:<20} {sizes[table] / 1024:>12,.0f} KB")
+    if not sizes:
+        print("   (el motor no informa el tamaño de las tablas)")
+    ratio = f"{report['ratio']:.1f}x" if report['ratio'] else '—'
+    print(f"   Cuerpos comprimidos: {report['cuerpos']} {report['por_codec']}")
+    print(f"   HTML original: {report['bytes_originales'] / 1024:,.0f} KB → "
+          f"comprimido: {report['bytes_comprimidos'] / 1024:,.0f} KB ({ratio})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Backfill de email_cuerpos (HTML comprimido)')
+    parser.add_argument('--lote', type=int, default=500, help='Emails por transacción')
+    parser.add_argument('--eliminar-columna', action='store_true',
+                        help='Eliminar emails_procesados.body_html al terminar y compactar')
+    parser.add_argument('--solo-reporte', action='store_true', help='Solo mostrar tamaños')
+
+    args = parser.parse_args()
+
+    try:
+        engine = get_engine()
+        print_report('Antes' if not args.solo_reporte else 'Tamaños')
+        if args.solo_reporte:
+            sys.exit(0)
+
+        if not has_legacy_column(engine):
+            print("\n✅ emails_procesados ya no tiene body_html: nada que migrar")
+            sys.exit(0)
+
+        print(f"\n🔄 Comprimiendo body_html con {CODEC}...")
+        start = time.perf_counter()
+        moved = backfill(args.lote)
+        print(f"✅ {moved} cuerpos movidos en {time.perf_counter() - start:.1f}s")
+
+        if args.eliminar_columna:
+            print("🗑️ Eliminando emails_procesados.body_html...")
+            drop_legacy_column(engine)
+
+        print_report('Después')
+
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        sys.exit(1)
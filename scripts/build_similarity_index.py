@@ -0,0 +1,51 @@
+"""
+Construye el índice de similitud con emails históricos
+Etiqueta cada email con la prioridad y el resultado de sus tareas cerradas
+
+Uso:
+    python scripts/build_similarity_index.py
+    python scripts/build_similarity_index.py --max-items 50000 --output data/similarity_index.npz
+"""
+
+import sys
+import time
+import argparse
+from collections import Counter
+from pathlib import Path
+
+# Agregar src del proyecto al path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+from database.connection import session_scope
+from learning.similarity_index import SimilarityIndex, INDEX_PATH, MAX_ITEMS, DIMENSIONS
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Construir el índice de similitud')
+    parser.add_argument('--max-items', type=int, default=MAX_ITEMS, help='Máximo de emails en el índice')
+    parser.add_argument('--dimensions', type=int, default=DIMENSIONS, help='Tamaño de los vectores')
+    parser.add_argument('--output', default=INDEX_PATH, help='Archivo .npz de salida')
+    
+    args = parser.parse_args()
+    
+    print("🧭 Construyendo índice de similitud...")
+    
+    try:
+        start = time.perf_counter()
+        with session_scope() as session:
+            index = SimilarityIndex.build(session, max_items=args.max_items, dimensions=args.dimensions)
+        
+        if not len(index):
+            print("⚠️ No hay emails con tareas cerradas para etiquetar")
+            sys.exit(0)
+        
+        index.save(args.output)
+        
+        print(f"✅ {len(index)} emails indexados en {time.perf_counter() - start:.1f}s → {args.output}")
+        print(f"   Prioridades: {dict(Counter(index.prioridades.tolist()))}")
+        print(f"   Resultados:  {dict(Counter(index.resultados.tolist()))}")
+        
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        sys.exit(1)
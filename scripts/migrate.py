@@ -1,22 +1,29 @@
 """
 Script de migración usando SQLAlchemy (ya instalado)
 Agrega tablas de aprendizaje a bot_cobertores existente
+
+Uso:
+    python scripts/migrate.py                             # migration_add_learning.sql
+    python scripts/migrate.py migration_add_search.sql    # otra migración
 """
 
 import sys
 import os
 from pathlib import Path
 
-# Agregar root del proyecto al path
+# Agregar src del proyecto al path (los .sql se leen desde la raíz)
 project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'src'))
 
 from sqlalchemy import create_engine, text
-from dotenv import load_dotenv
+from app_config import load_env
+
+load_env()
+
+DEFAULT_MIGRATION = 'migration_add_learning.sql'
 
-load_dotenv()
 
-def run_migration():
+def run_migration(migration_file: str = DEFAULT_MIGRATION):
     """Ejecuta migración SQL"""
     
     # Construir connection string
@@ -26,7 +33,14 @@ def run_migration():
     db_port = os.getenv('DB_PORT', '3306')
     db_name = os.getenv('DB_NAME', 'bot_cobertores')
     
-    connection_string = f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+    connection_string = os.getenv('DATABASE_URL') or \
+        f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+    
+    # Las migraciones .sql son MySQL; en SQLite el esquema sale de los modelos
+    if connection_string.startswith('sqlite'):
+        from database.connection import init_database
+        print("🪶 SQLite: creando esquema desde los modelos (sin migraciones SQL)")
+        return init_database()
     
     print(f"🔗 Conectando a: {db_host}:{db_port}/{db_name}")
     
@@ -34,11 +48,11 @@ def run_migration():
         engine = create_engine(connection_string, echo=False)
         
         # Leer archivo SQL
-        sql_file = project_root / 'migration_add_learning.sql'
+        sql_file = project_root / migration_file
         
         if not sql_file.exists():
             print(f"❌ No se encuentra: {sql_file}")
-            print("💡 Coloca migration_add_learning.sql en la raíz del proyecto")
+            print(f"💡 Coloca {migration_file} en la raíz del proyecto")
             return False
         
         print(f"📄 Leyendo: {sql_file}")
@@ -125,8 +139,9 @@ def run_migration():
         print("="*60)
         
         # Verificar tablas creadas
-        print("\n🔍 Verificando estructura...")
-        verify_migration(engine)
+        if migration_file == DEFAULT_MIGRATION:
+            print("\n🔍 Verificando estructura...")
+            verify_migration(engine)
         
         return errors == 0
     
@@ -197,11 +212,13 @@ def verify_migration(engine):
 
 if __name__ == "__main__":
     print("="*60)
-    print("🚀 MIGRACIÓN: Sistema de Aprendizaje")
+    migration_file = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MIGRATION
+    
+    print(f"🚀 MIGRACIÓN: {migration_file}")
     print("="*60)
     print()
     
-    success = run_migration()
+    success = run_migration(migration_file)
     
     if success:
         print("\n✅ Migración exitosa. Siguiente paso:")
@@ -3,12 +3,17 @@ Test de captura de correos Gmail y guardado en base de datos
 """
 
 import sys
-sys.path.append('.')
+from pathlib import Path
+
+# Agregar src del proyecto al path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
 
 from datetime import datetime
-from src.gmail_capture.gmail_client import GmailClient
-from src.database.connection import init_database, get_db_session
-from src.database.models import EmailProcesado
+from gmail_capture.gmail_client import GmailClient
+from database.connection import init_database, get_db_session
+from database.models import EmailProcesado
+from database.bodies import store_bodies
 
 def test_gmail_to_database():
     """
@@ -68,7 +73,6 @@ def test_gmail_to_database():
                 sender_name=email_data['sender_name'],
                 subject=email_data['subject'],
                 body_text=email_data['body_text'],
-                body_html=email_data['body_html'],
                 received_date=email_data['received_date'],
                 has_attachments=email_data['has_attachments'],
                 attachment_count=email_data['attachment_count'],
@@ -77,6 +81,8 @@ def test_gmail_to_database():
             )
             
             session.add(email_record)
+            session.flush()
+            store_bodies(session, [{'email_id': email_record.id, 'body_html': email_data['body_html']}])
             emails_guardados += 1
             
             print(f"✅ Guardado: {email_data['subject'][:50]}...")
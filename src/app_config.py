@@ -0,0 +1,59 @@
+"""
+Configuración de arranque compartida por los puntos de entrada
+
+- load_env(): carga .env una sola vez por proceso. Lo invocan los
+  paquetes del proyecto al importarse, así que las constantes que leen
+  os.getenv a nivel de módulo (métricas, cola, re-intentos, cachés) ya ven
+  los valores de .env sin importar el orden de los imports.
+- setup_logging(): configura el logging raíz una sola vez. La llaman los
+  puntos de entrada (email_processor, historical_scraper, dashboard), no
+  los módulos de librería, para que importar uno no fije el formato.
+
+Variables de entorno:
+    LOG_LEVEL   Nivel del logging raíz (default INFO)
+"""
+
+import os
+import logging
+import threading
+from functools import lru_cache
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_logging_lock = threading.Lock()
+_logging_configured = False
+
+
+@lru_cache(maxsize=None)
+def load_env() -> bool:
+    """
+    Carga .env del directorio actual (o el más cercano hacia arriba); si no
+    hay ninguno, el de la raíz del proyecto
+
+    Las variables ya definidas en el entorno tienen prioridad.
+
+    Returns:
+        True si se encontró y cargó un .env
+    """
+    from dotenv import load_dotenv, find_dotenv
+
+    return load_dotenv(find_dotenv(usecwd=True) or os.path.join(PROJECT_ROOT, '.env'))
+
+
+def setup_logging(level: str = None) -> None:
+    """
+    Configura el logging raíz (idempotente)
+
+    Args:
+        level: Nivel de logging (por defecto LOG_LEVEL o INFO)
+    """
+    global _logging_configured
+    with _logging_lock:
+        if _logging_configured:
+            return
+        load_env()
+        level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+        logging.basicConfig(level=getattr(logging, level, logging.INFO), format=LOG_FORMAT)
+        _logging_configured = True
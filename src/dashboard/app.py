@@ -5,14 +5,27 @@ Visualización de emails procesados y tareas creadas
 
 import sys
 import os
-from datetime import datetime
-from flask import Flask, render_template, jsonify, request
+from datetime import datetime, date, timedelta
+from flask import Flask, Response, render_template, jsonify, request
 
 # Agregar path para imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from database.models import EmailProcesado, Tarea, Alerta
+from database.models import EmailProcesado, Tarea, Alerta, ESTADOS_TAREA
 from database.connection import session_scope
+from database.search import search_emails, search_tareas, clamp_pagination
+from database.bodies import load_body
+from database.email_states import problem_emails, is_stuck
+from database.rollups import (
+    read_rollup, group_by_week, METRICA_TAREAS_PRIORIDAD,
+    METRICA_EMAILS_REMITENTE, METRICA_LATENCIA, METRICA_TIEMPO_A_TAREA
+)
+from database.work_queue import queue_stats
+from learning.online_learner import get_online_learner
+from monitoring.metrics import REGISTRY, QUEUE_DEPTH, render_prometheus, latest_snapshots
+from app_config import setup_logging
+
+setup_logging()
 
 app = Flask(__name__)
 app.secret_key = os.getenv('APP_SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -85,6 +98,32 @@ def get_emails():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/emails/problemas')
+def get_problem_emails():
+    """Emails con error o atascados en 'processing'"""
+    try:
+        with session_scope() as session:
+            emails = problem_emails(session, limit=request.args.get('limit', 100, type=int))
+            
+            emails_data = [{
+                'id': email.id,
+                'gmail_id': email.gmail_id,
+                'subject': email.subject,
+                'sender_email': email.sender_email,
+                'status': email.status,
+                'atascado': is_stuck(email.status, email.processing_started_at),
+                'attempts': email.attempts,
+                'error_message': email.error_message,
+                'processing_started_at': email.processing_started_at.isoformat() if email.processing_started_at else None,
+                'status_changed_at': email.status_changed_at.isoformat() if email.status_changed_at else None
+            } for email in emails]
+            
+            return jsonify(emails_data)
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/tareas')
 def get_tareas():
     """Lista de tareas creadas"""
@@ -145,6 +184,7 @@ def get_email_detail(email_id):
                 'sender_email': email.sender_email,
                 'sender_name': email.sender_name,
                 'body_text': email.body_text,
+                'body_html': load_body(session, email_id),
                 'received_date': email.received_date.isoformat() if email.received_date else None,
                 'processed_date': email.processed_date.isoformat() if email.processed_date else None,
                 'status': email.status,
@@ -165,6 +205,166 @@ def get_email_detail(email_id):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/search')
+def search():
+    """Búsqueda de texto completo en emails y tareas"""
+    try:
+        query = request.args.get('q', '').strip()
+        tipo = request.args.get('tipo', 'todo')
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        
+        if not query:
+            return jsonify({'error': 'Parámetro q requerido'}), 400
+        
+        if tipo not in ['todo', 'emails', 'tareas']:
+            return jsonify({'error': 'Tipo inválido'}), 400
+        
+        # Reportar la paginación efectiva (per_page se limita a MAX_PER_PAGE)
+        page, per_page = clamp_pagination(page, per_page)
+        
+        with session_scope() as session:
+            resultado = {'q': query, 'page': page, 'per_page': per_page}
+            
+            if tipo in ['todo', 'emails']:
+                resultado['emails'] = search_emails(session, query, page, per_page)
+            if tipo in ['todo', 'tareas']:
+                resultado['tareas'] = search_tareas(session, query, page, per_page)
+            
+            return jsonify(resultado)
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _rango_fechas():
+    """Rango desde/hasta (YYYY-MM-DD) o últimos ?dias= (por defecto 365)"""
+    hasta = request.args.get('hasta')
+    hasta = date.fromisoformat(hasta) if hasta else date.today()
+    desde = request.args.get('desde')
+    if desde:
+        desde = date.fromisoformat(desde)
+    else:
+        desde = hasta - timedelta(days=request.args.get('dias', 365, type=int))
+    return desde, hasta
+
+
+@app.route('/api/trends/tareas')
+def get_trends_tareas():
+    """Tareas creadas por día y prioridad (desde daily_stats)"""
+    try:
+        desde, hasta = _rango_fechas()
+        
+        with session_scope() as session:
+            dias = {}
+            for row in read_rollup(session, METRICA_TAREAS_PRIORIDAD, desde, hasta):
+                punto = dias.setdefault(row.fecha, {'fecha': row.fecha.isoformat()})
+                punto[row.clave] = punto.get(row.clave, 0) + (row.cantidad or 0)
+            
+            return jsonify(list(dias.values()))
+            
+    except ValueError:
+        return jsonify({'error': 'Fecha inválida'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/trends/emails')
+def get_trends_emails():
+    """Emails por remitente por semana (desde daily_stats)"""
+    try:
+        desde, hasta = _rango_fechas()
+        top = request.args.get('top', 10, type=int)
+        
+        with session_scope() as session:
+            semanas = group_by_week(read_rollup(session, METRICA_EMAILS_REMITENTE, desde, hasta))
+            
+            # Limitar a los remitentes con más emails en el rango
+            totales = {}
+            for (_, remitente), cantidad in semanas.items():
+                totales[remitente] = totales.get(remitente, 0) + cantidad
+            principales = set(sorted(totales, key=totales.get, reverse=True)[:top])
+            
+            data = [{
+                'semana': semana.isoformat(),
+                'remitente': remitente,
+                'cantidad': cantidad
+            } for (semana, remitente), cantidad in sorted(semanas.items()) if remitente in principales]
+            
+            return jsonify(data)
+            
+    except ValueError:
+        return jsonify({'error': 'Fecha inválida'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/trends/latencia')
+def get_trends_latencia():
+    """Latencia promedio de procesamiento por día, en segundos (desde daily_stats)"""
+    try:
+        desde, hasta = _rango_fechas()
+        
+        with session_scope() as session:
+            data = [{
+                'fecha': row.fecha.isoformat(),
+                'emails': row.cantidad,
+                'latencia_promedio_seg': round(row.suma / row.cantidad, 1) if row.cantidad else None
+            } for row in read_rollup(session, METRICA_LATENCIA, desde, hasta)]
+            
+            return jsonify(data)
+            
+    except ValueError:
+        return jsonify({'error': 'Fecha inválida'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/trends/tiempo_a_tarea')
+def get_trends_tiempo_a_tarea():
+    """Tiempo promedio desde la recepción hasta la tarea, por día y prioridad del email"""
+    try:
+        desde, hasta = _rango_fechas()
+        prioridad = request.args.get('prioridad')
+        
+        with session_scope() as session:
+            data = [{
+                'fecha': row.fecha.isoformat(),
+                'prioridad': row.clave,
+                'emails': row.cantidad,
+                'tiempo_promedio_seg': round(row.suma / row.cantidad, 1) if row.cantidad else None
+            } for row in read_rollup(session, METRICA_TIEMPO_A_TAREA, desde, hasta)
+                if not prioridad or row.clave == prioridad]
+            
+            return jsonify(data)
+            
+    except ValueError:
+        return jsonify({'error': 'Fecha inválida'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/metrics')
+def metrics():
+    """
+    Métricas en formato de texto de Prometheus
+    
+    Incluye las del dashboard, la profundidad de la cola y el último
+    snapshot de cada procesador/worker (guardado en log_sistema).
+    """
+    try:
+        with session_scope() as session:
+            for estado, cantidad in queue_stats(session).items():
+                if estado != 'pendiente_mas_antiguo_s':
+                    QUEUE_DEPTH.set(cantidad, estado=estado)
+            snapshots = [REGISTRY.snapshot()] + latest_snapshots(session, exclude=REGISTRY.instancia)
+        
+        return Response(render_prometheus(snapshots), mimetype='text/plain; version=0.0.4')
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/tarea/<int:tarea_id>/update', methods=['POST'])
 def update_tarea(tarea_id):
     """Actualizar estado de una tarea"""
@@ -172,7 +372,7 @@ def update_tarea(tarea_id):
         data = request.get_json()
         nuevo_estado = data.get('estado')
         
-        if nuevo_estado not in ['pendiente', 'en_proceso', 'completada', 'cancelada']:
+        if nuevo_estado not in ESTADOS_TAREA:
             return jsonify({'error': 'Estado inválido'}), 400
         
         with session_scope() as session:
@@ -181,12 +381,19 @@ def update_tarea(tarea_id):
             if not tarea:
                 return jsonify({'error': 'Tarea no encontrada'}), 404
             
+            estado_anterior = tarea.estado
+            sender = tarea.email.sender_email if tarea.email else None
             tarea.estado = nuevo_estado
             
             if nuevo_estado == 'completada':
                 tarea.fecha_completada = datetime.now()
-            
-            return jsonify({'success': True, 'estado': nuevo_estado})
+        
+        # Resultado de la tarea para el aprendizaje continuo (tras el commit)
+        learner = get_online_learner()
+        if learner and sender and estado_anterior != nuevo_estado:
+            learner.record_outcome(sender, nuevo_estado, estado_anterior)
+        
+        return jsonify({'success': True, 'estado': nuevo_estado})
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
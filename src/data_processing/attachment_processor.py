@@ -6,14 +6,20 @@ Maneja Excel (XLS/XLSX), PDF, y CSV
 import os
 import logging
 from typing import List, Dict, Optional
-import pandas as pd
-from openpyxl import load_workbook
-import PyPDF2
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+from monitoring.metrics import ATTACHMENT_SECONDS, timed
+
+# pandas / openpyxl / PyPDF2 se importan dentro de cada método: cargarlos
+# cuesta ~0.3 s y la mayoría de los emails no trae adjuntos
 logger = logging.getLogger(__name__)
 
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xls', '.pdf', '.csv')
+
+
+def is_supported(filename: str) -> bool:
+    """True si AttachmentProcessor sabe extraer datos de este tipo de archivo"""
+    return os.path.splitext(filename or '')[1].lower() in SUPPORTED_EXTENSIONS
+
 
 class AttachmentProcessor:
     """Procesador de archivos adjuntos (Excel, PDF, CSV)"""
@@ -39,15 +45,16 @@ class AttachmentProcessor:
         file_ext = os.path.splitext(file_path)[1].lower()
         
         try:
-            if file_ext in ['.xlsx', '.xls']:
-                return self.process_excel(file_path)
-            elif file_ext == '.pdf':
-                return self.process_pdf(file_path)
-            elif file_ext == '.csv':
-                return self.process_csv(file_path)
-            else:
-                logger.warning(f"⚠️ Tipo de archivo no soportado: {file_ext}")
-                return None
+            with timed(ATTACHMENT_SECONDS, tipo=file_ext.lstrip('.') or 'sin_extension'):
+                if file_ext in ['.xlsx', '.xls']:
+                    return self.process_excel(file_path)
+                elif file_ext == '.pdf':
+                    return self.process_pdf(file_path)
+                elif file_ext == '.csv':
+                    return self.process_csv(file_path)
+                else:
+                    logger.warning(f"⚠️ Tipo de archivo no soportado: {file_ext}")
+                    return None
         except Exception as e:
             logger.error(f"❌ Error procesando archivo {file_path}: {e}")
             return None
@@ -64,6 +71,8 @@ class AttachmentProcessor:
         """
         logger.info(f"📊 Procesando Excel: {os.path.basename(file_path)}")
         
+        import pandas as pd
+        
         results = []
         
         try:
@@ -93,6 +102,9 @@ class AttachmentProcessor:
     
     def _process_excel_openpyxl(self, file_path: str) -> List[Dict]:
         """Método alternativo usando openpyxl directamente"""
+        import pandas as pd
+        from openpyxl import load_workbook
+        
         try:
             wb = load_workbook(file_path, data_only=True)
             results = []
@@ -117,7 +129,7 @@ class AttachmentProcessor:
             logger.error(f"❌ Error con openpyxl: {e}")
             return []
     
-    def _extract_from_dataframe(self, df: pd.DataFrame, source: str = "") -> List[Dict]:
+    def _extract_from_dataframe(self, df, source: str = "") -> List[Dict]:
         """
         Extrae datos estructurados de un DataFrame
         
@@ -191,6 +203,8 @@ class AttachmentProcessor:
         if col_name is None or col_name not in row.index:
             return None
         
+        import pandas as pd
+        
         value = row[col_name]
         
         # Manejar valores nulos de pandas
@@ -234,6 +248,8 @@ class AttachmentProcessor:
         """
         logger.info(f"📄 Procesando PDF: {os.path.basename(file_path)}")
         
+        import PyPDF2
+        
         try:
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
@@ -271,6 +287,8 @@ class AttachmentProcessor:
         """
         logger.info(f"📋 Procesando CSV: {os.path.basename(file_path)}")
         
+        import pandas as pd
+        
         try:
             # Intentar con diferentes encodings
             encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
@@ -316,6 +334,8 @@ def process_attachment(file_path: str) -> Optional[List[Dict]]:
 
 
 if __name__ == "__main__":
+    import pandas as pd
+    
     # Test del procesador
     print("🧪 Testing Attachment Processor...")
     
@@ -5,43 +5,65 @@ Orquesta: Gmail → Parser IA/Excel → MySQL
 
 import os
 import sys
+import time
+import socket
 import logging
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 from datetime import datetime
-from dotenv import load_dotenv
+from functools import lru_cache
 
 # Añadir path para imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from gmail_capture.gmail_client import GmailClient
-from data_processing.gpt_parser import GeminiParser
-from data_processing.attachment_processor import AttachmentProcessor
-from database.models import EmailProcesado, Tarea, ArchivoAdjunto, Alerta, session_scope
+from data_processing.gpt_parser import GeminiParser, extract_fields
+from data_processing.attachment_processor import AttachmentProcessor, is_supported
+from database.models import EmailProcesado, Tarea, ArchivoAdjunto, Alerta
+from database.connection import session_scope
+from database.rollups import email_increments, apply_increments
+from database.upsert import upsert
+from database.bodies import store_bodies
+from learning.keyword_classifier import is_urgent
+from learning.online_learner import get_online_learner
+from learning.profile_cache import get_profile_cache
+from learning.priority_scorer import score_email
+from learning.similarity_index import get_similarity_index, MIN_CONFIDENCE, REVIEW_CONFIDENCE
+from database.email_states import transition, is_claimable, is_stuck, is_exhausted, FINAL_STATUSES
+from database import work_queue
+from monitoring.metrics import EMAIL_SECONDS, EMAILS_TOTAL, record_snapshot
+from app_config import setup_logging
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Cargar variables de entorno
-load_dotenv()
+# Marca de _already_processed() para los emails que agotaron sus intentos
+EXHAUSTED = 'agotado'
+# Cada cuánto capture_to_queue elimina los trabajos completados antiguos
+PURGE_INTERVAL = float(os.getenv('QUEUE_PURGE_SECONDS', '3600'))
 
 
 class EmailProcessor:
     """Procesador completo de emails con IA"""
     
-    def __init__(self):
-        """Inicializa todos los componentes"""
+    def __init__(self, gmail_client: Optional[GmailClient] = None,
+                 gpt_parser: Optional[GeminiParser] = None):
+        """
+        Inicializa todos los componentes
+        
+        Args:
+            gmail_client: GmailClient ya autenticado (por defecto Gmail API / MAIL_SOURCE)
+            gpt_parser: GeminiParser a usar (ej: con cliente simulado en benchmarks)
+        """
         logger.info("🚀 Inicializando EmailProcessor...")
         
         try:
-            self.gmail_client = GmailClient()
-            self.gmail_client.authenticate()
-            self.gmail_client._get_label_id()
-            self.gpt_parser = GeminiParser()
+            self.gmail_client = gmail_client or GmailClient().authenticate()
+            self.gpt_parser = gpt_parser or GeminiParser()
             self.attachment_processor = AttachmentProcessor()
+            self.learner = get_online_learner()
+            self.profile_cache = get_profile_cache()
+            self.profile_cache.refresh_if_stale(force=True)
+            self._last_purge = None
+            get_similarity_index()   # precarga; se relee solo si el archivo cambia
             
             logger.info("✅ EmailProcessor inicializado correctamente")
         except Exception as e:
@@ -62,22 +84,44 @@ class EmailProcessor:
         
         stats = {
             'emails_procesados': 0,
+            'emails_omitidos': 0,
             'tareas_creadas': 0,
             'adjuntos_procesados': 0,
             'errores': 0,
+            'emails_listados': 0,
             'timestamp': datetime.now()
         }
         
         try:
-            # Capturar emails
-            emails = self.gmail_client.get_unread_emails(max_results=max_emails)
+            # Listar IDs y descartar los ya procesados antes de descargarlos
+            message_ids = self.gmail_client.list_unread_ids(max_results=max_emails)
             
-            if not emails:
+            if not message_ids:
                 logger.info("📭 No hay emails nuevos para procesar")
                 return stats
+            stats['emails_listados'] = len(message_ids)
+            
+            ya_procesados = self._already_processed(message_ids)
+            if ya_procesados:
+                # Terminados que quedaron sin leer (fallo de mark_as_read o
+                # crash), sin intentos restantes, o en curso en otro worker
+                logger.info(f"⏭️ {len(ya_procesados)} emails ya procesados o en curso, se omiten")
+                self._release_skipped(ya_procesados)
+                stats['emails_omitidos'] = len(ya_procesados)
+            
+            # Capturar emails pendientes
+            emails = self.gmail_client.get_emails(
+                [gmail_id for gmail_id in message_ids if gmail_id not in ya_procesados]
+            )
+            
+            if not emails:
+                return stats
             
             logger.info(f"📬 {len(emails)} emails capturados, procesando...")
             
+            # Los más prioritarios primero (keywords + perfil del remitente)
+            emails = self._prioritize(emails)
+            
             # Procesar cada email
             for email_data in emails:
                 try:
@@ -101,24 +145,320 @@ class EmailProcessor:
 ║           RESUMEN DE PROCESAMIENTO                   ║
 ╠══════════════════════════════════════════════════════╣
 ║  📧 Emails procesados:    {stats['emails_procesados']:3d}                       ║
+║  ⏭️  Emails omitidos:      {stats['emails_omitidos']:3d}                       ║
 ║  ✅ Tareas creadas:       {stats['tareas_creadas']:3d}                       ║
 ║  📎 Adjuntos procesados:  {stats['adjuntos_procesados']:3d}                       ║
 ║  ❌ Errores:              {stats['errores']:3d}                       ║
 ╚══════════════════════════════════════════════════════╝
             """)
             
+            if self.learner:
+                self.learner.flush()
+            
+            cache_stats = self.profile_cache.stats()
+            logger.info(
+                f"🗂️ Caché de perfiles: {cache_stats['hit_rate']:.0%} aciertos por email, "
+                f"{cache_stats['domain_hit_rate']:.0%} por dominio, "
+                f"datos verificados hace {cache_stats['staleness_seconds'] or 0:.0f}s"
+            )
+            
             return stats
             
         except Exception as e:
             logger.error(f"❌ Error en process_new_emails: {e}")
+            stats['errores'] += 1
+            stats['fallo_ciclo'] = True
+            return stats
+    
+    # =========================================================================
+    # COLA DURABLE (captura y workers desacoplados)
+    # =========================================================================
+    
+    def capture_to_queue(self, max_emails: int = 50) -> Dict:
+        """
+        Captura emails nuevos y los deja en cola_trabajos (sin procesarlos)
+        
+        Args:
+            max_emails: Máximo número de emails a listar
+        
+        Returns:
+            Dict con estadísticas de la captura
+        """
+        stats = {'emails_listados': 0, 'emails_encolados': 0, 'emails_omitidos': 0,
+                 'errores': 0, 'timestamp': datetime.now()}
+        
+        try:
+            message_ids = self.gmail_client.list_unread_ids(max_results=max_emails)
+            if not message_ids:
+                return stats
+            stats['emails_listados'] = len(message_ids)
+            
+            # Ni los ya procesados ni los ya encolados se vuelven a descargar
+            ya_procesados = self._already_processed(message_ids)
+            with session_scope() as session:
+                encolados = work_queue.queued_states(session, message_ids)
+            omitir = set(ya_procesados) | set(encolados)
+            stats['emails_omitidos'] = len(omitir)
+            
+            # Los que no van a procesarse más salen de no leídos
+            self._release_skipped(ya_procesados)
+            fallidos = [gmail_id for gmail_id, estado in encolados.items()
+                        if estado == 'fallido' and gmail_id not in ya_procesados]
+            if fallidos:
+                logger.warning(f"📪 {len(fallidos)} trabajos fallidos, fuera de no leídos")
+                self.gmail_client.mark_dead_letter(fallidos)
+            
+            emails = self.gmail_client.get_emails(
+                [gmail_id for gmail_id in message_ids if gmail_id not in omitir]
+            )
+            if emails:
+                # La cola entrega primero los de mayor puntaje
+                emails = self._prioritize(emails)
+                with session_scope() as session:
+                    stats['emails_encolados'] = work_queue.enqueue(session, emails)
+                logger.info(f"📥 {stats['emails_encolados']} emails encolados")
+            
+            self._purge_queue()
+            return stats
+        
+        except Exception as e:
+            logger.error(f"❌ Error en capture_to_queue: {e}")
+            stats['errores'] += 1
+            stats['fallo_ciclo'] = True
+            return stats
+    
+    def _purge_queue(self):
+        """Elimina los trabajos completados antiguos (como mucho cada PURGE_INTERVAL)"""
+        now = time.monotonic()
+        if self._last_purge is not None and now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        with session_scope() as session:
+            eliminados = work_queue.purge_completed(session)
+        if eliminados:
+            logger.info(f"🧹 {eliminados} trabajos completados eliminados de la cola")
+    
+    def process_queue(self, max_jobs: int = 50, worker_id: Optional[str] = None) -> Dict:
+        """
+        Reclama trabajos de cola_trabajos y los procesa uno a uno
+        
+        Args:
+            max_jobs: Máximo de trabajos por llamada
+            worker_id: Identificador del worker (por defecto host:pid)
+        
+        Returns:
+            Dict con estadísticas del procesamiento
+        """
+        worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        stats = {'emails_procesados': 0, 'tareas_creadas': 0, 'adjuntos_procesados': 0,
+                 'errores': 0, 'emails_listados': 0, 'timestamp': datetime.now()}
+        
+        try:
+            while stats['emails_listados'] < max_jobs:
+                # Un trabajo por reclamo: el lease cubre solo lo que se está procesando
+                with session_scope() as session:
+                    jobs = work_queue.claim(session, worker_id, limit=1)
+                if not jobs:
+                    break
+                
+                job = jobs[0]
+                stats['emails_listados'] += 1
+                
+                try:
+                    result = self._process_single_email(
+                        job['email'],
+                        heartbeat=lambda session: self._renew_lease(session, job['id'], worker_id)
+                    )
+                except Exception as e:
+                    result = {'success': False, 'error': str(e)}
+                
+                estado = None
+                with session_scope() as session:
+                    if result['success']:
+                        work_queue.complete(session, job['id'], worker_id)
+                        stats['emails_procesados'] += 1
+                        stats['tareas_creadas'] += result['tareas_creadas']
+                        stats['adjuntos_procesados'] += result['adjuntos_procesados']
+                    else:
+                        estado = work_queue.fail(session, job['id'], worker_id,
+                                                 result.get('error', 'Error procesando email'))
+                        stats['errores'] += 1
+                        logger.warning(f"   🔁 Trabajo {job['id']} ({job['gmail_id']}): {estado}")
+                
+                if estado == 'fallido':
+                    # Sin re-intentos: fuera de no leídos para no tapar el correo nuevo
+                    self.gmail_client.mark_dead_letter([job['gmail_id']])
+            
+            if stats['emails_listados']:
+                logger.info(
+                    f"⚙️ Worker {worker_id}: {stats['emails_procesados']} procesados, "
+                    f"{stats['errores']} con error"
+                )
+            if self.learner:
+                self.learner.flush()
+            
             return stats
+        
+        except Exception as e:
+            logger.error(f"❌ Error en process_queue: {e}")
+            stats['errores'] += 1
+            stats['fallo_ciclo'] = True
+            return stats
+    
+    def _renew_lease(self, session, job_id: int, worker_id: str):
+        """
+        Renueva el lease del trabajo en curso (entre etapas de _process_single_email)
+        
+        Va en la transacción del email (session_scope comparte la sesión del
+        hilo): la fila del trabajo queda bloqueada hasta el commit, así que
+        los demás workers la saltan (SKIP LOCKED) y al confirmar el lease
+        cuenta desde la última etapa.
+        """
+        if not work_queue.renew(session, job_id, worker_id):
+            logger.warning(f"   ⚠️ Trabajo {job_id}: el lease ya no es de este worker")
+    
+    def _score(self, email_data: Dict) -> Dict:
+        """Puntaje de prioridad de un email (sin IA, con la caché de perfiles)"""
+        return score_email(
+            email_data.get('subject', ''), email_data.get('sender_email', ''), self.profile_cache
+        )
+    
+    def _prioritize(self, emails: List[Dict]) -> List[Dict]:
+        """
+        Calcula el puntaje de cada email y los ordena de mayor a menor
+        
+        Deja el resultado en 'priority_score' y el puntaje en 'queue_priority'
+        (prioridad del trabajo en cola_trabajos).
+        
+        Args:
+            emails: Emails de GmailClient.get_emails()
+        
+        Returns:
+            Los mismos emails ordenados (estable: a igual puntaje, orden de Gmail)
+        """
+        for email_data in emails:
+            email_data['priority_score'] = self._score(email_data)
+            email_data['queue_priority'] = email_data['priority_score']['score']
+        
+        emails = sorted(emails, key=lambda e: e['queue_priority'], reverse=True)
+        urgentes = sum(1 for e in emails if e['priority_score']['prioridad'] == 'urgente')
+        if urgentes:
+            logger.info(f"🚦 {urgentes} email(s) urgente(s) al frente del lote")
+        return emails
+    
+    def _already_processed(self, gmail_ids: List[str]) -> Dict[str, str]:
+        """
+        Devuelve los gmail_id que no deben procesarse de nuevo (una sola consulta IN)
+        
+        Incluye los terminados, los que agotaron sus intentos y los que
+        otro worker está procesando en este momento.
+        
+        Args:
+            gmail_ids: IDs de la página capturada
+        
+        Returns:
+            Dict gmail_id → status de los emails a omitir (EXHAUSTED si
+            agotaron sus intentos)
+        """
+        if not gmail_ids:
+            return {}
+        
+        with session_scope() as session:
+            rows = session.query(
+                EmailProcesado.gmail_id,
+                EmailProcesado.status,
+                EmailProcesado.attempts,
+                EmailProcesado.processing_started_at
+            ).filter(
+                EmailProcesado.gmail_id.in_(gmail_ids)
+            ).all()
+        
+        now = datetime.now()
+        return {
+            gmail_id: EXHAUSTED if is_exhausted(status, attempts, started, now) else status
+            for gmail_id, status, attempts, started in rows
+            if not is_claimable(status, attempts, started, now)
+        }
+    
+    def _release_skipped(self, omitidos: Dict[str, str]):
+        """
+        Saca de no leídos los emails omitidos que no van a procesarse más
+        
+        Sin esto, los terminados que quedaron sin leer y los que agotaron
+        sus intentos vuelven en cada list_unread_ids y, al acumularse,
+        llenan la página y el correo nuevo nunca se alcanza.
+        
+        Args:
+            omitidos: Resultado de _already_processed()
+        """
+        self.gmail_client.mark_many_as_read(
+            gmail_id for gmail_id, status in omitidos.items() if status in FINAL_STATUSES
+        )
+        agotados = [gmail_id for gmail_id, status in omitidos.items() if status == EXHAUSTED]
+        if agotados:
+            logger.warning(f"📪 {len(agotados)} emails sin intentos restantes, fuera de no leídos")
+            self.gmail_client.mark_dead_letter(agotados)
     
-    def _process_single_email(self, email_data: Dict) -> Dict:
+    def _claim_email(self, email_data: Dict) -> Optional[int]:
+        """
+        Registra el email y lo pasa a 'processing' en una transacción corta
+        
+        Args:
+            email_data: Dict con datos del email de Gmail
+        
+        Returns:
+            ID del email en BD, o None si no corresponde procesarlo
+        """
+        gmail_id = email_data.get('gmail_id')
+        
+        # Prioridad por keywords y perfil del remitente (calculada al capturar)
+        priority = (email_data.get('priority_score') or self._score(email_data))['prioridad']
+        
+        with session_scope() as session:
+            # Upsert por gmail_id: un re-intento o un worker concurrente
+            # no choca con la clave única
+            upsert(session, EmailProcesado, [{
+                'gmail_id': gmail_id,
+                'thread_id': email_data.get('thread_id'),
+                'sender_email': email_data.get('sender_email', 'Desconocido'),
+                'sender_name': email_data.get('sender_name'),
+                'subject': email_data.get('subject', 'Sin asunto'),
+                'body_text': email_data.get('body_text', ''),
+                'received_date': email_data.get('received_date', datetime.now()),
+                'has_attachments': email_data.get('has_attachments', False),
+                'attachment_count': email_data.get('attachment_count', 0),
+                'priority': priority,
+                'status': 'pending',
+                'attempts': 0
+            }], index_elements=['gmail_id'], update_columns=[
+                'thread_id', 'sender_name', 'subject', 'body_text',
+                'has_attachments', 'attachment_count', 'priority'
+            ])
+            email_obj = session.query(EmailProcesado).filter(
+                EmailProcesado.gmail_id == gmail_id
+            ).with_for_update().one()
+            
+            if not is_claimable(email_obj.status, email_obj.attempts, email_obj.processing_started_at):
+                return None
+            
+            # HTML comprimido aparte (solo lo lee el detalle del dashboard)
+            store_bodies(session, [{'email_id': email_obj.id, 'body_html': email_data.get('body_html')}])
+            
+            if is_stuck(email_obj.status, email_obj.processing_started_at):
+                transition(email_obj, 'error', 'Atascado en processing (worker interrumpido)')
+            
+            transition(email_obj, 'processing')
+            return email_obj.id
+    
+    def _process_single_email(self, email_data: Dict,
+                              heartbeat: Optional[Callable] = None) -> Dict:
         """
         Procesa un email individual
         
         Args:
             email_data: Dict con datos del email de Gmail
+            heartbeat: Se llama con la sesión entre etapas largas (adjuntos,
+                       IA); la cola lo usa para renovar el lease del trabajo
         
         Returns:
             Dict con resultado del procesamiento
@@ -131,28 +471,24 @@ class EmailProcessor:
         
         gmail_id = email_data.get('gmail_id')
         subject = email_data.get('subject', 'Sin asunto')
-        sender = email_data.get('sender_email', 'Desconocido')
+        email_id = None
+        agotado = False
+        start = time.perf_counter()
         
         logger.info(f"📨 Procesando: {subject[:50]}...")
         
         try:
+            # 1. Registrar email y marcarlo 'processing'
+            email_id = self._claim_email(email_data)
+            
+            if email_id is None:
+                # Terminado, sin intentos o tomado por otro worker
+                logger.info("   ⏭️ Email ya procesado o en curso, se omite")
+                result['success'] = True
+                return result
+            
             with session_scope() as session:
-                # 1. Guardar email en BD
-                email_obj = EmailProcesado(
-                    gmail_id=gmail_id,
-                    thread_id=email_data.get('thread_id'),
-                    sender_email=sender,
-                    sender_name=email_data.get('sender_name'),
-                    subject=subject,
-                    body_text=email_data.get('body_text', ''),
-                    body_html=email_data.get('body_html', ''),
-                    received_date=email_data.get('received_date', datetime.now()),
-                    has_attachments=email_data.get('has_attachments', False),
-                    attachment_count=email_data.get('attachment_count', 0),
-                    status='processing'
-                )
-                session.add(email_obj)
-                session.flush()  # Para obtener el ID
+                email_obj = session.get(EmailProcesado, email_id)
                 
                 tareas_creadas = []
                 
@@ -166,7 +502,8 @@ class EmailProcessor:
                             attachment_data = self._process_attachment(
                                 email_obj.id,
                                 attachment,
-                                session
+                                session,
+                                gmail_id=gmail_id
                             )
                             
                             if attachment_data:
@@ -175,14 +512,37 @@ class EmailProcessor:
                                 
                         except Exception as e:
                             logger.error(f"   ❌ Error procesando adjunto: {e}")
-                            continue
+                        
+                        if heartbeat:
+                            heartbeat(session)
                 
-                # 3. Procesar texto del email con IA (si no hay adjuntos o como complemento)
+                # 3. Procesar texto del email: primero por similitud con
+                # emails históricos, con IA solo si la confianza es baja
                 body_text = email_data.get('body_text', '').strip()
                 if body_text and len(body_text) > 20:  # Solo si hay contenido relevante
-                    logger.info("   🤖 Procesando texto con IA...")
+                    similarity_index = get_similarity_index()
+                    prediction = similarity_index.predict(subject, body_text) \
+                        if similarity_index else None
+                    # El índice solo aporta prioridad / resultado: los campos
+                    # de la tarea salen del texto (regex) o de la IA
+                    campos = extract_fields(f"{subject}\n{body_text}")
                     
-                    parsed_data = self.gpt_parser.parse_email_text(body_text, subject)
+                    if prediction and prediction['confianza'] >= MIN_CONFIDENCE and \
+                            (campos['codigo_cobertor'] or campos['cuartel']):
+                        logger.info(
+                            f"   🧭 Clasificado por similitud: {prediction['prioridad']} "
+                            f"(confianza {prediction['confianza']:.2f})"
+                        )
+                        parsed_data = self._similarity_task(subject, prediction, campos)
+                    else:
+                        if heartbeat:
+                            heartbeat(session)
+                        logger.info("   🤖 Procesando texto con IA...")
+                        parsed_data = self.gpt_parser.parse_email_text(body_text, subject)
+                        
+                        if not parsed_data and prediction and prediction['confianza'] >= REVIEW_CONFIDENCE:
+                            # La IA no extrajo datos: usar la predicción, marcada para revisión
+                            parsed_data = self._similarity_task(subject, prediction, campos, revisar=True)
                     
                     if parsed_data:
                         tareas_creadas.append(parsed_data)
@@ -197,12 +557,13 @@ class EmailProcessor:
                             'prioridad': 'normal',
                             'descripcion': f'Revisar email: {subject[:80]}',
                             'notas': f'Email requiere revisión manual. Contenido: {body_text[:200]}...',
-                            'urgente': 'urgente' in subject.lower() or 'crítico' in subject.lower(),
+                            'urgente': is_urgent(subject),
                             'origen': 'fallback_revision'
                         }
                         tareas_creadas.append(tarea_generica)
                                 
                 # 4. Crear tareas en BD
+                prioridades = []
                 if tareas_creadas:
                     for tarea_data in tareas_creadas:
                         tarea = Tarea(
@@ -214,16 +575,30 @@ class EmailProcessor:
                             prioridad=tarea_data.get('prioridad', 'normal'),
                             observaciones=tarea_data.get('descripcion'),
                             estado='pendiente',
-                            fecha_solicitud=datetime.now()
+                            fecha_solicitud=datetime.now(),
+                            confianza_clasificacion=tarea_data.get('confianza_clasificacion'),
+                            metodo_clasificacion=tarea_data.get('metodo_clasificacion', 'manual'),
+                            requiere_revision_humana=tarea_data.get('requiere_revision_humana', False),
+                            razon_revision=tarea_data.get('razon_revision')
                         )
                         session.add(tarea)
+                        prioridades.append(tarea.prioridad)
                         result['tareas_creadas'] += 1
                     
                     logger.info(f"   ✅ {result['tareas_creadas']} tarea(s) creada(s)")
                 
                 # 5. Actualizar status del email
-                email_obj.status = 'processed' if result['tareas_creadas'] > 0 else 'no_data'
-                email_obj.processed_date = datetime.now()
+                transition(email_obj, 'processed' if result['tareas_creadas'] > 0 else 'no_data')
+                
+                # 5b. Actualizar rollup diario (misma transacción)
+                apply_increments(session, email_increments(
+                    email_obj.sender_email,
+                    email_obj.received_date,
+                    email_obj.processed_date,
+                    email_obj.status,
+                    prioridades,
+                    prioridad_email=email_obj.priority
+                ))
                 
                 # 6. Crear alerta si hay tareas urgentes
                 if any(t.get('urgente') for t in tareas_creadas):
@@ -231,47 +606,106 @@ class EmailProcessor:
                         tipo='tarea_urgente',
                         titulo=f"Tarea urgente: {subject[:50]}",
                         descripcion=f"{result['tareas_creadas']} tarea(s) urgente(s) detectada(s)",
+                        email_id=email_obj.id,
                         severidad='alta',
                         leida=False
                     )
                     session.add(alerta)
                     logger.info("   🚨 Alerta de urgencia creada")
-                
-                # 7. Marcar email como leído en Gmail
-                try:
-                    self.gmail_client.mark_as_read(gmail_id)
-                except Exception as e:
-                    logger.warning(f"   ⚠️ No se pudo marcar como leído: {e}")
-                
-                result['success'] = True
+            
+            # 7. Marcar email como leído en Gmail (después del commit)
+            try:
+                self.gmail_client.mark_as_read(gmail_id)
+            except Exception as e:
+                logger.warning(f"   ⚠️ No se pudo marcar como leído: {e}")
+            
+            # 8. Aprendizaje continuo (buffer en memoria, flush por lotes)
+            if self.learner:
+                self.learner.observe_email(email_data.get('sender_email', ''), subject)
+            
+            result['success'] = True
                 
         except Exception as e:
             logger.error(f"❌ Error procesando email {gmail_id}: {e}")
+            result['error'] = str(e)
             
-            # Intentar guardar error en BD
+            # Registrar el error en el email y como alerta
             try:
                 with session_scope() as err_session:
+                    if email_id is not None:
+                        email_obj = err_session.get(EmailProcesado, email_id)
+                        if email_obj is not None and email_obj.status == 'processing':
+                            transition(email_obj, 'error', str(e))
+                            agotado = is_exhausted(email_obj.status, email_obj.attempts, None)
+                    
                     alerta = Alerta(
                         tipo='error_procesamiento',
                         titulo=f"Error procesando: {subject[:50]}",
                         descripcion=str(e),
+                        email_id=email_id,
                         severidad='media',
                         leida=False
                     )
                     err_session.add(alerta)
-            except:
-                pass
+            except Exception as err:
+                logger.error(f"   ❌ No se pudo registrar el error: {err}")
+            
+            if agotado:
+                # Último intento: no volverá a reclamarse, que no ocupe la bandeja
+                logger.warning(f"   📪 Sin intentos restantes: {gmail_id} fuera de no leídos")
+                self.gmail_client.mark_dead_letter([gmail_id])
         
+        resultado = 'ok' if result['success'] else 'error'
+        EMAIL_SECONDS.observe(time.perf_counter() - start, resultado=resultado)
+        EMAILS_TOTAL.inc(resultado=resultado)
         return result
     
-    def _process_attachment(self, email_id: int, attachment: Dict, session) -> Optional[List[Dict]]:
+    def _similarity_task(self, subject: str, prediction: Dict, campos: Dict,
+                         revisar: bool = False) -> Dict:
+        """
+        Tarea a partir de la predicción del índice de similitud
+        
+        Args:
+            subject: Asunto del email
+            prediction: Resultado de SimilarityIndex.predict()
+            campos: Campos extraídos del texto (extract_fields)
+            revisar: Marcar la tarea para revisión humana
+        
+        Returns:
+            Dict con datos de la tarea (mismo formato que el parser IA)
+        """
+        razon = None
+        if revisar:
+            razon = f"Clasificación por similitud con confianza baja ({prediction['confianza']:.2f})"
+        elif not (campos['codigo_cobertor'] or campos['cuartel']):
+            razon = "Sin código ni cuartel identificados en el email"
+        elif prediction['resultado'] == 'cancelada':
+            razon = "Emails similares terminaron en tareas canceladas"
+        
+        return {
+            **campos,
+            'prioridad': prediction['prioridad'],
+            'descripcion': subject[:100] if razon is None else f'Revisar email: {subject[:80]}',
+            'notas': f"Similar al email #{prediction['email_id']} (similitud {prediction['similitud']:.2f})",
+            'urgente': prediction['prioridad'] == 'urgente' or is_urgent(subject),
+            'origen': 'similitud',
+            'metodo_clasificacion': 'similitud',
+            'confianza_clasificacion': prediction['confianza'],
+            'requiere_revision_humana': razon is not None,
+            'razon_revision': razon
+        }
+    
+    def _process_attachment(self, email_id: int, attachment: Dict, session,
+                            gmail_id: Optional[str] = None) -> Optional[List[Dict]]:
         """
         Procesa un adjunto individual
         
         Args:
             email_id: ID del email en BD
-            attachment: Dict con datos del adjunto
+            attachment: Dict con datos del adjunto (path, o descriptor de
+                        GmailClient que se descarga recién aquí)
             session: Sesión de SQLAlchemy
+            gmail_id: ID del mensaje en Gmail (para descargar el adjunto)
         
         Returns:
             Lista de diccionarios con datos extraídos
@@ -279,6 +713,13 @@ class EmailProcessor:
         filename = attachment.get('filename', 'unknown')
         file_path = attachment.get('path')
         
+        if not file_path:
+            # Descarga perezosa: solo los tipos que se saben procesar
+            if not is_supported(filename):
+                logger.info(f"   ⏭️ Adjunto no soportado, no se descarga: {filename}")
+                return None
+            file_path = self.gmail_client.save_attachment(gmail_id, attachment)
+        
         if not file_path or not os.path.exists(file_path):
             logger.warning(f"   ⚠️ Archivo no encontrado: {filename}")
             return None
@@ -337,24 +778,64 @@ class EmailProcessor:
             return False
 
 
+@lru_cache(maxsize=1)
+def get_processor() -> EmailProcessor:
+    """Instancia compartida por proceso (Gmail, Gemini y BD se inicializan una vez)"""
+    return EmailProcessor()
+
+
 def run_processor(max_emails: int = 50):
     """
     Función helper para ejecutar el procesador
     
+    Reutiliza el mismo EmailProcessor entre llamadas.
+    
     Usage:
         from data_processing.email_processor import run_processor
         run_processor(max_emails=10)
     """
-    processor = EmailProcessor()
-    return processor.process_new_emails(max_emails)
+    return get_processor().process_new_emails(max_emails)
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Procesador de emails')
+    parser.add_argument('--max-emails', type=int, default=10, help='Máximo de emails por ciclo')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Modo servicio: ciclos continuos hasta SIGINT/SIGTERM')
+    parser.add_argument('--interval', type=float, default=None,
+                        help='Segundos entre ciclos en modo servicio (PROCESSOR_POLL_SECONDS)')
+    parser.add_argument('--mode', choices=['inline', 'capture', 'worker'], default='inline',
+                        help='inline: capturar y procesar; capture: solo encolar; worker: solo procesar la cola')
+    
+    args = parser.parse_args()
+    setup_logging()
+    
     print("🤖 Bot de Cobertores - Procesador de Emails\n")
     
-    # Ejecutar procesamiento
     processor = EmailProcessor()
-    stats = processor.process_new_emails(max_emails=10)
     
-    print(f"\n🎉 Procesamiento completado!")
-    print(f"Timestamp: {stats['timestamp']}")
\ No newline at end of file
+    if args.daemon:
+        from data_processing.processor_service import ProcessorService, PollScheduler
+        
+        scheduler = PollScheduler(args.interval) if args.interval else None
+        service = ProcessorService(processor, max_emails=args.max_emails,
+                                   scheduler=scheduler, mode=args.mode)
+        service.install_signal_handlers()
+        totals = service.run()
+        
+        print(f"\n🎉 Servicio detenido: {totals['ciclos']} ciclos, {totals['emails_procesados']} emails")
+    else:
+        # Ejecutar procesamiento
+        if args.mode == 'capture':
+            stats = processor.capture_to_queue(max_emails=args.max_emails)
+        elif args.mode == 'worker':
+            stats = processor.process_queue(max_jobs=args.max_emails)
+        else:
+            stats = processor.process_new_emails(max_emails=args.max_emails)
+        
+        record_snapshot(force=True)
+        
+        print(f"\n🎉 Procesamiento completado!")
+        print(f"Timestamp: {stats['timestamp']}")
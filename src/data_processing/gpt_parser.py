@@ -4,31 +4,53 @@ Usa Google Gemini API para procesar texto y extraer datos estructurados
 """
 
 import os
+import re
 import json
+import time
+import random
 import logging
 from typing import Dict, List, Optional
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+from monitoring.metrics import GEMINI_SECONDS, GEMINI_TOKENS, API_RETRIES
+
 logger = logging.getLogger(__name__)
 
-# Cargar variables de entorno
-load_dotenv()
+# Re-intentos ante 429 (cuota) y errores 5xx de Gemini
+MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', '3'))
+BACKOFF_SECONDS = float(os.getenv('GEMINI_BACKOFF_SECONDS', '2'))
+
+# Extracción sin IA de los mismos campos del prompt (ver extract_fields)
+_CODIGO_RE = re.compile(r'\b(COB-?\d+|OC-[\d-]*\d|C\d{6,})\b', re.I)
+_PEDIDO_RE = re.compile(r'\bpedido\s*(?:n[°º.]?|#)?\s*(\d{3,})\b', re.I)
+_CUARTEL_RE = re.compile(r'\b(?:cuartel|sector)\s+(?:n[°º.]?\s*)?(\w+)', re.I)
+_HILERAS_RE = re.compile(r'\b(\d{1,4})\s+(?:hileras|filas)\b', re.I)
+_LARGO_RE = re.compile(r'\b(\d+(?:[.,]\d+)?)\s*(?:m|mts|metros)\b', re.I)
 
 class GeminiParser:
     """Parser que usa Gemini para extraer datos estructurados de emails"""
     
-    def __init__(self):
-        """Inicializa el cliente de Gemini"""
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY no encontrada en .env")
+    def __init__(self, client=None):
+        """
+        Inicializa el cliente de Gemini
         
-        # Configurar cliente con nueva API
-        self.client = genai.Client(api_key=api_key)
+        Args:
+            client: Cliente con la interfaz de genai.Client (por defecto uno
+                    real con GEMINI_API_KEY; benchmarks usan uno simulado)
+        """
+        if client is None:
+            api_key = os.getenv('GEMINI_API_KEY')
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY no encontrada en .env")
+            
+            # google-genai tarda ~0.5 s en importarse: solo si se crea un cliente real
+            from google import genai
+            
+            # Configurar cliente con nueva API
+            client = genai.Client(api_key=api_key)
+        
+        self.client = client
+        self.max_retries = MAX_RETRIES
+        self.backoff_seconds = BACKOFF_SECONDS
         logger.info("✅ Gemini Parser inicializado correctamente")
     
     def parse_email_text(self, email_text: str, email_subject: str = "") -> Optional[Dict]:
@@ -49,10 +71,14 @@ class GeminiParser:
             # Llamar a Gemini con nuevo modelo
             logger.info("🤖 Enviando texto a Gemini para procesamiento...")
             
-            response = self.client.models.generate_content(
-                model='models/gemini-2.5-flash',
-                contents=prompt
-            )
+            start = time.perf_counter()
+            try:
+                response = self._generate(prompt)
+            except Exception:
+                GEMINI_SECONDS.observe(time.perf_counter() - start, resultado='error')
+                raise
+            GEMINI_SECONDS.observe(time.perf_counter() - start, resultado='ok')
+            self._record_usage(response)
             
             # Extraer texto de respuesta
             response_text = response.text.strip()
@@ -78,6 +104,37 @@ class GeminiParser:
             logger.error(f"❌ Error en parse_email_text: {e}")
             return None
     
+    def _generate(self, prompt: str):
+        """Llama a Gemini con backoff exponencial ante 429 / 5xx"""
+        from google.genai import errors as genai_errors
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.client.models.generate_content(
+                    model='models/gemini-2.5-flash',
+                    contents=prompt
+                )
+            except genai_errors.APIError as e:
+                code = e.code or 0
+                if attempt >= self.max_retries or not (code == 429 or code >= 500):
+                    raise
+                API_RETRIES.inc(api='gemini', codigo=str(code))
+                delay = self.backoff_seconds * 2 ** attempt
+                logger.warning(f"⏳ Gemini respondió {code}, reintentando en ~{delay:.1f}s...")
+                time.sleep(delay * (0.5 + random.random() / 2))
+    
+    def _record_usage(self, response):
+        """Suma los tokens informados por Gemini a las métricas"""
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is None:
+            return
+        for tipo, campo in (('prompt', 'prompt_token_count'),
+                            ('respuesta', 'candidates_token_count'),
+                            ('razonamiento', 'thoughts_token_count')):
+            tokens = getattr(usage, campo, None)
+            if tokens:
+                GEMINI_TOKENS.inc(tokens, tipo=tipo)
+    
     def parse_batch(self, emails: List[Dict]) -> List[Dict]:
         """
         Procesa múltiples emails en batch
@@ -232,19 +289,19 @@ Responde ÚNICAMENTE con el objeto JSON, sin bloques de código ni explicaciones
             'hileras': self._normalize_int(data.get('hileras')),
             'largo_metros': self._normalize_float(data.get('largo_metros')),
             'prioridad': self._normalize_priority(data.get('prioridad')),
-            'descripcion': self._normalize_string(data.get('descripcion', ''))[:100],
-            'notas': self._normalize_string(data.get('notas', ''))[:500],
-            'urgente': data.get('prioridad', '').lower() == 'alta',
+            'descripcion': self._normalize_string(data.get('descripcion'), max_length=100),
+            'notas': self._normalize_string(data.get('notas'), max_length=500),
+            'urgente': str(data.get('prioridad') or '').lower() == 'alta',
             'origen': 'texto_email'
         }
         
         return normalized
     
-    def _normalize_string(self, value) -> Optional[str]:
-        """Normaliza strings"""
+    def _normalize_string(self, value, max_length: Optional[int] = None) -> Optional[str]:
+        """Normaliza strings (Gemini responde null en campos sin dato)"""
         if value is None or value == 'null':
             return None
-        return str(value).strip() or None
+        return str(value).strip()[:max_length] or None
     
     def _normalize_int(self, value) -> Optional[int]:
         """Normaliza enteros"""
@@ -278,6 +335,31 @@ Responde ÚNICAMENTE con el objeto JSON, sin bloques de código ni explicaciones
             return 'normal'
 
 
+def extract_fields(text: str) -> Dict:
+    """
+    Extrae con expresiones regulares los campos estructurados del prompt
+    (código, cuartel, hileras, largo); no reemplaza a Gemini en emails
+    libres, solo cubre los formatos habituales
+
+    Args:
+        text: Asunto y cuerpo del email
+
+    Returns:
+        Dict con codigo_cobertor, cuartel, hileras y largo_metros (None si no aparecen)
+    """
+    text = text or ''
+    codigo = _CODIGO_RE.search(text) or _PEDIDO_RE.search(text)
+    cuartel = _CUARTEL_RE.search(text)
+    hileras = _HILERAS_RE.search(text)
+    largo = _LARGO_RE.search(text)
+    return {
+        'codigo_cobertor': codigo.group(1).upper() if codigo else None,
+        'cuartel': cuartel.group(1) if cuartel else None,
+        'hileras': int(hileras.group(1)) if hileras else None,
+        'largo_metros': float(largo.group(1).replace(',', '.')) if largo else None,
+    }
+
+
 # Función helper para uso rápido
 def parse_email(email_text: str, email_subject: str = "") -> Optional[Dict]:
     """
@@ -0,0 +1,222 @@
+"""
+Processor Service - Modo residente del procesador de emails
+
+Mantiene un único EmailProcessor (Gmail autenticado, etiqueta resuelta,
+cliente Gemini, pool de MySQL, cachés de perfiles y similitud) y ejecuta
+ciclos de process_new_emails con un planificador de sondeo:
+
+- con trabajo: el siguiente ciclo va de inmediato (cola con backlog)
+- sin emails nuevos: el intervalo crece hasta PROCESSOR_IDLE_MAX_SECONDS
+- con errores: backoff exponencial hasta PROCESSOR_ERROR_MAX_SECONDS
+
+Modos (cola durable, ver database/work_queue.py):
+- inline: captura y procesa en el mismo ciclo (process_new_emails)
+- capture: solo captura y encola (capture_to_queue)
+- worker: solo procesa trabajos de la cola (process_queue); se pueden
+  levantar varios workers, también en otras máquinas con la misma BD
+
+SIGINT / SIGTERM terminan el ciclo en curso, guardan el aprendizaje
+pendiente y cierran las conexiones.
+
+Uso:
+    python src/data_processing/email_processor.py --daemon
+    python src/data_processing/email_processor.py --daemon --mode capture
+    python src/data_processing/email_processor.py --daemon --mode worker
+"""
+
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+from typing import Dict, Optional
+
+# Añadir path para imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import db_manager
+from gmail_capture import gmail_session
+from monitoring.metrics import CYCLE_SECONDS, record_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+POLL_SECONDS = float(os.getenv('PROCESSOR_POLL_SECONDS', '30'))
+IDLE_MAX_SECONDS = float(os.getenv('PROCESSOR_IDLE_MAX_SECONDS', '300'))
+ERROR_MAX_SECONDS = float(os.getenv('PROCESSOR_ERROR_MAX_SECONDS', '900'))
+BATCH_SIZE = int(os.getenv('PROCESSOR_BATCH_SIZE', '50'))
+
+# Modo → método de EmailProcessor que ejecuta un ciclo
+MODES = {
+    'inline': 'process_new_emails',
+    'capture': 'capture_to_queue',
+    'worker': 'process_queue',
+}
+
+
+class PollScheduler:
+    """Calcula la espera entre ciclos según el resultado del anterior"""
+
+    def __init__(self, poll_seconds: float = POLL_SECONDS,
+                 idle_max_seconds: float = IDLE_MAX_SECONDS,
+                 error_max_seconds: float = ERROR_MAX_SECONDS,
+                 factor: float = 2.0):
+        self.poll_seconds = poll_seconds
+        self.idle_max_seconds = max(idle_max_seconds, poll_seconds)
+        self.error_max_seconds = max(error_max_seconds, poll_seconds)
+        self.factor = factor
+        self.delay = poll_seconds
+        self.consecutive_errors = 0
+
+    def next_delay(self, processed: int, failed: bool, batch_full: bool = False) -> float:
+        """
+        Args:
+            processed: Emails procesados en el ciclo
+            failed: El ciclo terminó con error
+            batch_full: Se alcanzó max_emails (probablemente quedan más)
+
+        Returns:
+            Segundos de espera antes del siguiente ciclo
+        """
+        if failed:
+            self.consecutive_errors += 1
+            self.delay = min(self.poll_seconds * self.factor ** self.consecutive_errors,
+                             self.error_max_seconds)
+            return self.delay
+
+        self.consecutive_errors = 0
+        if batch_full:
+            self.delay = self.poll_seconds
+            return 0.0
+        if processed:
+            self.delay = self.poll_seconds
+        else:
+            self.delay = min(self.delay * self.factor, self.idle_max_seconds)
+        return self.delay
+
+
+class ProcessorService:
+    """Ejecuta EmailProcessor en ciclos con clientes persistentes"""
+
+    def __init__(self, processor=None, max_emails: int = BATCH_SIZE,
+                 scheduler: Optional[PollScheduler] = None, mode: str = 'inline'):
+        """
+        Args:
+            processor: EmailProcessor ya inicializado (por defecto se crea uno)
+            max_emails: Máximo de emails por ciclo
+            scheduler: Planificador de sondeo
+            mode: 'inline', 'capture' o 'worker'
+        """
+        if mode not in MODES:
+            raise ValueError(f"Modo inválido: {mode} (opciones: {', '.join(MODES)})")
+
+        if processor is None:
+            from data_processing.email_processor import EmailProcessor
+            processor = EmailProcessor()
+
+        self.processor = processor
+        self.max_emails = max_emails
+        self.mode = mode
+        self.scheduler = scheduler or PollScheduler()
+        self.cycles = 0
+        self.totals = {'emails_encolados': 0, 'emails_procesados': 0, 'tareas_creadas': 0, 'errores': 0}
+        self._stop = threading.Event()
+
+    def install_signal_handlers(self):
+        """SIGINT / SIGTERM piden detener el servicio al terminar el ciclo"""
+        def handle(signum, frame):
+            logger.info(f"🛑 Señal {signal.Signals(signum).name} recibida, deteniendo tras el ciclo actual...")
+            self.stop()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                signal.signal(sig, handle)
+            except ValueError:
+                # Solo el hilo principal puede instalar handlers
+                logger.warning("⚠️ Handlers de señales no instalados (no es el hilo principal)")
+                return
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def run_cycle(self) -> Dict:
+        """Ejecuta un ciclo y retorna sus estadísticas (con 'duracion_ms')"""
+        start = time.perf_counter()
+        try:
+            stats = getattr(self.processor, MODES[self.mode])(self.max_emails)
+        except Exception as e:
+            logger.error(f"❌ Error en el ciclo {self.cycles + 1}: {e}")
+            stats = {'emails_procesados': 0, 'emails_omitidos': 0, 'tareas_creadas': 0,
+                     'errores': 1, 'fallo_ciclo': True}
+        stats['duracion_ms'] = (time.perf_counter() - start) * 1000
+        CYCLE_SECONDS.observe(stats['duracion_ms'] / 1000, modo=self.mode)
+        record_snapshot()
+
+        self.cycles += 1
+        for key in self.totals:
+            self.totals[key] += stats.get(key, 0)
+        return stats
+
+    def run(self, max_cycles: Optional[int] = None) -> Dict:
+        """
+        Bucle principal hasta recibir una señal (o completar max_cycles)
+
+        Args:
+            max_cycles: Número de ciclos a ejecutar (None = indefinido)
+
+        Returns:
+            Dict con totales acumulados
+        """
+        logger.info(
+            f"🔁 Servicio iniciado en modo {self.mode}: hasta {self.max_emails} emails por ciclo, "
+            f"sondeo cada {self.scheduler.poll_seconds:.0f}s"
+        )
+
+        try:
+            while not self.stopping:
+                stats = self.run_cycle()
+
+                processed = stats.get('emails_procesados', 0) + stats.get('emails_encolados', 0)
+                failed = bool(stats.get('fallo_ciclo')) or (stats.get('errores', 0) > 0 and not processed)
+                delay = self.scheduler.next_delay(
+                    processed, failed,
+                    batch_full=processed > 0 and stats.get('emails_listados', 0) >= self.max_emails
+                )
+
+                logger.info(
+                    f"⏱️ Ciclo {self.cycles} ({self.mode}): {processed} emails en "
+                    f"{stats['duracion_ms']:.0f} ms, siguiente en {delay:.0f}s"
+                )
+
+                if max_cycles is not None and self.cycles >= max_cycles:
+                    break
+
+                # Espera interrumpible por stop()
+                self._stop.wait(delay)
+        finally:
+            self.shutdown()
+
+        return {'ciclos': self.cycles, **self.totals}
+
+    def shutdown(self):
+        """Guarda el aprendizaje pendiente y cierra el pool de conexiones"""
+        learner = getattr(self.processor, 'learner', None)
+        if learner:
+            learner.flush()
+        
+        record_snapshot(force=True)
+        gmail_session.shutdown()
+
+        if db_manager.engine is not None:
+            db_manager.engine.dispose()
+
+        logger.info(
+            f"👋 Servicio detenido tras {self.cycles} ciclos: "
+            f"{self.totals['emails_procesados']} emails, {self.totals['tareas_creadas']} tareas, "
+            f"{self.totals['errores']} errores"
+        )
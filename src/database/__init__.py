@@ -0,0 +1,8 @@
+# Cargar .env antes de que los módulos del paquete lean os.getenv
+try:
+    from app_config import load_env
+except ImportError:
+    # Importado como src.<paquete> (raíz del proyecto en el path, no src/)
+    from ..app_config import load_env
+
+load_env()
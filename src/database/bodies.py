@@ -0,0 +1,177 @@
+"""
+Cuerpos HTML comprimidos (tabla email_cuerpos)
+
+El HTML de los emails es lo más pesado de emails_procesados y solo lo usa
+el detalle del dashboard (/api/email/<id>). Vive comprimido en una tabla
+aparte: los SELECT sobre emails_procesados (listados, búsqueda, estados,
+índice de similitud) no lo arrastran.
+
+Codec: zstd si está instalado `zstandard`, zlib (stdlib) si no. Cada fila
+guarda su codec, así que se pueden mezclar; leer una fila zstd requiere
+`zstandard`. EMAIL_BODY_CODEC fuerza uno de los dos.
+
+Uso:
+    from database.bodies import store_bodies, load_body
+    store_bodies(session, [{'email_id': 1, 'body_html': html}])
+    html = load_body(session, 1)
+"""
+
+import os
+import zlib
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.exc import DBAPIError
+
+from .models import EmailCuerpo
+from .upsert import upsert
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+CODEC = os.getenv('EMAIL_BODY_CODEC', 'zstd' if zstandard else 'zlib')
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+if CODEC not in ('zstd', 'zlib'):
+    raise ValueError(f"EMAIL_BODY_CODEC inválido: {CODEC} (usar 'zstd' o 'zlib')")
+if CODEC == 'zstd' and zstandard is None:
+    raise ImportError("EMAIL_BODY_CODEC=zstd requiere el paquete 'zstandard'")
+
+
+def compress_body(html: str, codec: str = CODEC) -> Tuple[str, bytes]:
+    """
+    Comprime un cuerpo HTML
+
+    Args:
+        html: HTML del email
+        codec: 'zstd' o 'zlib'
+
+    Returns:
+        (codec, bytes comprimidos)
+    """
+    data = html.encode('utf-8')
+    if codec == 'zstd':
+        return codec, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return 'zlib', zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress_body(codec: str, data: Optional[bytes]) -> str:
+    """
+    Descomprime un cuerpo guardado con compress_body()
+
+    Args:
+        codec: Codec de la fila
+        data: Bytes comprimidos
+
+    Returns:
+        HTML ('' si no hay datos)
+    """
+    if not data:
+        return ''
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("El cuerpo está comprimido con zstd: instalar 'zstandard'")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return zlib.decompress(data).decode('utf-8')
+
+
+def store_bodies(session, rows: Iterable[Dict]) -> int:
+    """
+    Comprime y guarda (o reemplaza) el HTML de uno o más emails
+
+    Args:
+        session: Sesión de SQLAlchemy (no hace commit)
+        rows: Dicts con email_id y body_html (los vacíos se omiten)
+
+    Returns:
+        Número de cuerpos guardados
+    """
+    values = []
+    for row in rows:
+        html = row.get('body_html')
+        if not html:
+            continue
+        codec, data = compress_body(html)
+        values.append({
+            'email_id': row['email_id'],
+            'codec': codec,
+            'body_html': data,
+            'size_original': len(html.encode('utf-8')),
+            'size_comprimido': len(data),
+        })
+
+    return upsert(session, EmailCuerpo, values, index_elements=['email_id'],
+                  update_columns=['codec', 'body_html', 'size_original', 'size_comprimido'])
+
+
+def load_body(session, email_id: int) -> str:
+    """
+    HTML de un email ('' si no tiene)
+
+    Args:
+        session: Sesión de SQLAlchemy
+        email_id: ID en emails_procesados
+    """
+    row = session.query(EmailCuerpo.codec, EmailCuerpo.body_html).filter(
+        EmailCuerpo.email_id == email_id
+    ).first()
+    return decompress_body(*row) if row else ''
+
+
+def storage_report(session) -> Dict:
+    """
+    Tamaño de los cuerpos guardados
+
+    Returns:
+        Dict con cuerpos, bytes_originales, bytes_comprimidos, ratio y
+        cuerpos por codec
+    """
+    cuerpos, original, comprimido = session.query(
+        func.count(EmailCuerpo.email_id),
+        func.coalesce(func.sum(EmailCuerpo.size_original), 0),
+        func.coalesce(func.sum(EmailCuerpo.size_comprimido), 0),
+    ).one()
+    por_codec = dict(session.query(EmailCuerpo.codec, func.count(EmailCuerpo.email_id))
+                     .group_by(EmailCuerpo.codec).all())
+    return {
+        'cuerpos': cuerpos,
+        'bytes_originales': int(original),
+        'bytes_comprimidos': int(comprimido),
+        'ratio': round(original / comprimido, 2) if comprimido else None,
+        'por_codec': por_codec,
+    }
+
+
+def table_sizes(session, tables: Sequence[str]) -> Dict[str, int]:
+    """
+    Tamaño en disco (datos + índices) de tablas
+
+    MySQL lo lee de information_schema (estimado por InnoDB); SQLite de la
+    tabla virtual dbstat, si el build la incluye.
+
+    Returns:
+        Dict tabla → bytes (vacío si el motor no lo informa)
+    """
+    dialect = session.get_bind().dialect.name
+    params = {f't{i}': name for i, name in enumerate(tables)}
+    names = ', '.join(f':{key}' for key in params)
+
+    if dialect == 'mysql':
+        sql = (f"SELECT table_name, data_length + index_length FROM information_schema.TABLES "
+               f"WHERE table_schema = DATABASE() AND table_name IN ({names})")
+    elif dialect == 'sqlite':
+        # Incluye los índices de cada tabla (dbstat los lista por nombre de índice)
+        sql = (f"SELECT m.tbl_name, SUM(d.pgsize) FROM dbstat d "
+               f"JOIN sqlite_master m ON m.name = d.name "
+               f"WHERE m.tbl_name IN ({names}) GROUP BY m.tbl_name")
+    else:
+        return {}
+
+    try:
+        return {name: int(size or 0) for name, size in session.execute(text(sql), params)}
+    except DBAPIError:
+        return {}
@@ -1,16 +1,67 @@
 """
-Gestión de Conexión a Base de Datos MySQL
+Gestión de Conexión a Base de Datos
+
+Por defecto MySQL (variables DB_*). DATABASE_URL permite cualquier otro
+backend de SQLAlchemy, por ejemplo SQLite para correr el pipeline, el
+dashboard y los benchmarks sin servicios:
+
+    DATABASE_URL=sqlite:///data/bot_cobertores.db   # archivo (WAL)
+    DATABASE_URL=sqlite://                          # en memoria
 """
 
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.pool import QueuePool
-from dotenv import load_dotenv
+from sqlalchemy.pool import QueuePool, StaticPool
 from .models import Base
+from .search import ensure_sqlite_fts
+from monitoring.metrics import DB_TRANSACTION_SECONDS
+
+
+# PRAGMAs aplicados a cada conexión SQLite
+SQLITE_PRAGMAS = {
+    'foreign_keys': 'ON',
+    'synchronous': 'NORMAL',      # Seguro con WAL, evita fsync por commit
+    'temp_store': 'MEMORY',
+    'cache_size': '-65536',       # 64 MB de page cache
+    'mmap_size': '268435456',     # 256 MB de lectura mapeada en memoria
+    'busy_timeout': '5000',       # Espera locks de escritura en vez de fallar
+}
+
+
+def build_database_url() -> str:
+    """URL de conexión: DATABASE_URL si existe, si no MySQL desde DB_*"""
+    database_url = os.getenv('DATABASE_URL')
+    if database_url:
+        return database_url
+    
+    db_host = os.getenv('DB_HOST', 'localhost')
+    db_port = os.getenv('DB_PORT', '3306')
+    db_name = os.getenv('DB_NAME', 'bot_cobertores')
+    db_user = os.getenv('DB_USER', 'root')
+    db_password = os.getenv('DB_PASSWORD', '')
+    
+    return f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}?charset=utf8mb4"
+
 
-# Cargar variables de entorno
-load_dotenv()
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def _sqlite_pragmas(in_memory: bool):
+    """Listener 'connect' que configura cada conexión SQLite nueva"""
+    
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+    
+    return set_pragmas
 
 
 class DatabaseManager:
@@ -21,34 +72,49 @@ class DatabaseManager:
         self.session_factory = None
         self.Session = None
         
-    def initialize(self):
-        """Inicializa la conexión a la base de datos"""
+    def initialize(self, database_url: str = None):
+        """
+        Inicializa la conexión a la base de datos
         
-        # Obtener credenciales desde .env
-        db_host = os.getenv('DB_HOST', 'localhost')
-        db_port = os.getenv('DB_PORT', '3306')
-        db_name = os.getenv('DB_NAME', 'bot_cobertores')
-        db_user = os.getenv('DB_USER', 'root')
-        db_password = os.getenv('DB_PASSWORD', '')
+        Args:
+            database_url: URL de SQLAlchemy (por defecto DATABASE_URL o MySQL desde .env)
+        """
+        database_url = database_url or build_database_url()
+        url = make_url(database_url)
         
-        # Construir URL de conexión
-        database_url = f"mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}?charset=utf8mb4"
-        
-        # Crear engine con pool de conexiones
-        self.engine = create_engine(
-            database_url,
-            poolclass=QueuePool,
-            pool_size=5,
-            max_overflow=10,
-            pool_pre_ping=True,  # Verificar conexión antes de usar
-            echo=False  # True para debug SQL
-        )
+        if url.get_backend_name() == 'sqlite':
+            in_memory = _is_memory_sqlite(url)
+            
+            # En memoria: una sola conexión compartida, si no cada conexión
+            # tendría su propia base vacía
+            engine_kwargs = {'connect_args': {'check_same_thread': False}}
+            if in_memory:
+                engine_kwargs['poolclass'] = StaticPool
+            elif url.database:
+                os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+            
+            self.engine = create_engine(database_url, echo=False, **engine_kwargs)
+            event.listen(self.engine, 'connect', _sqlite_pragmas(in_memory))
+        else:
+            # Crear engine con pool de conexiones
+            self.engine = create_engine(
+                database_url,
+                poolclass=QueuePool,
+                pool_size=5,
+                max_overflow=10,
+                pool_pre_ping=True,  # Verificar conexión antes de usar
+                echo=False  # True para debug SQL
+            )
         
         # Crear session factory
         self.session_factory = sessionmaker(bind=self.engine)
         self.Session = scoped_session(self.session_factory)
         
-        print(f"✅ Conexión a base de datos establecida: {db_name}")
+        # SQLite no tiene migraciones: el esquema sale de los modelos
+        if url.get_backend_name() == 'sqlite':
+            self.create_tables()
+        
+        print(f"✅ Conexión a base de datos establecida: {url.get_backend_name()} ({url.database or ':memory:'})")
         
         return self
     
@@ -68,6 +134,7 @@ class DatabaseManager:
     def create_tables(self):
         """Crea todas las tablas si no existen"""
         Base.metadata.create_all(self.engine)
+        ensure_sqlite_fts(self.engine)
         print("✅ Tablas verificadas/creadas")
     
     def test_connection(self):
@@ -129,14 +196,18 @@ def session_scope():
             # Commit automático al salir
     """
     session = db_manager.get_session()
+    start = time.perf_counter()
+    resultado = 'commit'
     try:
         yield session
         session.commit()
     except Exception as e:
+        resultado = 'rollback'
         session.rollback()
         raise
     finally:
         session.close()
+        DB_TRANSACTION_SECONDS.observe(time.perf_counter() - start, resultado=resultado)
 
 def get_session():
     """
@@ -0,0 +1,131 @@
+"""
+Máquina de estados del procesamiento de emails
+
+    pending → processing → processed | no_data | error
+                  ↑                              │
+                  └────────── (re-intento) ──────┘
+
+Cada transición queda registrada en status_changed_at. Los emails que
+agotan sus intentos quedan en 'error' (is_exhausted) y los que llevan
+demasiado tiempo en 'processing' se consideran atascados; ambos se
+consultan con problem_emails() en vez de re-procesarse en silencio.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from .models import EmailProcesado
+
+
+EMAIL_STATUS_TRANSITIONS = {
+    'pending': ('processing',),
+    'processing': ('processed', 'no_data', 'error'),
+    'error': ('processing',),
+    'processed': (),
+    'no_data': (),
+}
+
+FINAL_STATUSES = ('processed', 'no_data')
+
+MAX_PROCESSING_ATTEMPTS = int(os.getenv('MAX_PROCESSING_ATTEMPTS', '3'))
+STUCK_AFTER = timedelta(minutes=int(os.getenv('STUCK_PROCESSING_MINUTES', '30')))
+
+
+class InvalidTransition(ValueError):
+    """Transición de estado no permitida"""
+
+
+def transition(email: EmailProcesado, new_status: str,
+               error_message: Optional[str] = None, now: Optional[datetime] = None):
+    """
+    Cambia el status de un email validando la transición
+
+    Args:
+        email: Email (objeto ORM) a actualizar
+        new_status: Status destino
+        error_message: Mensaje para el status 'error'
+        now: Momento de la transición (por defecto ahora)
+
+    Raises:
+        InvalidTransition: Si la transición no está permitida
+    """
+    current = email.status or 'pending'
+    if new_status not in EMAIL_STATUS_TRANSITIONS.get(current, ()):
+        raise InvalidTransition(f"Transición inválida: {current} → {new_status}")
+
+    now = now or datetime.now()
+    email.status = new_status
+    email.status_changed_at = now
+
+    if new_status == 'processing':
+        email.processing_started_at = now
+        email.attempts = (email.attempts or 0) + 1
+        email.error_message = None
+    elif new_status in FINAL_STATUSES:
+        email.processed_date = now
+    elif new_status == 'error':
+        email.error_message = (error_message or '')[:5000]
+
+
+def is_stuck(status: str, processing_started_at: Optional[datetime],
+             now: Optional[datetime] = None) -> bool:
+    """Un email está atascado si lleva más de STUCK_AFTER en 'processing'"""
+    if status != 'processing' or processing_started_at is None:
+        return False
+    return (now or datetime.now()) - processing_started_at > STUCK_AFTER
+
+
+def is_claimable(status: Optional[str], attempts: Optional[int],
+                 processing_started_at: Optional[datetime],
+                 now: Optional[datetime] = None) -> bool:
+    """
+    Indica si un email puede (re)procesarse
+
+    - pending: sí
+    - error: sí, mientras no agote MAX_PROCESSING_ATTEMPTS
+    - processing: solo si está atascado (el worker anterior murió)
+    - processed / no_data: no
+    """
+    if status in (None, 'pending'):
+        return True
+    if status == 'error':
+        return (attempts or 0) < MAX_PROCESSING_ATTEMPTS
+    if status == 'processing':
+        return is_stuck(status, processing_started_at, now) and \
+            (attempts or 0) < MAX_PROCESSING_ATTEMPTS
+    return False
+
+
+def is_exhausted(status: Optional[str], attempts: Optional[int],
+                 processing_started_at: Optional[datetime],
+                 now: Optional[datetime] = None) -> bool:
+    """
+    Indica si un email agotó sus intentos (terminal sin éxito)
+
+    En 'error' o atascado en 'processing' con MAX_PROCESSING_ATTEMPTS
+    intentos: no se vuelve a reclamar, así que debe salir de la bandeja
+    de no leídos (si no, ocupa para siempre la página que se lista).
+    """
+    if (attempts or 0) < MAX_PROCESSING_ATTEMPTS:
+        return False
+    return status == 'error' or is_stuck(status, processing_started_at, now)
+
+
+def problem_emails(session, limit: int = 100):
+    """
+    Emails con error o atascados en 'processing'
+
+    Args:
+        session: Sesión de SQLAlchemy
+        limit: Máximo de filas
+
+    Returns:
+        Lista de EmailProcesado ordenada por último cambio de estado
+    """
+    stuck_before = datetime.now() - STUCK_AFTER
+    return session.query(EmailProcesado).filter(
+        (EmailProcesado.status == 'error') |
+        ((EmailProcesado.status == 'processing') &
+         (EmailProcesado.processing_started_at < stuck_before))
+    ).order_by(EmailProcesado.status_changed_at.desc()).limit(limit).all()
@@ -6,14 +6,31 @@ Define las tablas como clases Python para fácil manejo
 from datetime import datetime
 from sqlalchemy import (
     Column, Integer, String, Text, DateTime, Boolean, 
-    Enum, DECIMAL, ForeignKey, JSON, Index, Float
+    Enum, Numeric, ForeignKey, JSON, Index, Float, Date, UniqueConstraint, LargeBinary
 )
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import declarative_base, relationship, deferred
 
 Base = declarative_base()
 
 
+# ============================================
+# VOCABULARIOS
+# ============================================
+# Enum genérico: ENUM nativo en MySQL, VARCHAR en SQLite u otros motores.
+
+EMAIL_STATUSES = ('pending', 'processing', 'processed', 'no_data', 'error')
+PRIORIDADES_TAREA = ('baja', 'normal', 'alta', 'urgente')
+ESTADOS_TAREA = ('pendiente', 'en_proceso', 'completada', 'cancelada')
+TIPOS_ALERTA = (
+    'conflicto', 'urgente', 'vencimiento', 'informativa',
+    'tarea_urgente', 'error_procesamiento'
+)
+SEVERIDADES_ALERTA = ('baja', 'media', 'alta', 'critica')
+ESTADOS_TRABAJO = ('pendiente', 'en_proceso', 'completado', 'fallido')
+TIPOS_CONFIGURACION = ('string', 'number', 'boolean', 'json')
+NIVELES_LOG = ('debug', 'info', 'warning', 'error', 'critical')
+
+
 class EmailProcesado(Base):
     """Correos capturados y procesados desde Gmail"""
     
@@ -25,36 +42,60 @@ class EmailProcesado(Base):
     sender_email = Column(String(255), nullable=False)
     sender_name = Column(String(255))
     subject = Column(Text)
-    body_text = Column(Text)
-    body_html = Column(Text)
+    # Solo lo leen la búsqueda y el índice de similitud: fuera de los SELECT
+    # del ORM. El HTML vive comprimido en email_cuerpos (ver database/bodies.py)
+    body_text = deferred(Column(Text))
     received_date = Column(DateTime, nullable=False)
     processed_date = Column(DateTime, default=datetime.now)
     has_attachments = Column(Boolean, default=False)
     attachment_count = Column(Integer, default=0)
     priority = Column(String(50), default='normal')
     status = Column(
-        Enum('pending', 'processed', 'error', name='email_status'),
+        Enum(*EMAIL_STATUSES, name='email_status'),
         default='pending'
     )
     error_message = Column(Text)
     
+    # Máquina de estados (ver database/email_states.py)
+    status_changed_at = Column(DateTime)
+    processing_started_at = Column(DateTime)
+    attempts = Column(Integer, default=0)
+    
     # Relaciones
     tareas = relationship('Tarea', back_populates='email', cascade='all, delete-orphan')
     adjuntos = relationship('ArchivoAdjunto', back_populates='email', cascade='all, delete-orphan')
     alertas = relationship('Alerta', back_populates='email')
+    cuerpo = relationship('EmailCuerpo', uselist=False, cascade='all, delete-orphan', passive_deletes=True)
     
     # Índices
     __table_args__ = (
         Index('idx_gmail_id', 'gmail_id'),
         Index('idx_received_date', 'received_date'),
         Index('idx_status', 'status'),
+        Index('idx_status_changed', 'status', 'status_changed_at'),
         Index('idx_priority', 'priority'),
+        Index('ft_emails_busqueda', 'subject', 'body_text', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
     )
     
     def __repr__(self):
         return f"<EmailProcesado(id={self.id}, subject='{self.subject[:30]}...', status='{self.status}')>"
 
 
+class EmailCuerpo(Base):
+    """Cuerpo HTML comprimido de un email (se carga solo en el detalle)"""
+    
+    __tablename__ = 'email_cuerpos'
+    
+    email_id = Column(Integer, ForeignKey('emails_procesados.id', ondelete='CASCADE'), primary_key=True)
+    codec = Column(String(10), nullable=False)          # 'zstd' o 'zlib'
+    body_html = Column(LargeBinary(16777215))            # MEDIUMBLOB en MySQL
+    size_original = Column(Integer, default=0)
+    size_comprimido = Column(Integer, default=0)
+    
+    def __repr__(self):
+        return f"<EmailCuerpo(email_id={self.email_id}, codec='{self.codec}', size_comprimido={self.size_comprimido})>"
+
+
 class Tarea(Base):
     """Tareas operacionales extraídas de los correos"""
     
@@ -67,7 +108,7 @@ class Tarea(Base):
     codigo_cobertor = Column(String(100))
     cuartel = Column(String(50))
     hileras = Column(Integer)
-    largo_metros = Column(DECIMAL(10, 2))
+    largo_metros = Column(Numeric(10, 2))
     cantidad = Column(Integer, default=1)
     
     # Especificaciones técnicas
@@ -78,11 +119,11 @@ class Tarea(Base):
     
     # Gestión de la tarea
     prioridad = Column(
-        Enum('baja', 'normal', 'alta', 'urgente', name='prioridad_enum'),
+        Enum(*PRIORIDADES_TAREA, name='prioridad_enum'),
         default='normal'
     )
     estado = Column(
-        Enum('pendiente', 'en_proceso', 'completada', 'cancelada', name='estado_enum'),
+        Enum(*ESTADOS_TAREA, name='estado_enum'),
         default='pendiente'
     )
     fecha_solicitud = Column(DateTime, nullable=False)
@@ -115,6 +156,10 @@ class Tarea(Base):
         Index('idx_prioridad', 'prioridad'),
         Index('idx_fecha_requerida', 'fecha_requerida'),
         Index('idx_codigo', 'codigo_cobertor'),
+        Index(
+            'ft_tareas_busqueda', 'codigo_cobertor', 'cuartel', 'observaciones',
+            mysql_prefix='FULLTEXT'
+        ).ddl_if(dialect='mysql'),
     )
     
     def __repr__(self):
@@ -161,7 +206,7 @@ class Alerta(Base):
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     tipo = Column(
-        Enum('conflicto', 'urgente', 'vencimiento', 'informativa', name='tipo_alerta_enum'),
+        Enum(*TIPOS_ALERTA, name='tipo_alerta_enum'),
         nullable=False
     )
     titulo = Column(String(255), nullable=False)
@@ -169,7 +214,7 @@ class Alerta(Base):
     tarea_id = Column(Integer, ForeignKey('tareas.id', ondelete='SET NULL'))
     email_id = Column(Integer, ForeignKey('emails_procesados.id', ondelete='SET NULL'))
     severidad = Column(
-        Enum('baja', 'media', 'alta', 'critica', name='severidad_enum'),
+        Enum(*SEVERIDADES_ALERTA, name='severidad_enum'),
         default='media'
     )
     leida = Column(Boolean, default=False)
@@ -199,7 +244,7 @@ class Configuracion(Base):
     clave = Column(String(100), unique=True, nullable=False)
     valor = Column(Text)
     tipo = Column(
-        Enum('string', 'number', 'boolean', 'json', name='tipo_config_enum'),
+        Enum(*TIPOS_CONFIGURACION, name='tipo_config_enum'),
         default='string'
     )
     descripcion = Column(Text)
@@ -217,7 +262,7 @@ class LogSistema(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     timestamp = Column(DateTime, default=datetime.now)
     nivel = Column(
-        Enum('debug', 'info', 'warning', 'error', 'critical', name='nivel_log_enum'),
+        Enum(*NIVELES_LOG, name='nivel_log_enum'),
         default='info'
     )
     modulo = Column(String(100))
@@ -235,6 +280,60 @@ class LogSistema(Base):
         return f"<LogSistema(nivel='{self.nivel}', modulo='{self.modulo}', mensaje='{self.mensaje[:50]}...')>"
 
 
+class DailyStat(Base):
+    """Rollup diario de métricas para tendencias del dashboard"""
+    
+    __tablename__ = 'daily_stats'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    fecha = Column(Date, nullable=False)
+    metrica = Column(String(50), nullable=False)
+    clave = Column(String(255), nullable=False, default='')
+    cantidad = Column(Integer, default=0)
+    suma = Column(Float, default=0.0)
+    
+    # Índice único = clave del upsert y del range scan (metrica, fecha)
+    __table_args__ = (
+        UniqueConstraint('metrica', 'fecha', 'clave', name='uq_daily_stats'),
+    )
+    
+    def __repr__(self):
+        return f"<DailyStat(fecha={self.fecha}, metrica='{self.metrica}', clave='{self.clave}', cantidad={self.cantidad})>"
+
+
+class TrabajoCola(Base):
+    """Email capturado a la espera de un worker (ver database/work_queue.py)"""
+    
+    __tablename__ = 'cola_trabajos'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    gmail_id = Column(String(255), unique=True, nullable=False)
+    payload = Column(Text(16777215), nullable=False)   # MEDIUMTEXT en MySQL
+    estado = Column(
+        Enum(*ESTADOS_TRABAJO, name='estado_trabajo_enum'),
+        default='pendiente'
+    )
+    prioridad = Column(Integer, default=0)
+    intentos = Column(Integer, default=0)
+    max_intentos = Column(Integer, default=5)
+    disponible_desde = Column(DateTime)
+    lease_hasta = Column(DateTime)
+    worker_id = Column(String(100))
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    completado_at = Column(DateTime)
+    
+    # Índices: reclamo por prioridad y recuperación de leases vencidos
+    __table_args__ = (
+        Index('idx_cola_reclamo', 'estado', 'prioridad', 'disponible_desde'),
+        Index('idx_cola_lease', 'estado', 'lease_hasta'),
+    )
+    
+    def __repr__(self):
+        return f"<TrabajoCola(id={self.id}, gmail_id='{self.gmail_id}', estado='{self.estado}')>"
+
+
 # ============================================
 # MODELOS DE APRENDIZAJE
 # ============================================
@@ -251,8 +350,13 @@ class SenderProfile(Base):
     inferred_intent = Column(String(50))
     typical_action = Column(String(50))
     typical_urgency = Column(String(20))
+    avg_response_time_hours = Column(Numeric(6, 1, asdecimal=False))   # horas, con una decimal
     emails_analyzed = Column(Integer, default=0)
     confidence_score = Column(Float, default=0.0)
+    # Conteos por urgencia / intención: typical_* y la confianza se
+    # recalculan desde aquí (el aprendizaje continuo los suma)
+    urgency_counts = Column(JSON)
+    intent_counts = Column(JSON)
     last_seen = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -265,9 +369,11 @@ class InternalAuthorProfile(Base):
     email = Column(String(255), unique=True, nullable=False)
     nombre = Column(String(255))
     role = Column(String(50))
+    avg_response_minutes = Column(Integer)
     tends_to_forward = Column(Boolean, default=False)
     tends_to_cc_multiple = Column(Boolean, default=False)
     emails_analyzed = Column(Integer, default=0)
+    threads_participated = Column(Integer, default=0)
     last_seen = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -285,6 +391,9 @@ class ThreadPattern(Base):
     has_cc = Column(Boolean, default=False)
     has_attachments = Column(Boolean, default=False)
     inferred_complexity = Column(String(20))
+    time_to_resolution_hours = Column(Integer)
+    started_at = Column(DateTime)
+    closed_at = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -299,9 +408,15 @@ class LearnedRule(Base):
     urgency = Column(String(20))
     confidence = Column(Float, default=0.0)
     times_triggered = Column(Integer, default=0)
+    times_resolved = Column(Integer, default=0)
     success_rate = Column(Float, default=0.0)
     active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Clave natural del upsert del aprendizaje histórico
+    __table_args__ = (
+        UniqueConstraint('rule_name', name='uq_learned_rules_name'),
+    )
 
 
 class LearningSession(Base):
@@ -318,6 +433,9 @@ class LearningSession(Base):
     started_at = Column(DateTime)
     completed_at = Column(DateTime)
     duration_minutes = Column(Integer)
+    # Avance para reanudar (cursor de página y agregado parcial comprimido)
+    checkpoint = Column(JSON(none_as_null=True))
+    checkpoint_at = Column(DateTime)
 
 
 class KeywordPattern(Base):
@@ -328,4 +446,9 @@ class KeywordPattern(Base):
     category = Column(String(50))
     weight = Column(Float, default=1.0)
     times_found = Column(Integer, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Una fila por keyword y categoría (clave del upsert)
+    __table_args__ = (
+        UniqueConstraint('keyword', 'category', name='uq_keyword_category'),
+    )
@@ -0,0 +1,191 @@
+"""
+Rollup diario (daily_stats) para tendencias del dashboard
+
+EmailProcessor lo mantiene incrementalmente en la misma transacción
+que crea el email y sus tareas; backfill_daily_stats() lo reconstruye
+desde las tablas operativas.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from email.utils import parseaddr
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .models import DailyStat, EmailProcesado, Tarea
+from .upsert import upsert
+
+
+# Métricas del rollup (columna 'metrica')
+METRICA_EMAILS_REMITENTE = 'emails_remitente'         # clave = email remitente
+METRICA_EMAILS_ESTADO = 'emails_estado'               # clave = status final
+METRICA_TAREAS_PRIORIDAD = 'tareas_prioridad'         # clave = prioridad
+METRICA_LATENCIA = 'latencia_procesamiento'           # suma = segundos
+METRICA_TIEMPO_A_TAREA = 'tiempo_a_tarea'             # clave = prioridad del email, suma = segundos
+
+# (fecha, metrica, clave) → [cantidad, suma]
+Incrementos = Dict[Tuple[date, str, str], List[float]]
+
+
+def normalize_sender(sender: Optional[str]) -> str:
+    """Extrae la dirección de un campo From ('Nombre <a@b.cl>' → 'a@b.cl')"""
+    address = parseaddr(sender or '')[1] or (sender or '')
+    return address.strip().lower()[:255]
+
+
+def to_local_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Convierte fechas con zona horaria (headers Date) a hora local sin tz"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _add(incrementos: Incrementos, fecha: date, metrica: str, clave: str,
+         cantidad: int = 1, suma: float = 0.0):
+    acumulado = incrementos.setdefault((fecha, metrica, clave or ''), [0, 0.0])
+    acumulado[0] += cantidad
+    acumulado[1] += suma
+
+
+def email_increments(sender_email: str, received_date: Optional[datetime],
+                     processed_date: Optional[datetime], status: str,
+                     prioridades: Iterable[str],
+                     incrementos: Optional[Incrementos] = None,
+                     prioridad_email: Optional[str] = None) -> Incrementos:
+    """
+    Calcula los incrementos del rollup para un email procesado
+
+    Args:
+        sender_email: Campo From del email
+        received_date: Fecha de recepción
+        processed_date: Fecha de procesamiento
+        status: Status final del email
+        prioridades: Prioridad de cada tarea creada
+        incrementos: Acumulador existente (opcional, para lotes)
+        prioridad_email: Prioridad del email (clave de tiempo_a_tarea)
+
+    Returns:
+        Acumulador con los incrementos
+    """
+    incrementos = incrementos if incrementos is not None else {}
+    received = to_local_naive(received_date)
+    processed = processed_date or datetime.now()
+
+    if received:
+        _add(incrementos, received.date(), METRICA_EMAILS_REMITENTE, normalize_sender(sender_email))
+    _add(incrementos, processed.date(), METRICA_EMAILS_ESTADO, status or '')
+
+    prioridades = list(prioridades)
+    for prioridad in prioridades:
+        _add(incrementos, processed.date(), METRICA_TAREAS_PRIORIDAD, prioridad or 'normal')
+
+    if received:
+        latencia = max((processed - received).total_seconds(), 0.0)
+        _add(incrementos, processed.date(), METRICA_LATENCIA, '', 1, latencia)
+        # Las tareas se crean en la misma transacción que cierra el email
+        if prioridades:
+            _add(incrementos, processed.date(), METRICA_TIEMPO_A_TAREA,
+                 prioridad_email or 'normal', 1, latencia)
+
+    return incrementos
+
+
+def apply_increments(session, incrementos: Incrementos) -> int:
+    """Aplica los incrementos con un upsert aditivo (no hace commit)"""
+    rows = [{
+        'fecha': fecha,
+        'metrica': metrica,
+        'clave': clave,
+        'cantidad': int(cantidad),
+        'suma': float(suma)
+    } for (fecha, metrica, clave), (cantidad, suma) in incrementos.items()]
+
+    return upsert(
+        session, DailyStat, rows,
+        index_elements=['metrica', 'fecha', 'clave'],
+        increment_columns=['cantidad', 'suma']
+    )
+
+
+def read_rollup(session, metrica: str, desde: date, hasta: date) -> List[DailyStat]:
+    """Lee un rango de fechas de una métrica (un range scan sobre uq_daily_stats)"""
+    return session.query(DailyStat).filter(
+        DailyStat.metrica == metrica,
+        DailyStat.fecha >= desde,
+        DailyStat.fecha <= hasta
+    ).order_by(DailyStat.fecha).all()
+
+
+def backfill_daily_stats(session, desde: Optional[date] = None,
+                         hasta: Optional[date] = None, batch_size: int = 2000) -> int:
+    """
+    Reconstruye daily_stats desde emails_procesados y tareas
+
+    Borra el rango indicado del rollup y lo recalcula recorriendo las
+    tablas operativas una sola vez, en streaming (yield_per).
+
+    Args:
+        session: Sesión de SQLAlchemy (no hace commit)
+        desde: Fecha inicial (None = sin límite)
+        hasta: Fecha final inclusive (None = sin límite)
+        batch_size: Filas por lote leído
+
+    Returns:
+        Número de filas del rollup escritas
+    """
+    incrementos: Incrementos = {}
+    con_tareas = {
+        email_id for (email_id,) in
+        session.query(Tarea.email_id).filter(Tarea.email_id.isnot(None)).distinct()
+    }
+
+    def dentro(fecha: date) -> bool:
+        return (desde is None or fecha >= desde) and (hasta is None or fecha <= hasta)
+
+    emails = session.query(
+        EmailProcesado.id,
+        EmailProcesado.sender_email,
+        EmailProcesado.received_date,
+        EmailProcesado.processed_date,
+        EmailProcesado.status,
+        EmailProcesado.priority
+    ).yield_per(batch_size)
+
+    for email_id, sender, received, processed, status, priority in emails:
+        received = to_local_naive(received)
+        if received and dentro(received.date()):
+            _add(incrementos, received.date(), METRICA_EMAILS_REMITENTE, normalize_sender(sender))
+        if processed and dentro(processed.date()):
+            _add(incrementos, processed.date(), METRICA_EMAILS_ESTADO, status or '')
+            if received:
+                latencia = max((processed - received).total_seconds(), 0.0)
+                _add(incrementos, processed.date(), METRICA_LATENCIA, '', 1, latencia)
+                if email_id in con_tareas:
+                    _add(incrementos, processed.date(), METRICA_TIEMPO_A_TAREA,
+                         priority or 'normal', 1, latencia)
+
+    tareas = session.query(Tarea.fecha_solicitud, Tarea.prioridad).yield_per(batch_size)
+    for fecha_solicitud, prioridad in tareas:
+        if fecha_solicitud and dentro(fecha_solicitud.date()):
+            _add(incrementos, fecha_solicitud.date(), METRICA_TAREAS_PRIORIDAD, prioridad or 'normal')
+
+    delete = session.query(DailyStat)
+    if desde:
+        delete = delete.filter(DailyStat.fecha >= desde)
+    if hasta:
+        delete = delete.filter(DailyStat.fecha <= hasta)
+    delete.delete(synchronize_session=False)
+
+    return apply_increments(session, incrementos)
+
+
+def week_start(fecha: date) -> date:
+    """Lunes de la semana ISO de una fecha"""
+    return fecha - timedelta(days=fecha.weekday())
+
+
+def group_by_week(rows: Iterable[DailyStat]) -> Dict[Tuple[date, str], int]:
+    """Agrupa filas diarias por (lunes de la semana, clave)"""
+    semanas = defaultdict(int)
+    for row in rows:
+        semanas[(week_start(row.fecha), row.clave)] += row.cantidad or 0
+    return semanas
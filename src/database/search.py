@@ -0,0 +1,224 @@
+"""
+Búsqueda de texto completo sobre emails procesados y tareas
+
+MySQL usa índices FULLTEXT (ver migration_add_search.sql).
+SQLite usa tablas virtuales FTS5 sincronizadas con triggers (pruebas locales).
+Cualquier otro motor cae a un LIKE simple.
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+
+
+# Columnas indexadas por tabla
+EMAIL_FTS_COLUMNS = ('subject', 'body_text')
+TAREA_FTS_COLUMNS = ('codigo_cobertor', 'cuartel', 'observaciones')
+
+MAX_PER_PAGE = 100
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def clamp_pagination(page: int, per_page: int) -> Tuple[int, int]:
+    """Página (desde 1) y tamaño de página (1..MAX_PER_PAGE) efectivos"""
+    return max(page, 1), max(1, min(per_page, MAX_PER_PAGE))
+
+
+def _tokenize(query: str) -> List[str]:
+    """Separa la consulta del usuario en términos (sin operadores)"""
+    return _TOKEN_RE.findall(query or '')[:10]
+
+
+def _fts5_query(tokens: List[str]) -> str:
+    """Construye expresión FTS5: todos los términos, con prefijo"""
+    return ' '.join(f'"{tok}"*' for tok in tokens)
+
+
+def _mysql_boolean_query(tokens: List[str]) -> str:
+    """Construye expresión BOOLEAN MODE: todos los términos requeridos, con prefijo"""
+    return ' '.join(f'+{tok}*' for tok in tokens)
+
+
+# =============================================================================
+# SQLITE FTS5
+# =============================================================================
+
+_SQLITE_FTS_TABLES = {
+    'emails_fts': ('emails_procesados', EMAIL_FTS_COLUMNS),
+    'tareas_fts': ('tareas', TAREA_FTS_COLUMNS),
+}
+
+
+def ensure_sqlite_fts(engine):
+    """
+    Crea las tablas FTS5 y sus triggers de sincronización (solo SQLite)
+
+    Es idempotente: si la tabla virtual ya existe no hace nada.
+    Si se crea por primera vez, indexa las filas existentes con 'rebuild'.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    with engine.begin() as conn:
+        for fts_table, (source, columns) in _SQLITE_FTS_TABLES.items():
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': fts_table}
+            ).first()
+            if exists:
+                continue
+
+            cols = ', '.join(columns)
+            new_vals = ', '.join(f'new.{c}' for c in columns)
+            old_vals = ', '.join(f'old.{c}' for c in columns)
+
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {fts_table} USING fts5("
+                f"{cols}, content='{source}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {source} BEGIN "
+                f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_vals}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {source} BEGIN "
+                f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) "
+                f"VALUES ('delete', old.id, {old_vals}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts_table}_au AFTER UPDATE ON {source} BEGIN "
+                f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) "
+                f"VALUES ('delete', old.id, {old_vals}); "
+                f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_vals}); END"
+            ))
+            conn.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+
+
+# =============================================================================
+# CONSULTAS
+# =============================================================================
+
+def _search_table(session, table: str, fts_table: str, columns, select_cols: str,
+                  tokens: List[str], limit: int, offset: int):
+    """Ejecuta la búsqueda rankeada según el dialecto de la sesión"""
+    dialect = session.get_bind().dialect.name
+    params = {'limit': limit, 'offset': offset}
+
+    if dialect == 'mysql':
+        match = f"MATCH({', '.join(columns)}) AGAINST (:q IN BOOLEAN MODE)"
+        params['q'] = _mysql_boolean_query(tokens)
+        sql = (
+            f"SELECT {select_cols}, {match} AS score FROM {table} t "
+            f"WHERE {match} ORDER BY score DESC, t.id DESC LIMIT :limit OFFSET :offset"
+        )
+    elif dialect == 'sqlite':
+        # bm25() devuelve valores negativos: menor = más relevante
+        params['q'] = _fts5_query(tokens)
+        sql = (
+            f"SELECT {select_cols}, -bm25({fts_table}) AS score "
+            f"FROM {fts_table} JOIN {table} t ON t.id = {fts_table}.rowid "
+            f"WHERE {fts_table} MATCH :q ORDER BY bm25({fts_table}), t.id DESC "
+            f"LIMIT :limit OFFSET :offset"
+        )
+    else:
+        conditions = []
+        for i, tok in enumerate(tokens):
+            params[f'tok{i}'] = f'%{tok}%'
+            conditions.append(
+                '(' + ' OR '.join(f't.{c} LIKE :tok{i}' for c in columns) + ')'
+            )
+        sql = (
+            f"SELECT {select_cols}, 0 AS score FROM {table} t "
+            f"WHERE {' AND '.join(conditions)} ORDER BY t.id DESC LIMIT :limit OFFSET :offset"
+        )
+
+    return session.execute(text(sql), params).mappings().all()
+
+
+def _isoformat(value):
+    """Fechas pueden venir como datetime (MySQL) o string (SQLite)"""
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def search_emails(session, query: str, page: int = 1, per_page: int = 20) -> Dict:
+    """
+    Busca emails procesados por asunto y cuerpo
+
+    Args:
+        session: Sesión de SQLAlchemy
+        query: Texto a buscar (todos los términos deben aparecer)
+        page: Página (desde 1)
+        per_page: Resultados por página (máx 100)
+
+    Returns:
+        Dict con 'results' rankeados y 'has_more'
+    """
+    tokens = _tokenize(query)
+    if not tokens:
+        return {'results': [], 'has_more': False}
+
+    page, per_page = clamp_pagination(page, per_page)
+    rows = _search_table(
+        session, 'emails_procesados', 'emails_fts', EMAIL_FTS_COLUMNS,
+        't.id, t.gmail_id, t.subject, t.sender_email, t.sender_name, '
+        't.received_date, t.status',
+        tokens, per_page + 1, (page - 1) * per_page
+    )
+
+    results = [{
+        'id': row['id'],
+        'gmail_id': row['gmail_id'],
+        'subject': row['subject'],
+        'sender_email': row['sender_email'],
+        'sender_name': row['sender_name'],
+        'received_date': _isoformat(row['received_date']),
+        'status': row['status'],
+        'score': float(row['score'] or 0)
+    } for row in rows[:per_page]]
+
+    return {'results': results, 'has_more': len(rows) > per_page}
+
+
+def search_tareas(session, query: str, page: int = 1, per_page: int = 20) -> Dict:
+    """
+    Busca tareas por código de cobertor, cuartel y observaciones
+
+    Args:
+        session: Sesión de SQLAlchemy
+        query: Texto a buscar (todos los términos deben aparecer)
+        page: Página (desde 1)
+        per_page: Resultados por página (máx 100)
+
+    Returns:
+        Dict con 'results' rankeados y 'has_more'
+    """
+    tokens = _tokenize(query)
+    if not tokens:
+        return {'results': [], 'has_more': False}
+
+    page, per_page = clamp_pagination(page, per_page)
+    rows = _search_table(
+        session, 'tareas', 'tareas_fts', TAREA_FTS_COLUMNS,
+        't.id, t.email_id, t.codigo_cobertor, t.cuartel, t.prioridad, t.estado, '
+        't.fecha_solicitud, t.observaciones',
+        tokens, per_page + 1, (page - 1) * per_page
+    )
+
+    results = [{
+        'id': row['id'],
+        'email_id': row['email_id'],
+        'codigo_cobertor': row['codigo_cobertor'],
+        'cuartel': row['cuartel'],
+        'prioridad': row['prioridad'],
+        'estado': row['estado'],
+        'fecha_solicitud': _isoformat(row['fecha_solicitud']),
+        'observaciones': row['observaciones'],
+        'score': float(row['score'] or 0)
+    } for row in rows[:per_page]]
+
+    return {'results': results, 'has_more': len(rows) > per_page}
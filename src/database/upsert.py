@@ -0,0 +1,72 @@
+"""
+Upsert por lotes independiente del dialecto
+
+MySQL:  INSERT ... ON DUPLICATE KEY UPDATE
+SQLite: INSERT ... ON CONFLICT (...) DO UPDATE
+"""
+
+from typing import Dict, Iterable, List, Sequence
+
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _chunks(rows: List[Dict], size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def upsert(session, model, rows: Iterable[Dict], index_elements: Sequence[str],
+           update_columns: Sequence[str] = (), increment_columns: Sequence[str] = (),
+           chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Inserta filas o actualiza las existentes según una clave única
+
+    Args:
+        session: Sesión de SQLAlchemy (no hace commit)
+        model: Clase del modelo ORM
+        rows: Diccionarios columna → valor (todas con las mismas claves)
+        index_elements: Columnas de la clave única (natural) del conflicto
+        update_columns: Columnas que se sobrescriben con el valor nuevo
+        increment_columns: Columnas que se suman (col = col + nuevo)
+        chunk_size: Filas por sentencia
+
+    Returns:
+        Número de filas enviadas
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    table = model.__table__
+    dialect = session.get_bind().dialect.name
+
+    for chunk in _chunks(rows, chunk_size):
+        if dialect == 'mysql':
+            stmt = mysql_insert(table).values(chunk)
+            new = stmt.inserted
+        elif dialect == 'sqlite':
+            stmt = sqlite_insert(table).values(chunk)
+            new = stmt.excluded
+        else:
+            raise NotImplementedError(f"Upsert no soportado para dialecto: {dialect}")
+
+        set_ = {col: new[col] for col in update_columns}
+        set_.update({col: table.c[col] + new[col] for col in increment_columns})
+
+        if dialect == 'mysql':
+            if not set_:
+                # No-op para ignorar duplicados sin silenciar otros errores
+                set_ = {index_elements[0]: table.c[index_elements[0]]}
+            stmt = stmt.on_duplicate_key_update(**set_)
+        elif set_:
+            stmt = stmt.on_conflict_do_update(index_elements=list(index_elements), set_=set_)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(index_elements))
+
+        session.execute(stmt)
+
+    return len(rows)
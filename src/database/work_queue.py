@@ -0,0 +1,246 @@
+"""
+Cola durable de trabajos entre la captura y el procesamiento
+
+    pendiente → en_proceso → completado
+        ↑            │
+        └─(re-intento, con backoff)─┘ → fallido (sin intentos)
+
+La captura encola cada email (gmail_id + payload ya descargado) y los
+workers lo reclaman con SELECT ... FOR UPDATE SKIP LOCKED: varios
+workers, en la misma máquina o en otras con la misma BD, nunca toman el
+mismo trabajo. Cada reclamo da un lease que el worker renueva entre
+etapas (renew); si el worker muere, el trabajo vuelve a estar disponible
+cuando el lease vence. Los completados se eliminan tras RETENTION_DAYS
+(purge_completed, desde la captura).
+
+SQLite ignora FOR UPDATE; el UPDATE condicional de claim() (solo si el
+trabajo sigue disponible) evita que dos procesos lo tomen a la vez.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, func, or_, update
+
+from .models import TrabajoCola
+from .upsert import upsert
+
+
+LEASE_SECONDS = int(os.getenv('QUEUE_LEASE_SECONDS', '300'))
+MAX_ATTEMPTS = int(os.getenv('QUEUE_MAX_ATTEMPTS', '5'))
+RETRY_SECONDS = int(os.getenv('QUEUE_RETRY_SECONDS', '30'))
+RETENTION_DAYS = int(os.getenv('QUEUE_RETENTION_DAYS', '7'))
+
+# Campos del email que no se guardan en la cola (el mensaje crudo de Gmail
+# duplica cuerpo y adjuntos)
+_EXCLUDED_FIELDS = ('raw_message',)
+
+
+def encode_payload(email_data: Dict) -> str:
+    """Serializa un email de GmailClient (fechas en ISO 8601)"""
+    data = {k: v for k, v in email_data.items() if k not in _EXCLUDED_FIELDS}
+
+    def default(value):
+        if isinstance(value, datetime):
+            return {'__datetime__': value.isoformat()}
+        raise TypeError(f"No serializable: {type(value).__name__}")
+
+    return json.dumps(data, default=default, ensure_ascii=False)
+
+
+def decode_payload(payload: str) -> Dict:
+    def hook(obj):
+        if set(obj) == {'__datetime__'}:
+            return datetime.fromisoformat(obj['__datetime__'])
+        return obj
+
+    return json.loads(payload, object_hook=hook)
+
+
+def _available(now: datetime):
+    """Condición de trabajo reclamable: pendiente y disponible, o con lease vencido"""
+    return and_(
+        TrabajoCola.intentos < TrabajoCola.max_intentos,
+        or_(
+            and_(
+                TrabajoCola.estado == 'pendiente',
+                or_(TrabajoCola.disponible_desde.is_(None), TrabajoCola.disponible_desde <= now)
+            ),
+            and_(TrabajoCola.estado == 'en_proceso', TrabajoCola.lease_hasta < now)
+        )
+    )
+
+
+def enqueue(session, emails: Iterable[Dict], prioridad: int = 0,
+            max_intentos: int = MAX_ATTEMPTS) -> int:
+    """
+    Encola emails (los gmail_id ya encolados se ignoran)
+
+    Args:
+        session: Sesión de SQLAlchemy (no hace commit)
+        emails: Dicts de GmailClient.get_emails()
+        prioridad: Prioridad por defecto (mayor = antes); un email puede
+                   traer la suya en 'queue_priority'
+        max_intentos: Reclamos permitidos antes de marcarlo 'fallido'
+
+    Returns:
+        Número de emails enviados a la cola
+    """
+    now = datetime.now()
+    rows = [{
+        'gmail_id': email['gmail_id'],
+        'payload': encode_payload(email),
+        'estado': 'pendiente',
+        'prioridad': email.get('queue_priority', prioridad),
+        'intentos': 0,
+        'max_intentos': max_intentos,
+        'disponible_desde': now,
+        'created_at': now,
+        'updated_at': now,
+    } for email in emails]
+
+    return upsert(session, TrabajoCola, rows, index_elements=['gmail_id'])
+
+
+def queued_states(session, gmail_ids: List[str]) -> Dict[str, str]:
+    """Estado de los gmail_id que ya están en la cola (cualquier estado)"""
+    if not gmail_ids:
+        return {}
+    return dict(session.query(TrabajoCola.gmail_id, TrabajoCola.estado).filter(
+        TrabajoCola.gmail_id.in_(gmail_ids)
+    ))
+
+
+def claim(session, worker_id: str, limit: int = 1, lease_seconds: int = LEASE_SECONDS,
+          now: Optional[datetime] = None) -> List[Dict]:
+    """
+    Reclama hasta `limit` trabajos (mayor prioridad y más antiguos primero)
+
+    Args:
+        session: Sesión de SQLAlchemy (hacer commit para liberar los locks)
+        worker_id: Identificador del worker (host:pid)
+        limit: Máximo de trabajos
+        lease_seconds: Duración del lease
+        now: Momento del reclamo (por defecto ahora)
+
+    Returns:
+        Lista de dicts con id, gmail_id, intentos y email (payload decodificado)
+    """
+    now = now or datetime.now()
+    lease_hasta = now + timedelta(seconds=lease_seconds)
+
+    # Leases vencidos sin intentos restantes: el worker murió en el último intento
+    session.execute(
+        update(TrabajoCola)
+        .where(TrabajoCola.estado == 'en_proceso', TrabajoCola.lease_hasta < now,
+               TrabajoCola.intentos >= TrabajoCola.max_intentos)
+        .values(estado='fallido', error='Lease vencido en el último intento', updated_at=now)
+    )
+
+    candidates = session.query(
+        TrabajoCola.id, TrabajoCola.gmail_id, TrabajoCola.intentos, TrabajoCola.payload
+    ).filter(_available(now)).order_by(
+        TrabajoCola.prioridad.desc(), TrabajoCola.id
+    ).limit(limit).with_for_update(skip_locked=True).all()
+
+    jobs = []
+    for job_id, gmail_id, intentos, payload in candidates:
+        claimed = session.execute(
+            update(TrabajoCola)
+            .where(TrabajoCola.id == job_id, _available(now))
+            .values(estado='en_proceso', worker_id=worker_id, lease_hasta=lease_hasta,
+                    intentos=TrabajoCola.intentos + 1, updated_at=now)
+        ).rowcount
+        if claimed:
+            jobs.append({
+                'id': job_id,
+                'gmail_id': gmail_id,
+                'intentos': intentos + 1,
+                'email': decode_payload(payload),
+            })
+    return jobs
+
+
+def renew(session, job_id: int, worker_id: str, lease_seconds: int = LEASE_SECONDS) -> bool:
+    """Extiende el lease de un trabajo propio (False si ya no lo tiene este worker)"""
+    now = datetime.now()
+    return bool(session.execute(
+        update(TrabajoCola)
+        .where(TrabajoCola.id == job_id, TrabajoCola.worker_id == worker_id,
+               TrabajoCola.estado == 'en_proceso')
+        .values(lease_hasta=now + timedelta(seconds=lease_seconds), updated_at=now)
+    ).rowcount)
+
+
+def complete(session, job_id: int, worker_id: str) -> bool:
+    """Marca un trabajo propio como completado"""
+    now = datetime.now()
+    return bool(session.execute(
+        update(TrabajoCola)
+        .where(TrabajoCola.id == job_id, TrabajoCola.worker_id == worker_id,
+               TrabajoCola.estado == 'en_proceso')
+        .values(estado='completado', lease_hasta=None, error=None,
+                completado_at=now, updated_at=now)
+    ).rowcount)
+
+
+def fail(session, job_id: int, worker_id: str, error: str,
+         retry_seconds: int = RETRY_SECONDS) -> Optional[str]:
+    """
+    Registra un fallo: re-intento con backoff exponencial o 'fallido'
+
+    Args:
+        session: Sesión de SQLAlchemy
+        job_id: ID del trabajo
+        worker_id: Worker que lo tenía reclamado
+        error: Mensaje de error
+        retry_seconds: Espera base (se duplica por intento)
+
+    Returns:
+        Nuevo estado ('pendiente' o 'fallido'), o None si el lease ya no era propio
+    """
+    job = session.query(TrabajoCola).filter(
+        TrabajoCola.id == job_id, TrabajoCola.worker_id == worker_id,
+        TrabajoCola.estado == 'en_proceso'
+    ).with_for_update().first()
+    if job is None:
+        return None
+
+    now = datetime.now()
+    job.error = (error or '')[:5000]
+    job.lease_hasta = None
+    job.updated_at = now
+    if job.intentos >= job.max_intentos:
+        job.estado = 'fallido'
+    else:
+        job.estado = 'pendiente'
+        job.disponible_desde = now + timedelta(seconds=retry_seconds * 2 ** (job.intentos - 1))
+    return job.estado
+
+
+def queue_stats(session) -> Dict:
+    """
+    Estado de la cola
+
+    Returns:
+        Dict con conteo por estado y antigüedad (segundos) del pendiente más antiguo
+    """
+    counts = dict(session.query(TrabajoCola.estado, func.count(TrabajoCola.id))
+                  .group_by(TrabajoCola.estado).all())
+    oldest = session.query(func.min(TrabajoCola.created_at)).filter(
+        TrabajoCola.estado == 'pendiente'
+    ).scalar()
+    return {
+        **{estado: counts.get(estado, 0) for estado in ('pendiente', 'en_proceso', 'completado', 'fallido')},
+        'pendiente_mas_antiguo_s': (datetime.now() - oldest).total_seconds() if oldest else None,
+    }
+
+
+def purge_completed(session, older_than_days: int = RETENTION_DAYS) -> int:
+    """Elimina trabajos completados hace más de N días (el email queda en emails_procesados)"""
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    return session.query(TrabajoCola).filter(
+        TrabajoCola.estado == 'completado', TrabajoCola.completado_at < cutoff
+    ).delete(synchronize_session=False)
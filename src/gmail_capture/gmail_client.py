@@ -3,93 +3,98 @@ Cliente Gmail API - Captura de correos con etiqueta específica
 """
 
 import os
+import sys
 import base64
 from datetime import datetime
 from email.utils import parsedate_to_datetime
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from dotenv import load_dotenv
 
-load_dotenv()
+# Añadir path para imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-SCOPES = [
-    'https://www.googleapis.com/auth/gmail.readonly',
-    'https://www.googleapis.com/auth/gmail.modify'
-]
+from gmail_capture.mail_source import GmailMailSource, mail_source_from_env
+from gmail_capture.gmail_session import get_gmail_service, SCOPES
+from gmail_capture.mime import walk_payload
+from monitoring.metrics import GMAIL_SECONDS, GMAIL_ERRORS, timed
+
+ATTACHMENTS_DIR = os.getenv('ATTACHMENTS_DIR', 'data/attachments')
 
 
 class GmailClient:
     """Cliente para interactuar con Gmail API"""
     
-    def __init__(self):
+    def __init__(self, source=None):
+        """
+        Args:
+            source: MailSource a usar (por defecto MAIL_SOURCE o Gmail API)
+        """
         self.service = None
+        self.source = source or mail_source_from_env()
         self.label_name = os.getenv('GMAIL_LABEL', 'bot-cobertores')
         self.label_id = None
+        # Etiqueta opcional para los emails sin intentos restantes (se crea a mano en Gmail)
+        self.dead_letter_label_name = os.getenv('GMAIL_DEAD_LETTER_LABEL', 'bot-cobertores/error')
+        self.dead_letter_label_id = None
         
     def authenticate(self):
-        """Autentica con Gmail API"""
-        creds = None
-        token_path = 'token.json'
-        credentials_path = 'credentials.json'
-        
-        # Cargar token existente
-        if os.path.exists(token_path):
-            creds = Credentials.from_authorized_user_file(token_path, SCOPES)
+        """Autentica con Gmail API (con una fuente local no hace OAuth)"""
+        if self.source is not None:
+            self.label_id = self._get_label_id()
+            self.dead_letter_label_id = self._get_label_id(self.dead_letter_label_name)
+            print(f"✅ Fuente de correo: {type(self.source).__name__}")
+            print(f"✅ Etiqueta '{self.label_name}' ID: {self.label_id}")
+            return self
         
-        # Renovar o crear nuevo token
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    credentials_path, SCOPES
-                )
-                creds = flow.run_local_server(port=0)
-            
-            # Guardar token
-            with open(token_path, 'w') as token:
-                token.write(creds.to_json())
-        
-        # Crear servicio
-        self.service = build('gmail', 'v1', credentials=creds)
+        # Servicio compartido por el proceso: discovery en caché, conexión
+        # keep-alive y token renovado en segundo plano (gmail_session.py)
+        self.service = get_gmail_service()
+        self.source = GmailMailSource(self.service)
         
         # Obtener ID de la etiqueta
         self.label_id = self._get_label_id()
+        self.dead_letter_label_id = self._get_label_id(self.dead_letter_label_name)
         
         print(f"✅ Autenticado con Gmail API")
         print(f"✅ Etiqueta '{self.label_name}' ID: {self.label_id}")
         
         return self
     
-    def _get_label_id(self):
-        """Obtiene el ID de la etiqueta configurada"""
+    def _call(self, operacion, method, *args, **kwargs):
+        """Llama a la fuente de correo midiendo latencia y errores"""
         try:
-            results = self.service.users().labels().list(userId='me').execute()
-            labels = results.get('labels', [])
+            with timed(GMAIL_SECONDS, operacion=operacion):
+                return method(*args, **kwargs)
+        except Exception:
+            GMAIL_ERRORS.inc(operacion=operacion)
+            raise
+    
+    def _get_label_id(self, name=None):
+        """Obtiene el ID de una etiqueta (por defecto la configurada)"""
+        name = name or self.label_name
+        try:
+            labels = self._call('labels', self.source.list_labels)
             
             for label in labels:
-                if label['name'].lower() == self.label_name.lower():
+                if label['name'].lower() == name.lower():
                     return label['id']
             
-            print(f"⚠️ Etiqueta '{self.label_name}' no encontrada")
+            print(f"⚠️ Etiqueta '{name}' no encontrada")
             return None
             
         except HttpError as error:
             print(f"❌ Error al obtener etiquetas: {error}")
             return None
     
-    def get_unread_emails(self, max_results=50):
+    def list_unread_ids(self, max_results=50):
         """
-        Obtiene correos no leídos con la etiqueta específica
+        Lista los IDs de correos no leídos con la etiqueta específica
+        (sin descargar su contenido)
         
         Args:
-            max_results: Máximo de correos a obtener
+            max_results: Máximo de correos a listar
             
         Returns:
-            Lista de diccionarios con información de correos
+            Lista de IDs de mensajes
         """
         if not self.label_id:
             print("❌ No se puede obtener correos sin ID de etiqueta")
@@ -99,11 +104,7 @@ class GmailClient:
             # Buscar correos con la etiqueta y sin leer
             query = f"label:{self.label_name} is:unread"
             
-            results = self.service.users().messages().list(
-                userId='me',
-                q=query,
-                maxResults=max_results
-            ).execute()
+            results = self._call('list', self.source.list_messages, query, max_results=max_results)
             
             messages = results.get('messages', [])
             
@@ -112,20 +113,46 @@ class GmailClient:
                 return []
             
             print(f"📬 {len(messages)} correos nuevos encontrados")
-            
-            # Obtener detalles completos de cada correo
-            emails_data = []
-            for msg in messages:
-                email_data = self._get_email_details(msg['id'])
-                if email_data:
-                    emails_data.append(email_data)
-            
-            return emails_data
+            return [msg['id'] for msg in messages]
             
         except HttpError as error:
             print(f"❌ Error al obtener correos: {error}")
             return []
     
+    def get_unread_emails(self, max_results=50):
+        """
+        Obtiene correos no leídos con la etiqueta específica
+        
+        Args:
+            max_results: Máximo de correos a obtener
+            
+        Returns:
+            Lista de diccionarios con información de correos
+        """
+        return self.get_emails(self.list_unread_ids(max_results=max_results))
+    
+    def get_emails(self, msg_ids):
+        """
+        Obtiene detalles completos de varios correos
+        
+        Args:
+            msg_ids: IDs de mensajes en Gmail
+            
+        Returns:
+            Lista de diccionarios con información de correos
+        """
+        emails_data = []
+        for msg_id in msg_ids:
+            email_data = self._get_email_details(msg_id)
+            if email_data:
+                emails_data.append(email_data)
+        
+        return emails_data
+    
+    def get_email(self, msg_id):
+        """Obtiene detalles completos de un correo por su ID"""
+        return self._get_email_details(msg_id)
+    
     def _get_email_details(self, msg_id):
         """
         Obtiene detalles completos de un correo
@@ -137,11 +164,7 @@ class GmailClient:
             Diccionario con datos del correo
         """
         try:
-            message = self.service.users().messages().get(
-                userId='me',
-                id=msg_id,
-                format='full'
-            ).execute()
+            message = self._call('get', self.source.get_message, msg_id)
             
             # Extraer headers
             headers = message['payload']['headers']
@@ -154,19 +177,10 @@ class GmailClient:
             except:
                 received_date = datetime.now()
             
-            # Cuerpo del correo
-            body_text = self._extract_body(message['payload'], 'text/plain')
-            body_html = self._extract_body(message['payload'], 'text/html')
-            
-            # Verificar adjuntos
-            has_attachments = False
-            attachment_count = 0
-            
-            if 'parts' in message['payload']:
-                for part in message['payload']['parts']:
-                    if part.get('filename'):
-                        has_attachments = True
-                        attachment_count += 1
+            # Cuerpos y descriptores de adjuntos en una sola pasada (los
+            # adjuntos se descargan recién al procesarlos, ver save_attachment)
+            parsed = walk_payload(message['payload'])
+            attachments = parsed['attachments']
             
             email_data = {
                 'gmail_id': msg_id,
@@ -174,11 +188,12 @@ class GmailClient:
                 'sender_email': headers_dict.get('From', ''),
                 'sender_name': self._extract_name(headers_dict.get('From', '')),
                 'subject': headers_dict.get('Subject', ''),
-                'body_text': body_text,
-                'body_html': body_html,
+                'body_text': parsed['body_text'],
+                'body_html': parsed['body_html'],
                 'received_date': received_date,
-                'has_attachments': has_attachments,
-                'attachment_count': attachment_count,
+                'has_attachments': bool(attachments),
+                'attachment_count': len(attachments),
+                'attachments': attachments,
                 'labels': message.get('labelIds', []),
                 'raw_message': message  # Guardar mensaje completo para procesamiento posterior
             }
@@ -189,29 +204,6 @@ class GmailClient:
             print(f"❌ Error al obtener detalles del correo {msg_id}: {error}")
             return None
     
-    def _extract_body(self, payload, mime_type):
-        """Extrae el cuerpo del correo según mime type"""
-        
-        # Si el payload tiene body directamente
-        if payload.get('mimeType') == mime_type and 'data' in payload.get('body', {}):
-            data = payload['body']['data']
-            return base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
-        
-        # Si tiene partes, buscar recursivamente
-        if 'parts' in payload:
-            for part in payload['parts']:
-                if part.get('mimeType') == mime_type and 'data' in part.get('body', {}):
-                    data = part['body']['data']
-                    return base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
-                
-                # Buscar en sub-partes
-                if 'parts' in part:
-                    result = self._extract_body(part, mime_type)
-                    if result:
-                        return result
-        
-        return ""
-    
     def _extract_name(self, from_field):
         """Extrae el nombre del campo From"""
         if '<' in from_field:
@@ -222,17 +214,45 @@ class GmailClient:
     def mark_as_read(self, msg_id):
         """Marca un correo como leído"""
         try:
-            self.service.users().messages().modify(
-                userId='me',
-                id=msg_id,
-                body={'removeLabelIds': ['UNREAD']}
-            ).execute()
+            self._call('modify', self.source.modify, msg_id, remove_labels=['UNREAD'])
             return True
         except HttpError as error:
             print(f"⚠️ Error al marcar correo como leído: {error}")
             return False
     
-    def download_attachment(self, msg_id, attachment_id, filename, save_path='data/attachments/'):
+    def mark_many_as_read(self, msg_ids):
+        """Marca varios correos como leídos (messages.batchModify en Gmail)"""
+        msg_ids = list(msg_ids)
+        if not msg_ids:
+            return True
+        try:
+            self._call('batch_modify', self.source.modify_many, msg_ids, remove_labels=['UNREAD'])
+            return True
+        except HttpError as error:
+            print(f"⚠️ Error al marcar {len(msg_ids)} correos como leídos: {error}")
+            return False
+    
+    def mark_dead_letter(self, msg_ids):
+        """
+        Saca de la bandeja los correos sin intentos restantes
+        
+        Los marca como leídos (list_unread_ids no los vuelve a traer) y les
+        agrega la etiqueta GMAIL_DEAD_LETTER_LABEL si existe. Siguen
+        visibles en /api/emails/problemas.
+        """
+        msg_ids = list(msg_ids)
+        if not msg_ids:
+            return True
+        add_labels = [self.dead_letter_label_id] if self.dead_letter_label_id else []
+        try:
+            self._call('batch_modify', self.source.modify_many, msg_ids,
+                       add_labels=add_labels, remove_labels=['UNREAD'])
+            return True
+        except HttpError as error:
+            print(f"⚠️ Error al mover {len(msg_ids)} correos a '{self.dead_letter_label_name}': {error}")
+            return False
+    
+    def download_attachment(self, msg_id, attachment_id, filename, save_path=None):
         """
         Descarga un archivo adjunto
         
@@ -240,35 +260,59 @@ class GmailClient:
             msg_id: ID del mensaje
             attachment_id: ID del adjunto
             filename: Nombre del archivo
-            save_path: Ruta donde guardar el archivo
+            save_path: Ruta donde guardar el archivo (por defecto ATTACHMENTS_DIR)
             
         Returns:
             Ruta completa del archivo guardado o None si falla
         """
         try:
-            # Crear directorio si no existe
-            os.makedirs(save_path, exist_ok=True)
-            
             # Obtener adjunto
-            attachment = self.service.users().messages().attachments().get(
-                userId='me',
-                messageId=msg_id,
-                id=attachment_id
-            ).execute()
-            
-            # Decodificar y guardar
-            file_data = base64.urlsafe_b64decode(attachment['data'])
-            file_path = os.path.join(save_path, filename)
+            attachment = self._call('attachment', self.source.get_attachment, msg_id, attachment_id)
             
-            with open(file_path, 'wb') as f:
-                f.write(file_data)
-            
-            print(f"✅ Adjunto guardado: {file_path}")
-            return file_path
+            return self._write_attachment(attachment['data'], filename, save_path or ATTACHMENTS_DIR)
             
         except HttpError as error:
             print(f"❌ Error al descargar adjunto: {error}")
             return None
+    
+    def save_attachment(self, msg_id, attachment, save_path=None):
+        """
+        Guarda un adjunto a partir de su descriptor (ver mime.walk_payload)
+        
+        Los adjuntos chicos que vienen inline no se piden a la API, y uno ya
+        guardado con el mismo tamaño (re-intento del email) no se vuelve a bajar.
+        
+        Args:
+            msg_id: ID del mensaje
+            attachment: Descriptor con filename, size y attachment_id o data
+            save_path: Directorio destino (por defecto ATTACHMENTS_DIR/<msg_id>)
+            
+        Returns:
+            Ruta completa del archivo guardado o None si falla
+        """
+        save_path = save_path or os.path.join(ATTACHMENTS_DIR, msg_id)
+        filename = os.path.basename(attachment['filename'])
+        file_path = os.path.join(save_path, filename)
+        
+        if os.path.exists(file_path) and os.path.getsize(file_path) == attachment.get('size'):
+            return file_path
+        
+        if attachment.get('data'):
+            return self._write_attachment(attachment['data'], filename, save_path)
+        
+        return self.download_attachment(msg_id, attachment['attachment_id'], filename, save_path)
+    
+    def _write_attachment(self, data, filename, save_path):
+        """Decodifica (base64 url-safe) y guarda un adjunto"""
+        # Crear directorio si no existe
+        os.makedirs(save_path, exist_ok=True)
+        
+        file_path = os.path.join(save_path, filename)
+        with open(file_path, 'wb') as f:
+            f.write(base64.urlsafe_b64decode(data))
+        
+        print(f"✅ Adjunto guardado: {file_path}")
+        return file_path
 
 
 # Ejemplo de uso
@@ -0,0 +1,235 @@
+"""
+Gmail Session - Servicio de Gmail API autenticado y reutilizable por proceso
+
+Antes, cada GmailClient.authenticate() leía token.json, renovaba en línea
+el token vencido (el token renovado nunca se guardaba, así que cada
+ejecución posterior del CLI volvía a renovarlo), cargaba el documento de
+discovery con build() y abría conexiones HTTP nuevas. Ahora:
+
+- el documento de discovery se carga una vez por proceso: el estático que
+  trae google-api-python-client o, si no está, una copia en disco
+  (GMAIL_DISCOVERY_PATH) que se descarga la primera vez
+- las credenciales se cargan una vez por proceso y un hilo en segundo plano
+  las renueva GMAIL_TOKEN_REFRESH_MARGIN_SECONDS antes de que venzan,
+  guardando token.json: ningún ciclo de sondeo paga la renovación
+- cada hilo reutiliza su servicio y su httplib2.Http (keep-alive entre
+  llamadas y ciclos; httplib2 no es thread-safe, por eso uno por hilo)
+
+Uso:
+    from gmail_capture.gmail_session import get_gmail_service
+    service = get_gmail_service()
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+from monitoring.metrics import GMAIL_TOKEN_REFRESHES
+
+logger = logging.getLogger(__name__)
+
+
+SCOPES = [
+    'https://www.googleapis.com/auth/gmail.readonly',
+    'https://www.googleapis.com/auth/gmail.modify'
+]
+
+TOKEN_PATH = os.getenv('GMAIL_TOKEN_PATH', 'token.json')
+CREDENTIALS_PATH = os.getenv('GMAIL_CREDENTIALS_PATH', 'credentials.json')
+DISCOVERY_PATH = os.getenv('GMAIL_DISCOVERY_PATH', 'data/gmail_discovery.json')
+DISCOVERY_URL = 'https://gmail.googleapis.com/$discovery/rest?version=v1'
+REFRESH_MARGIN_SECONDS = float(os.getenv('GMAIL_TOKEN_REFRESH_MARGIN_SECONDS', '300'))
+HTTP_TIMEOUT_SECONDS = float(os.getenv('GMAIL_HTTP_TIMEOUT_SECONDS', '60'))
+
+# Espera tras una renovación fallida antes de reintentar
+REFRESH_RETRY_SECONDS = 60
+
+
+@lru_cache(maxsize=1)
+def discovery_document() -> str:
+    """
+    Documento de discovery de Gmail v1 (cargado una vez por proceso)
+
+    Returns:
+        JSON del documento de discovery
+    """
+    from googleapiclient.discovery_cache import get_static_doc
+
+    document = get_static_doc('gmail', 'v1')
+    if document:
+        return document
+
+    if os.path.exists(DISCOVERY_PATH):
+        with open(DISCOVERY_PATH, encoding='utf-8') as f:
+            return f.read()
+
+    import httplib2
+
+    logger.info(f"🌐 Descargando discovery de Gmail → {DISCOVERY_PATH}")
+    response, content = httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS).request(DISCOVERY_URL)
+    if response.status != 200:
+        raise RuntimeError(f"No se pudo descargar el discovery de Gmail (HTTP {response.status})")
+    document = content.decode('utf-8')
+    _write_atomic(DISCOVERY_PATH, document)
+    return document
+
+
+def _write_atomic(path: str, content: str):
+    """Escribe un archivo vía temporal + rename (nunca queda a medio escribir)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class TokenManager:
+    """Credenciales OAuth del proceso, renovadas en segundo plano"""
+
+    def __init__(self, token_path: str = TOKEN_PATH, credentials_path: str = CREDENTIALS_PATH,
+                 margin_seconds: float = REFRESH_MARGIN_SECONDS):
+        """
+        Args:
+            token_path: token.json con el refresh token
+            credentials_path: credentials.json (solo para el flujo interactivo)
+            margin_seconds: Renovar esta cantidad de segundos antes del vencimiento
+        """
+        self.token_path = token_path
+        self.credentials_path = credentials_path
+        self.margin_seconds = margin_seconds
+        self.credentials = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """
+        Carga token.json; si no sirve, lo renueva o corre el flujo OAuth
+
+        Returns:
+            google.oauth2.credentials.Credentials válidas
+        """
+        from google.oauth2.credentials import Credentials
+
+        creds = None
+        if os.path.exists(self.token_path):
+            creds = Credentials.from_authorized_user_file(self.token_path, SCOPES)
+
+        if creds and creds.refresh_token and (not creds.valid or self._seconds_left(creds) < self.margin_seconds):
+            self.credentials = creds
+            self.refresh()
+        elif not creds or not creds.valid:
+            from google_auth_oauthlib.flow import InstalledAppFlow
+
+            flow = InstalledAppFlow.from_client_secrets_file(self.credentials_path, SCOPES)
+            self.credentials = flow.run_local_server(port=0)
+            self._save()
+        else:
+            self.credentials = creds
+
+        return self.credentials
+
+    def refresh(self):
+        """Renueva el token y lo guarda en token.json"""
+        from google.auth.transport.requests import Request
+
+        with self._lock:
+            try:
+                self.credentials.refresh(Request())
+            except Exception:
+                GMAIL_TOKEN_REFRESHES.inc(resultado='error')
+                raise
+            GMAIL_TOKEN_REFRESHES.inc(resultado='ok')
+            self._save()
+        logger.info(f"🔑 Token de Gmail renovado (vence {self.credentials.expiry} UTC)")
+
+    def _save(self):
+        _write_atomic(self.token_path, self.credentials.to_json())
+
+    @staticmethod
+    def _seconds_left(creds) -> float:
+        if creds.expiry is None:
+            return float('inf')
+        return (creds.expiry - datetime.utcnow()).total_seconds()
+
+    def start(self):
+        """Inicia el hilo de renovación (idempotente)"""
+        creds = self.credentials
+        if self._thread is not None or not creds.refresh_token or creds.expiry is None:
+            return
+        self._thread = threading.Thread(target=self._run, name='gmail-token-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo de renovación"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            wait = self._seconds_left(self.credentials) - self.margin_seconds
+            if self._stop.wait(max(wait, 0)):
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo renovar el token de Gmail: {e} "
+                               f"(reintento en {REFRESH_RETRY_SECONDS}s)")
+                if self._stop.wait(REFRESH_RETRY_SECONDS):
+                    return
+
+
+_tokens: Optional[TokenManager] = None
+_tokens_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_token_manager() -> TokenManager:
+    """TokenManager del proceso (carga credenciales e inicia la renovación)"""
+    global _tokens
+    with _tokens_lock:
+        if _tokens is None:
+            start = time.perf_counter()
+            tokens = TokenManager()
+            tokens.load()
+            tokens.start()
+            _tokens = tokens
+            logger.info(f"🔑 Credenciales de Gmail listas en {time.perf_counter() - start:.2f}s")
+        return _tokens
+
+
+def get_gmail_service():
+    """
+    Servicio de Gmail API del hilo actual (creado la primera vez)
+
+    Returns:
+        Recurso de googleapiclient para gmail v1
+    """
+    service = getattr(_local, 'service', None)
+    if service is None:
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.discovery import build_from_document
+
+        http = AuthorizedHttp(get_token_manager().credentials,
+                              http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+        service = build_from_document(discovery_document(), http=http)
+        _local.service = service
+    return service
+
+
+def shutdown():
+    """Detiene la renovación en segundo plano (fin del proceso residente)"""
+    global _tokens
+    with _tokens_lock:
+        if _tokens is not None:
+            _tokens.stop()
+            _tokens = None
@@ -0,0 +1,438 @@
+"""
+Fuentes de correo intercambiables para GmailClient y HistoricalScraper
+
+Todas las fuentes hablan el formato de la Gmail API (respuestas de
+messages.list y mensajes format='full'), de modo que el resto del
+pipeline no distingue si el correo viene de Gmail o de un archivo local.
+
+- GmailMailSource: Gmail API (OAuth)
+- LocalMailSource: archivo mbox (ej: export de Google Takeout), Maildir
+  o directorio de archivos .eml, para re-procesar o benchmarkear offline
+
+Uso:
+    MAIL_SOURCE=/ruta/export.mbox python src/data_processing/email_processor.py
+    python src/learning/historical_scraper.py --source /ruta/Maildir
+"""
+
+import base64
+import hashlib
+import json
+import mmap
+import os
+import random
+import time
+from datetime import datetime
+from email import policy
+from email.parser import BytesParser
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+from monitoring.metrics import API_RETRIES
+
+
+# Re-intentos ante límites de tasa (429, 403 rateLimitExceeded) y errores 5xx
+MAX_RETRIES = int(os.getenv('GMAIL_MAX_RETRIES', '5'))
+BACKOFF_SECONDS = float(os.getenv('GMAIL_BACKOFF_SECONDS', '1'))
+BACKOFF_MAX_SECONDS = float(os.getenv('GMAIL_BACKOFF_MAX_SECONDS', '32'))
+# Máximo de IDs por llamada a messages.batchModify
+BATCH_MODIFY_LIMIT = 1000
+# Mensajes parseados que guarda cada LocalMailSource (get_message + adjuntos)
+PARSED_CACHE_SIZE = 64
+# attachmentId de un mensaje que es en sí mismo el adjunto (parte raíz sin partId)
+ROOT_ATTACHMENT_ID = 'root'
+
+_RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+
+# ============================================
+# INTERFAZ
+# ============================================
+
+class MailSource:
+    """Operaciones de la Gmail API que usa el pipeline"""
+
+    def list_messages(self, query: str = '', page_token: Optional[str] = None,
+                      max_results: int = 500) -> Dict:
+        """Respuesta de messages.list: {'messages': [{'id', 'threadId'}], 'nextPageToken'}"""
+        raise NotImplementedError
+
+    def get_message(self, msg_id: str) -> Dict:
+        """Mensaje completo en formato de messages.get(format='full')"""
+        raise NotImplementedError
+
+    def get_attachment(self, msg_id: str, attachment_id: str) -> Dict:
+        """Adjunto en formato de messages.attachments.get: {'data', 'size'}"""
+        raise NotImplementedError
+
+    def modify(self, msg_id: str, add_labels: Iterable[str] = (),
+               remove_labels: Iterable[str] = ()) -> Dict:
+        """Agrega / quita etiquetas de un mensaje"""
+        raise NotImplementedError
+
+    def modify_many(self, msg_ids: Iterable[str], add_labels: Iterable[str] = (),
+                    remove_labels: Iterable[str] = ()):
+        """Agrega / quita etiquetas de varios mensajes (por defecto, uno a uno)"""
+        for msg_id in msg_ids:
+            self.modify(msg_id, add_labels, remove_labels)
+
+    def list_labels(self) -> List[Dict]:
+        """Etiquetas: [{'id', 'name'}]"""
+        raise NotImplementedError
+
+
+def is_retryable(error: HttpError) -> bool:
+    """429, 5xx y 403 por límite de tasa (el resto de los 4xx no mejora reintentando)"""
+    status = error.resp.status
+    if status == 429 or status >= 500:
+        return True
+    if status == 403:
+        try:
+            details = json.loads(error.content.decode('utf-8'))['error'].get('errors') or []
+        except (ValueError, KeyError, AttributeError, UnicodeDecodeError):
+            return False
+        return any(detail.get('reason') in _RATE_LIMIT_REASONS for detail in details)
+    return False
+
+
+class GmailMailSource(MailSource):
+    """Fuente respaldada por el servicio de la Gmail API"""
+
+    def __init__(self, service, max_retries: int = MAX_RETRIES,
+                 backoff_seconds: float = BACKOFF_SECONDS,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            service: Servicio de googleapiclient (o uno simulado con la misma interfaz)
+            max_retries: Re-intentos ante 429 / 5xx antes de propagar el error
+            backoff_seconds: Espera base (se duplica por intento, con jitter)
+            sleep: Función de espera (inyectable en pruebas de carga)
+        """
+        self.service = service
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._sleep = sleep
+
+    def _execute(self, request):
+        """Ejecuta un request con backoff exponencial (respeta Retry-After)"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return request.execute()
+            except HttpError as error:
+                if attempt >= self.max_retries or not is_retryable(error):
+                    raise
+                API_RETRIES.inc(api='gmail', codigo=str(error.resp.status))
+                delay = min(self.backoff_seconds * 2 ** attempt, BACKOFF_MAX_SECONDS)
+                retry_after = error.resp.get('retry-after')
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                self._sleep(delay * (0.5 + random.random() / 2))
+
+    def list_messages(self, query='', page_token=None, max_results=500):
+        request = {'userId': 'me', 'q': query, 'maxResults': max_results}
+        if page_token:
+            request['pageToken'] = page_token
+        return self._execute(self.service.users().messages().list(**request))
+
+    def get_message(self, msg_id):
+        return self._execute(self.service.users().messages().get(
+            userId='me', id=msg_id, format='full'
+        ))
+
+    def get_attachment(self, msg_id, attachment_id):
+        return self._execute(self.service.users().messages().attachments().get(
+            userId='me', messageId=msg_id, id=attachment_id
+        ))
+
+    def modify(self, msg_id, add_labels=(), remove_labels=()):
+        return self._execute(self.service.users().messages().modify(
+            userId='me',
+            id=msg_id,
+            body={'addLabelIds': list(add_labels), 'removeLabelIds': list(remove_labels)}
+        ))
+
+    def modify_many(self, msg_ids, add_labels=(), remove_labels=()):
+        msg_ids = list(msg_ids)
+        for start in range(0, len(msg_ids), BATCH_MODIFY_LIMIT):
+            self._execute(self.service.users().messages().batchModify(
+                userId='me',
+                body={'ids': msg_ids[start:start + BATCH_MODIFY_LIMIT],
+                      'addLabelIds': list(add_labels), 'removeLabelIds': list(remove_labels)}
+            ))
+
+    def list_labels(self):
+        return self._execute(self.service.users().labels().list(userId='me')).get('labels', [])
+
+
+# ============================================
+# FUENTE LOCAL
+# ============================================
+
+# Etiquetas de X-Gmail-Labels (Google Takeout) → IDs de sistema de Gmail
+_SYSTEM_LABELS = {
+    'inbox': 'INBOX', 'unread': 'UNREAD', 'sent': 'SENT', 'important': 'IMPORTANT',
+    'starred': 'STARRED', 'spam': 'SPAM', 'trash': 'TRASH', 'draft': 'DRAFT',
+}
+
+# Un parser compartido: headersonly se pasa en cada llamada
+_PARSER = BytesParser(policy=policy.default)
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def _message_id(key: str) -> str:
+    """ID estable (mismo archivo → mismos IDs entre corridas)"""
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _label_ids(header: Optional[str], default_label: str) -> set:
+    if not header:
+        return {'INBOX', 'UNREAD', default_label}
+    names = [name.strip() for name in str(header).split(',') if name.strip()]
+    return {_SYSTEM_LABELS.get(name.lower(), name) for name in names}
+
+
+class LocalMailSource(MailSource):
+    """
+    Lee un archivo mbox, un Maildir o un directorio de .eml
+
+    El mbox se abre con mmap y solo se indexan los offsets de cada
+    mensaje; cada mensaje se parsea recién cuando se pide (los headers de
+    fecha/etiquetas se leen una vez y se guardan para filtrar queries).
+
+    Los mensajes sin X-Gmail-Labels se consideran no leídos y con la
+    etiqueta configurada (el archivo se asume como export de esa etiqueta).
+    Las etiquetas modificadas (mark_as_read) solo viven en memoria.
+    """
+
+    def __init__(self, path: str, label: Optional[str] = None):
+        self.path = os.path.abspath(path)
+        self.default_label = label or os.getenv('GMAIL_LABEL', 'bot-cobertores')
+
+        # id → (archivo, inicio, fin) ; fin=None = archivo completo
+        self._locations: Dict[str, Tuple[str, int, Optional[int]]] = {}
+        self._order: List[str] = []
+        self._meta: Dict[str, Tuple[Optional[datetime], set, Optional[str]]] = {}
+        self._seen = set()      # leídos según flags de Maildir
+        self._mmaps = {}
+        self._parsed_cache: OrderedDict = OrderedDict()   # LRU de mensajes parseados
+
+        if os.path.isfile(self.path) and not self.path.lower().endswith('.eml'):
+            self._index_mbox(self.path)
+        elif os.path.isdir(os.path.join(self.path, 'cur')) or os.path.isdir(os.path.join(self.path, 'new')):
+            self._index_maildir(self.path)
+        else:
+            self._index_eml(self.path)
+
+    # ---------------------------------------------------------------------
+    # Indexación
+    # ---------------------------------------------------------------------
+
+    def _add(self, key: str, location: Tuple[str, int, Optional[int]]):
+        msg_id = _message_id(key)
+        self._locations[msg_id] = location
+        self._order.append(msg_id)
+        return msg_id
+
+    def _index_mbox(self, path: str):
+        if os.path.getsize(path) == 0:
+            return
+
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mmaps[path] = mm
+
+        # Cada mensaje empieza con una línea "From " al inicio del archivo
+        # o después de un salto de línea
+        starts = [0] if mm[:5] == b'From ' else []
+        pos = mm.find(b'\nFrom ')
+        while pos != -1:
+            starts.append(pos + 1)
+            pos = mm.find(b'\nFrom ', pos + 1)
+
+        for start, end in zip(starts, starts[1:] + [len(mm)]):
+            body_start = mm.find(b'\n', start, end) + 1
+            if body_start:
+                self._add(f"{os.path.basename(path)}:{start}", (path, body_start, end))
+
+    def _index_maildir(self, path: str):
+        for sub in ('cur', 'new'):
+            folder = os.path.join(path, sub)
+            if not os.path.isdir(folder):
+                continue
+            for name in sorted(os.listdir(folder)):
+                file_path = os.path.join(folder, name)
+                msg_id = self._add(os.path.relpath(file_path, path), (file_path, 0, None))
+
+                # Flags de Maildir: ':2,S' = leído
+                if ':2,' in name and 'S' in name.rsplit(':2,', 1)[1]:
+                    self._seen.add(msg_id)
+
+    def _index_eml(self, path: str):
+        if os.path.isfile(path):
+            self._add(os.path.basename(path), (path, 0, None))
+            return
+        for root, _dirs, files in sorted(os.walk(path)):
+            for name in sorted(files):
+                if name.lower().endswith('.eml'):
+                    file_path = os.path.join(root, name)
+                    self._add(os.path.relpath(file_path, path), (file_path, 0, None))
+
+    # ---------------------------------------------------------------------
+    # Lectura
+    # ---------------------------------------------------------------------
+
+    def _raw(self, msg_id: str) -> bytes:
+        path, start, end = self._locations[msg_id]
+        if path in self._mmaps:
+            return self._mmaps[path][start:end]
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _metadata(self, msg_id: str):
+        """(fecha, etiquetas, thread_id) leyendo solo los headers"""
+        if msg_id not in self._meta:
+            headers = _PARSER.parsebytes(self._raw(msg_id), headersonly=True)
+            try:
+                date = parsedate_to_datetime(str(headers['Date'])) if headers['Date'] else None
+            except (TypeError, ValueError):
+                date = None
+            if date is not None and date.tzinfo is not None:
+                date = date.astimezone().replace(tzinfo=None)
+
+            labels = _label_ids(headers['X-Gmail-Labels'], self.default_label)
+            if msg_id in self._seen:
+                labels.discard('UNREAD')
+
+            self._meta[msg_id] = (date, labels, self._thread_id(headers, msg_id))
+        return self._meta[msg_id]
+
+    @staticmethod
+    def _thread_id(headers, msg_id: str) -> str:
+        """Hilo = primer Message-ID de References / In-Reply-To / propio"""
+        for name in ('References', 'In-Reply-To', 'Message-ID'):
+            value = str(headers[name] or '').split()
+            if value:
+                return _message_id(value[0])
+        return msg_id
+
+    def _parsed(self, msg_id: str):
+        message = self._parsed_cache.get(msg_id)
+        if message is None:
+            message = _PARSER.parsebytes(self._raw(msg_id))
+            self._parsed_cache[msg_id] = message
+            if len(self._parsed_cache) > PARSED_CACHE_SIZE:
+                self._parsed_cache.popitem(last=False)
+        else:
+            self._parsed_cache.move_to_end(msg_id)
+        return message
+
+    def _payload(self, part, part_id: str) -> Dict:
+        """email.message → payload con la forma de la Gmail API"""
+        payload = {
+            'partId': part_id,
+            'mimeType': part.get_content_type(),
+            'filename': part.get_filename() or '',
+            'headers': [{'name': name, 'value': str(value)} for name, value in part.items()],
+            'body': {'size': 0}
+        }
+
+        if part.is_multipart():
+            payload['parts'] = [
+                self._payload(sub, f"{part_id}.{idx}" if part_id else str(idx))
+                for idx, sub in enumerate(part.iter_parts())
+            ]
+            return payload
+
+        # Como la Gmail API: bytes sin transfer-encoding, en el charset
+        # original (declarado en Content-Type, lo usa mime.decode_part)
+        data = part.get_payload(decode=True) or b''
+        if payload['filename']:
+            payload['body'] = {'attachmentId': part_id or ROOT_ATTACHMENT_ID, 'size': len(data)}
+        else:
+            payload['body'] = {'data': _b64(data), 'size': len(data)}
+
+        return payload
+
+    # ---------------------------------------------------------------------
+    # Interfaz MailSource
+    # ---------------------------------------------------------------------
+
+    def _matches(self, msg_id: str, filters: List[Tuple[str, str]]) -> bool:
+        date, labels, _thread = self._metadata(msg_id)
+        labels_lower = {label.lower() for label in labels}
+
+        for key, value in filters:
+            if key in ('after', 'before'):
+                limit = datetime.strptime(value.replace('-', '/'), '%Y/%m/%d')
+                if date is not None and (date < limit if key == 'after' else date >= limit):
+                    return False
+            elif key == 'is' and value in ('unread', 'read'):
+                if ('unread' in labels_lower) != (value == 'unread'):
+                    return False
+            elif key == 'label' and value.lower() not in labels_lower:
+                return False
+        return True
+
+    def list_messages(self, query='', page_token=None, max_results=500):
+        filters = [
+            tuple(token.split(':', 1)) for token in (query or '').split() if ':' in token
+        ]
+        matching = [msg_id for msg_id in self._order if self._matches(msg_id, filters)]
+
+        start = int(page_token or 0)
+        page = matching[start:start + max_results]
+        response = {
+            'messages': [{'id': msg_id, 'threadId': self._metadata(msg_id)[2]} for msg_id in page],
+            'resultSizeEstimate': len(matching)
+        }
+        if start + max_results < len(matching):
+            response['nextPageToken'] = str(start + max_results)
+        return response
+
+    def get_message(self, msg_id):
+        message = self._parsed(msg_id)
+        date, labels, thread_id = self._metadata(msg_id)
+        return {
+            'id': msg_id,
+            'threadId': thread_id,
+            'labelIds': sorted(labels),
+            'internalDate': str(int(date.timestamp() * 1000)) if date else None,
+            'sizeEstimate': len(self._raw(msg_id)),
+            'payload': self._payload(message, '')
+        }
+
+    def get_attachment(self, msg_id, attachment_id):
+        part = self._parsed(msg_id)
+        if attachment_id != ROOT_ATTACHMENT_ID:
+            for idx in attachment_id.split('.'):
+                part = list(part.iter_parts())[int(idx)]
+        data = part.get_payload(decode=True) or b''
+        return {'data': _b64(data), 'size': len(data)}
+
+    def modify(self, msg_id, add_labels=(), remove_labels=()):
+        date, labels, thread_id = self._metadata(msg_id)
+        labels = (labels | set(add_labels)) - set(remove_labels)
+        self._meta[msg_id] = (date, labels, thread_id)
+        return {'id': msg_id, 'labelIds': sorted(labels)}
+
+    def list_labels(self):
+        names = {self.default_label}
+        for msg_id in self._order:
+            names |= self._metadata(msg_id)[1]
+        return [{'id': name, 'name': name} for name in sorted(names)]
+
+    def __len__(self):
+        return len(self._order)
+
+
+def mail_source_from_env() -> Optional[MailSource]:
+    """LocalMailSource si MAIL_SOURCE apunta a un archivo/directorio (None = Gmail)"""
+    path = os.getenv('MAIL_SOURCE', '').strip()
+    if not path or path.lower() == 'gmail':
+        return None
+    return LocalMailSource(path)
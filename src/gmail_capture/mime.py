@@ -0,0 +1,173 @@
+"""
+MIME - Recorrido de payloads de la Gmail API en una sola pasada
+
+walk_payload() recorre el árbol de partes de messages.get(format='full')
+una sola vez (iterativo, sin recursión) y en el mismo recorrido:
+
+- decodifica el primer text/plain y el primer text/html que no sean
+  adjuntos, cada uno una sola vez y con el charset de su Content-Type
+- arma los descriptores de adjuntos (nombre, tipo, tamaño, attachmentId)
+  sin descargarlos: la descarga es perezosa, solo de los que se procesan
+
+Para emails solo HTML, body_text sale de html_to_text(), así el email
+sigue pasando por similitud / Gemini en vez de quedar sin tarea.
+
+Uso:
+    from gmail_capture.mime import walk_payload
+    parsed = walk_payload(message['payload'])
+    parsed['body_text'], parsed['body_html'], parsed['attachments']
+"""
+
+import re
+import base64
+import codecs
+import binascii
+from functools import lru_cache
+from html import unescape
+from typing import Dict, List, Optional
+
+
+_CHARSET = re.compile(r'charset\s*=\s*"?([^";\s]+)', re.I)
+
+# Un solo barrido para lo que no es texto visible: comentarios y el
+# contenido completo de script/style/head/title
+_HTML_HIDDEN = re.compile(r'<!--.*?-->|<(script|style|head|title)\b[^>]*>.*?</\1\s*>', re.S | re.I)
+_HTML_BLOCK = re.compile(
+    r'<br\s*/?>|</?(?:p|div|tr|li|ul|ol|h[1-6]|table|blockquote|pre|hr)\b[^>]*>', re.I)
+_HTML_CELL = re.compile(r'</t[dh]\s*>', re.I)
+_HTML_TAG = re.compile(r'<[^>]*>')
+_SPACES = re.compile(r'[ \t\r\f\v\xa0]+')
+_NEWLINES = re.compile(r' *\n[ \n]*')
+
+
+def html_to_text(html: str) -> str:
+    """
+    Convierte HTML de email a texto plano legible
+
+    Descarta script/style/head y comentarios, convierte bloques y <br> en
+    saltos de línea, celdas en espacios y decodifica entidades.
+
+    Args:
+        html: HTML del email
+
+    Returns:
+        Texto plano (líneas sin espacios sobrantes ni líneas vacías repetidas)
+    """
+    if not html:
+        return ''
+    text = _HTML_HIDDEN.sub('', html)
+    text = _HTML_CELL.sub(' ', text)
+    text = _HTML_BLOCK.sub('\n', text)
+    text = unescape(_HTML_TAG.sub('', text))
+    text = _SPACES.sub(' ', text)
+    return _NEWLINES.sub('\n', text).strip()
+
+
+def _header(part: Dict, name: str) -> str:
+    for header in part.get('headers') or ():
+        if header.get('name', '').lower() == name:
+            return header.get('value', '')
+    return ''
+
+
+@lru_cache(maxsize=256)
+def _charset(content_type: str) -> str:
+    """Charset de un Content-Type (se repiten mucho: en caché)"""
+    match = _CHARSET.search(content_type)
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+def decode_part(part: Dict) -> str:
+    """
+    Decodifica el cuerpo (base64 url-safe) de una parte de texto
+
+    Args:
+        part: Parte del payload con body.data
+
+    Returns:
+        Texto decodificado con el charset de la parte (UTF-8 si no hay o
+        no se reconoce)
+    """
+    data = part.get('body', {}).get('data')
+    if not data:
+        return ''
+    try:
+        raw = base64.urlsafe_b64decode(data)
+    except (binascii.Error, ValueError):
+        # Algunos clientes omiten el relleno '='
+        try:
+            raw = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+        except (binascii.Error, ValueError):
+            return ''
+
+    return raw.decode(_charset(_header(part, 'content-type')), errors='ignore')
+
+
+def _descriptor(part: Dict, filename: str) -> Dict:
+    body = part.get('body') or {}
+    descriptor = {
+        'filename': filename,
+        'mime_type': part.get('mimeType'),
+        'size': body.get('size', 0),
+        'attachment_id': body.get('attachmentId'),
+        'part_id': part.get('partId'),
+    }
+    # Adjuntos chicos pueden venir inline (body.data) en vez de por attachmentId
+    if descriptor['attachment_id'] is None and body.get('data'):
+        descriptor['data'] = body['data']
+    return descriptor
+
+
+def walk_payload(payload: Dict, bodies: bool = True) -> Dict:
+    """
+    Recorre el árbol de partes una vez
+
+    Args:
+        payload: message['payload'] de la Gmail API
+        bodies: Decodificar los cuerpos (False: solo adjuntos)
+
+    Returns:
+        Dict con body_text, body_html y attachments (descriptores con
+        filename, mime_type, size, attachment_id, part_id y data si viene inline)
+    """
+    text: Optional[str] = None
+    html: Optional[str] = None
+    attachments: List[Dict] = []
+
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        children = part.get('parts')
+        if children:
+            # Al revés para que el pop respete el orden del documento
+            stack.extend(reversed(children))
+            continue
+
+        filename = part.get('filename')
+        if filename:
+            attachments.append(_descriptor(part, filename))
+            continue
+
+        mime_type = part.get('mimeType')
+        if mime_type == 'text/plain' or mime_type == 'text/html':
+            # Texto sin nombre que Gmail no trae inline: adjunto (ej: .txt generado)
+            if 'attachmentId' in part.get('body', ()):
+                attachments.append(_descriptor(part, f"adjunto_{part.get('partId') or '0'}.txt"))
+            elif not bodies:
+                continue
+            elif mime_type == 'text/plain':
+                if text is None:
+                    text = decode_part(part)
+            elif html is None:
+                html = decode_part(part)
+
+    html = html or ''
+    if not text and html:
+        text = html_to_text(html)
+
+    return {'body_text': text or '', 'body_html': html, 'attachments': attachments}
@@ -0,0 +1,449 @@
+"""
+Agregados parciales y combinables del análisis histórico
+
+Cada shard de emails produce un LearningAggregate (Counters, sets y
+sumas) que se combina con merge(). El mismo merge sirve para repartir
+el análisis en un pool de procesos y para re-aprendizaje incremental
+(combinar un agregado nuevo sobre uno existente).
+"""
+
+import os
+import re
+import bisect
+from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from functools import partial
+from typing import Dict, Iterable, List, Optional
+
+from database.rollups import to_local_naive
+from learning.keyword_classifier import default_classifier
+from learning.sketches import DistinctCounter, HeavyHitters, HyperLogLog
+
+
+# Bajo este volumen el costo de levantar procesos supera la ganancia
+MIN_EMAILS_PER_SHARD = 1000
+
+# Candidatos del top-k de palabras en modo de memoria acotada
+BOUNDED_TOP_WORDS = 500
+
+# Eventos (mensajes fechados) por hilo en modo de memoria acotada: se
+# conservan los más antiguos, que son los que definen la primera respuesta
+BOUNDED_THREAD_EVENTS = 50
+
+_SENDER_RE = re.compile(r'<(.+?)>')
+_WORD_RE = re.compile(r'\w+')
+
+
+# Factories a nivel de módulo (un lambda no se puede serializar con pickle)
+def new_sender_stats() -> Dict:
+    return {
+        'total': 0,
+        'urgency_counts': Counter(),
+        'intent_counts': Counter(),
+        'action_counts': Counter(),
+        # Sumas y conteos (no listas): solo se usa el promedio
+        'response_sum': 0.0,    # segundos hasta la respuesta interna
+        'response_count': 0,
+        'reply_sum': 0.0,       # segundos que tarda el remitente en contestarnos
+        'reply_count': 0,
+        'has_attachments': 0
+    }
+
+
+def new_internal_stats() -> Dict:
+    return {
+        'total': 0,
+        'forwarded': 0,
+        'replied': 0,
+        'cc_count': 0,
+        'response_sum': 0.0,
+        'response_count': 0,
+        'roles_detected': Counter(),
+        'threads': 0
+    }
+
+
+def new_thread_stats(bounded: bool = False) -> Dict:
+    return {
+        'messages': 0,
+        'participants': DistinctCounter() if bounded else set(),
+        'internal_count': 0,
+        'external_count': 0,
+        'has_forward': False,
+        'has_cc': False,
+        'has_attachments': False,
+        'start_time': None,
+        'end_time': None,
+        'events': [],           # (fecha, remitente, es_interno) por mensaje
+    }
+
+
+def extract_address(from_field: str) -> str:
+    """'Nombre <a@b.cl>' → 'a@b.cl'"""
+    match = _SENDER_RE.search(from_field or '')
+    return match.group(1) if match else (from_field or '')
+
+
+def parse_date(value: str) -> Optional[datetime]:
+    """Header Date → datetime local sin zona horaria (None si no se entiende)"""
+    try:
+        return to_local_naive(parsedate_to_datetime(value)) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def average(total: float, count: int) -> Optional[float]:
+    """Promedio desde suma y conteo (None sin datos)"""
+    return total / count if count else None
+
+
+def _with_defaults(factory, stats: Dict) -> Dict:
+    """Completa claves nuevas en stats de checkpoints anteriores"""
+    merged = factory()
+    merged.update((key, value) for key, value in stats.items() if key in merged)
+    return merged
+
+
+# Tipos que JSON no soporta → dict etiquetado (checkpoints)
+_SKETCHES = {'HeavyHitters': HeavyHitters, 'HyperLogLog': HyperLogLog,
+             'DistinctCounter': DistinctCounter}
+
+
+def _encode(value):
+    if isinstance(value, Counter):
+        return {'__counter__': dict(value)}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, set):
+        return {'__set__': sorted(value)}
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, tuple(_SKETCHES.values())):
+        return {'__sketch__': type(value).__name__, 'data': value.to_dict()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if '__counter__' in value:
+        return Counter(value['__counter__'])
+    if '__set__' in value:
+        return set(value['__set__'])
+    if '__datetime__' in value:
+        return datetime.fromisoformat(value['__datetime__'])
+    if '__sketch__' in value:
+        return _SKETCHES[value['__sketch__']].from_dict(value['data'])
+    return {key: _decode(item) for key, item in value.items()}
+
+
+def _min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+class LearningAggregate:
+    """
+    Estadísticas de remitentes, autores internos e hilos
+
+    Las palabras de los asuntos se cuentan al vuelo en word_counts (no se
+    guardan los asuntos). Con bounded=True el conteo usa un top-k sobre
+    Count-Min Sketch y los participantes de cada hilo un DistinctCounter
+    (exacto hasta 16, HyperLogLog sobre eso), de modo que la memoria de
+    cada remitente/hilo no crece con el volumen. La cantidad de remitentes
+    e hilos sí: sigue siendo un dict por clave.
+    """
+
+    def __init__(self, internal_domain: Optional[str] = None, bounded: bool = False):
+        self.internal_domain = internal_domain or os.getenv('INTERNAL_DOMAIN', '@usach.cl')
+        self.bounded = bounded
+        self.emails = 0
+        self.word_counts = HeavyHitters(BOUNDED_TOP_WORDS) if bounded else Counter()
+        self.sender_stats = defaultdict(new_sender_stats)
+        self.internal_stats = defaultdict(new_internal_stats)
+        self.thread_stats = defaultdict(partial(new_thread_stats, bounded))
+
+    # =========================================================================
+    # ACUMULACIÓN
+    # =========================================================================
+
+    def add_emails(self, emails: Iterable[Dict]) -> 'LearningAggregate':
+        for email in emails:
+            self.add_email(email)
+        return self
+
+    def add_email(self, email: Dict):
+        """Acumula un email (dict de HistoricalScraper._get_email_details)"""
+        sender_email = extract_address(email['from'])
+        is_internal = self.internal_domain in sender_email
+
+        if not is_internal:
+            self._add_sender(sender_email, email)
+        else:
+            self._add_internal_author(sender_email, email)
+
+        self._add_thread(email['thread_id'], sender_email, email, is_internal)
+        self.emails += 1
+
+    def _add_sender(self, sender_email: str, email: Dict):
+        """Patrones de un remitente externo"""
+        stats = self.sender_stats[sender_email]
+        stats['total'] += 1
+
+        subject = email['subject'].lower()
+
+        # Detectar urgencia, intención y acción en una sola pasada
+        clasificacion = default_classifier().classify(subject)
+        stats['urgency_counts'][clasificacion['urgency']] += 1
+        stats['intent_counts'][clasificacion['intent']] += 1
+        stats['action_counts'][clasificacion['action']] += 1
+
+        if email['has_attachments']:
+            stats['has_attachments'] += 1
+
+        self.word_counts.update(_WORD_RE.findall(subject))
+
+    def _add_internal_author(self, author_email: str, email: Dict):
+        """Patrones de un autor interno"""
+        stats = self.internal_stats[author_email]
+        stats['total'] += 1
+
+        # Detectar forwards
+        if email['in_reply_to'] or 'fwd' in email['subject'].lower():
+            stats['forwarded'] += 1
+
+        # Detectar replies
+        if email['in_reply_to']:
+            stats['replied'] += 1
+
+        # Contar CCs
+        if email['cc']:
+            stats['cc_count'] += len(email['cc'].split(','))
+
+        # Detectar rol por keywords en subject
+        subject_lower = email['subject'].lower()
+        if any(kw in subject_lower for kw in ['venta', 'cliente', 'comercial']):
+            stats['roles_detected']['ventas'] += 1
+        elif any(kw in subject_lower for kw in ['operacion', 'produccion', 'logistica']):
+            stats['roles_detected']['operaciones'] += 1
+        elif any(kw in subject_lower for kw in ['compra', 'proveedor']):
+            stats['roles_detected']['compras'] += 1
+
+    def _add_thread(self, thread_id: str, sender: str, email: Dict, is_internal: bool):
+        """Patrones de un hilo"""
+        stats = self.thread_stats[thread_id]
+        stats['messages'] += 1
+        stats['participants'].add(sender)
+
+        if is_internal:
+            stats['internal_count'] += 1
+        else:
+            stats['external_count'] += 1
+
+        if 'fwd' in email['subject'].lower():
+            stats['has_forward'] = True
+
+        if email['cc']:
+            stats['has_cc'] = True
+
+        if email['has_attachments']:
+            stats['has_attachments'] = True
+
+        sent_at = parse_date(email.get('date'))
+        if sent_at:
+            event = (sent_at, sender, is_internal)
+            if self.bounded:
+                # Ordenados y recortados: el hilo no crece más allá del límite
+                bisect.insort(stats['events'], event)
+                if len(stats['events']) > BOUNDED_THREAD_EVENTS:
+                    stats['events'].pop()
+            else:
+                stats['events'].append(event)
+            stats['start_time'] = _min(stats['start_time'], sent_at)
+            stats['end_time'] = _max(stats['end_time'], sent_at)
+
+    # =========================================================================
+    # TIEMPOS DE RESPUESTA
+    # =========================================================================
+
+    def compute_response_times(self):
+        """
+        Calcula latencias de respuesta a partir de los eventos de cada hilo
+
+        Ordena los mensajes de cada hilo por fecha (una vez) y recorre los
+        pares consecutivos de remitentes distintos:
+        - externo → interno: tiempo de respuesta de la empresa; se acredita
+          al remitente externo y al autor interno que respondió
+        - interno → externo: tiempo de respuesta del remitente externo
+
+        Se recalcula desde cero, así que puede llamarse tras cada merge().
+        Con bounded=True solo cuentan los primeros BOUNDED_THREAD_EVENTS
+        mensajes de cada hilo.
+        """
+        for stats in self.sender_stats.values():
+            stats.update(response_sum=0.0, response_count=0, reply_sum=0.0, reply_count=0)
+        for stats in self.internal_stats.values():
+            stats.update(response_sum=0.0, response_count=0, threads=0)
+
+        for stats in self.thread_stats.values():
+            events = stats['events']
+            events.sort()
+
+            for author in {sender for _, sender, internal in events if internal}:
+                self.internal_stats[author]['threads'] += 1
+
+            for (prev_at, prev_sender, prev_internal), (at, sender, internal) in zip(events, events[1:]):
+                if sender == prev_sender:
+                    continue
+
+                latency = (at - prev_at).total_seconds()
+
+                if internal and not prev_internal:
+                    for accumulated in (self.sender_stats[prev_sender], self.internal_stats[sender]):
+                        accumulated['response_sum'] += latency
+                        accumulated['response_count'] += 1
+                elif prev_internal and not internal:
+                    replier = self.sender_stats[sender]
+                    replier['reply_sum'] += latency
+                    replier['reply_count'] += 1
+
+    # =========================================================================
+    # SERIALIZACIÓN
+    # =========================================================================
+
+    def to_dict(self) -> Dict:
+        """Representación JSON del agregado (para checkpoints)"""
+        return {
+            'internal_domain': self.internal_domain,
+            'bounded': self.bounded,
+            'emails': self.emails,
+            'word_counts': _encode(self.word_counts),
+            'sender_stats': _encode(self.sender_stats),
+            'internal_stats': _encode(self.internal_stats),
+            'thread_stats': _encode(self.thread_stats),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LearningAggregate':
+        """Reconstruye un agregado serializado con to_dict()"""
+        aggregate = cls(data['internal_domain'], data['bounded'])
+        aggregate.emails = data['emails']
+        aggregate.word_counts = _decode(data['word_counts'])
+        aggregate.sender_stats.update(
+            (key, _with_defaults(new_sender_stats, stats))
+            for key, stats in _decode(data['sender_stats']).items()
+        )
+        aggregate.internal_stats.update(
+            (key, _with_defaults(new_internal_stats, stats))
+            for key, stats in _decode(data['internal_stats']).items()
+        )
+        aggregate.thread_stats.update(
+            (key, _with_defaults(partial(new_thread_stats, aggregate.bounded), stats))
+            for key, stats in _decode(data['thread_stats']).items()
+        )
+
+        for stats in aggregate.thread_stats.values():
+            stats['events'] = [tuple(event) for event in stats['events']]
+            if isinstance(stats['participants'], HyperLogLog):
+                # Checkpoints anteriores: participantes siempre en HyperLogLog
+                participants = DistinctCounter(precision=stats['participants'].precision)
+                participants.hll = stats['participants']
+                stats['participants'] = participants
+
+        return aggregate
+
+    # =========================================================================
+    # COMBINACIÓN
+    # =========================================================================
+
+    def merge(self, other: 'LearningAggregate') -> 'LearningAggregate':
+        """Combina otro agregado sobre este (in-place) y lo retorna"""
+        if self.bounded != other.bounded:
+            raise ValueError("No se pueden combinar agregados exactos y acotados")
+
+        self.emails += other.emails
+
+        if self.bounded:
+            self.word_counts.merge(other.word_counts)
+        else:
+            self.word_counts.update(other.word_counts)
+
+        for email, theirs in other.sender_stats.items():
+            ours = self.sender_stats[email]
+            ours['total'] += theirs['total']
+            ours['urgency_counts'].update(theirs['urgency_counts'])
+            ours['intent_counts'].update(theirs['intent_counts'])
+            ours['action_counts'].update(theirs['action_counts'])
+            for key in ('response_sum', 'response_count', 'reply_sum', 'reply_count', 'has_attachments'):
+                ours[key] += theirs[key]
+
+        for email, theirs in other.internal_stats.items():
+            ours = self.internal_stats[email]
+            for key in ('total', 'forwarded', 'replied', 'cc_count', 'response_sum', 'response_count'):
+                ours[key] += theirs[key]
+            ours['roles_detected'].update(theirs['roles_detected'])
+
+        for thread_id, theirs in other.thread_stats.items():
+            ours = self.thread_stats[thread_id]
+            for key in ('messages', 'internal_count', 'external_count'):
+                ours[key] += theirs[key]
+            ours['participants'] |= theirs['participants']
+            if self.bounded:
+                ours['events'] = sorted(ours['events'] + theirs['events'])[:BOUNDED_THREAD_EVENTS]
+            else:
+                ours['events'].extend(theirs['events'])
+            for key in ('has_forward', 'has_cc', 'has_attachments'):
+                ours[key] = ours[key] or theirs[key]
+            ours['start_time'] = _min(ours['start_time'], theirs['start_time'])
+            ours['end_time'] = _max(ours['end_time'], theirs['end_time'])
+
+        return self
+
+
+def analyze_shard(emails: List[Dict], internal_domain: str,
+                  bounded: bool = False) -> LearningAggregate:
+    """Analiza un shard (ejecutado dentro de un proceso del pool)"""
+    return LearningAggregate(internal_domain, bounded).add_emails(emails)
+
+
+def analyze_parallel(emails: List[Dict], internal_domain: str,
+                     workers: Optional[int] = None,
+                     bounded: bool = False) -> LearningAggregate:
+    """
+    Analiza emails repartidos en un pool de procesos y combina los parciales
+
+    Con pocos emails (o workers=1) analiza en el proceso actual.
+
+    Args:
+        emails: Emails a analizar
+        internal_domain: Dominio interno (ej: '@empresa.cl')
+        workers: Procesos (por defecto os.cpu_count())
+        bounded: Usar estructuras de memoria acotada (ver LearningAggregate)
+
+    Returns:
+        Agregado combinado
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(emails) // MIN_EMAILS_PER_SHARD, 1))
+
+    if workers <= 1:
+        return analyze_shard(emails, internal_domain, bounded)
+
+    shard_size = -(-len(emails) // workers)
+    shards = [emails[i:i + shard_size] for i in range(0, len(emails), shard_size)]
+
+    result = LearningAggregate(internal_domain, bounded)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for shard_result in pool.map(partial(analyze_shard, internal_domain=internal_domain,
+                                             bounded=bounded), shards):
+            result.merge(shard_result)
+
+    return result
@@ -5,69 +5,84 @@ Analiza Gmail histórico para extraer patrones operativos
 Uso:
     python historical_scraper.py --months 6 --mode full
     python historical_scraper.py --months 3 --mode senders-only
+    python historical_scraper.py --resume          # última sesión interrumpida
+    python historical_scraper.py --resume 12       # sesión específica
+    python historical_scraper.py --source export.mbox   # sin Gmail (mbox/Maildir/.eml)
 """
 
 import os
 import sys
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-import re
-from collections import defaultdict, Counter
+import base64
 import json
 
 # Agregar path del proyecto
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from gmail_capture.gmail_client import GmailClient
+from gmail_capture.mail_source import LocalMailSource
+from gmail_capture.mime import walk_payload
 from database.connection import get_session
+from database.upsert import upsert
+from database.bodies import compress_body, decompress_body
 from database.models import (
     SenderProfile, InternalAuthorProfile, ThreadPattern,
     LearnedRule, LearningSession, KeywordPattern
 )
 
+from learning.keyword_classifier import (
+    URGENCY_KEYWORDS, INTENT_KEYWORDS, ACTION_KEYWORDS, default_classifier
+)
+from learning.aggregates import LearningAggregate, analyze_parallel, average
+
 from sqlalchemy import func
-from dotenv import load_dotenv
+from googleapiclient.errors import HttpError
+from app_config import setup_logging
+
+
+# Recorrido del buzón
+PAGE_SIZE = 500
+CHECKPOINT_EVERY = int(os.getenv('LEARNING_CHECKPOINT_EVERY', '2000'))   # emails por lote
+# El lote crece con el agregado (fracción de los emails ya analizados): el
+# checkpoint reescribe todo el agregado, así el total escrito es lineal
+CHECKPOINT_GROWTH = float(os.getenv('LEARNING_CHECKPOINT_GROWTH', '0.25'))
+RESUMABLE_STATUSES = ('running', 'failed', 'cancelled')
+
 
-load_dotenv()
+def _unpack_aggregate(checkpoint: Dict) -> Dict:
+    """Agregado de un checkpoint (comprimido, o JSON plano en checkpoints anteriores)"""
+    aggregate = checkpoint['aggregate']
+    if isinstance(aggregate, str):
+        aggregate = json.loads(decompress_body(checkpoint['codec'], base64.b64decode(aggregate)))
+    return aggregate
 
 
 class HistoricalScraper:
     """Scraper de Gmail histórico para fase de aprendizaje"""
     
-    # Palabras clave por categoría
-    URGENCY_KEYWORDS = {
-        'critica': ['urgente', 'emergencia', 'inmediato', 'hoy mismo', 'ahora', 'ya'],
-        'alta': ['pronto', 'prioritario', 'importante', 'necesario', 'asap'],
-        'media': ['cuando puedas', 'esta semana', 'revisar'],
-        'baja': ['info', 'informativo', 'fyi', 'para conocimiento']
-    }
+    # Palabras clave por categoría (compartidas con el pipeline en vivo)
+    URGENCY_KEYWORDS = URGENCY_KEYWORDS
+    INTENT_KEYWORDS = INTENT_KEYWORDS
+    ACTION_KEYWORDS = ACTION_KEYWORDS
     
-    INTENT_KEYWORDS = {
-        'cotizacion': ['cotización', 'cotizar', 'precio', 'cuánto cuesta', 'presupuesto'],
-        'orden_compra': ['orden de compra', 'oc', 'pedido', 'comprar'],
-        'reclamo': ['reclamo', 'problema', 'error', 'mal', 'incorrecto', 'queja'],
-        'soporte': ['ayuda', 'soporte', 'apoyo', 'consulta', 'duda'],
-        'seguimiento': ['seguimiento', 'estado', 'avance', 'progreso', '¿cómo va?'],
-        'urgente': ['urgente', 'emergencia', 'inmediato', 'crítico']
-    }
-    
-    ACTION_KEYWORDS = {
-        'crear_tarea': ['por favor', 'necesito', 'podrían', 'solicito'],
-        'escalar': ['urgente', 'gerencia', 'dirección', 'prioritario'],
-        'requiere_respuesta': ['¿', 'consulta', 'pregunta', 'confirmar']
-    }
-    
-    def __init__(self, months: int = 6):
+    def __init__(self, months: int = 6, workers: Optional[int] = None,
+                 bounded: bool = False, source=None):
         """
         Args:
             months: Meses hacia atrás a analizar
+            workers: Procesos para el análisis (None = todos los núcleos)
+            bounded: Memoria acotada por remitente/hilo (top-k de palabras y
+                     participantes aproximados; no acota la cantidad de claves)
+            source: MailSource (por defecto MAIL_SOURCE o Gmail API)
         """
-        self.gmail = GmailClient()
+        self.gmail = GmailClient(source)
         # Inicializar servicio explícitamente
-        if not hasattr(self.gmail, 'service') or self.gmail.service is None:
+        if self.gmail.source is None:
             print("⚠️ Inicializando Gmail API...")
             self.gmail.authenticate()
         self.session = get_session()
+        self.classifier = default_classifier()
         self.months = months
         self.stats = {
             'emails_analyzed': 0,
@@ -77,63 +92,63 @@ class HistoricalScraper:
             'rules_generated': 0
         }
         
-        # Cache en memoria
-        self.sender_stats = defaultdict(lambda: {
-            'total': 0,
-            'urgency_counts': Counter(),
-            'intent_counts': Counter(),
-            'action_counts': Counter(),
-            'response_times': [],
-            'subjects': [],
-            'has_attachments': 0
-        })
-        
-        self.internal_stats = defaultdict(lambda: {
-            'total': 0,
-            'forwarded': 0,
-            'replied': 0,
-            'cc_count': 0,
-            'response_times': [],
-            'roles_detected': Counter()
-        })
-        
-        self.thread_stats = defaultdict(lambda: {
-            'messages': 0,
-            'participants': set(),
-            'internal_count': 0,
-            'external_count': 0,
-            'has_forward': False,
-            'has_cc': False,
-            'has_attachments': False,
-            'start_time': None,
-            'end_time': None
-        })
-        
-    def run_full_analysis(self) -> Dict:
-        """Ejecuta análisis completo"""
+        # Agregado combinable (por shard / incremental)
+        self.workers = workers
+        self.aggregate = LearningAggregate(os.getenv('INTERNAL_DOMAIN', '@usach.cl'), bounded)
+        
+        # Estado del recorrido (se restaura desde un checkpoint con --resume)
+        self._query = None
+        self._page_token = None
+        self._last_id = None   # último mensaje analizado (orden del listado)
+    
+    @property
+    def sender_stats(self):
+        return self.aggregate.sender_stats
+    
+    @property
+    def internal_stats(self):
+        return self.aggregate.internal_stats
+    
+    @property
+    def thread_stats(self):
+        return self.aggregate.thread_stats
+    
+    def run_full_analysis(self, resume: Optional[int] = None) -> Dict:
+        """
+        Ejecuta análisis completo
+        
+        Args:
+            resume: ID de la sesión a reanudar desde su checkpoint
+                    (0 = la última interrumpida, None = sesión nueva)
+        """
         
         print("🚀 Iniciando análisis histórico de Gmail...")
-        print(f"📅 Analizando últimos {self.months} meses")
         
-        # Crear sesión de aprendizaje
-        learning_session = LearningSession(
-            session_type='initial',
-            started_at=datetime.now(),
-            status='running'
-        )
-        self.session.add(learning_session)
-        self.session.commit()
+        learning_session = self._resume_session(resume) if resume is not None else None
+        
+        if learning_session is None:
+            print(f"📅 Analizando últimos {self.months} meses")
+            
+            # Crear sesión de aprendizaje
+            learning_session = LearningSession(
+                session_type='initial',
+                started_at=datetime.now(),
+                status='running'
+            )
+            self.session.add(learning_session)
+            self.session.commit()
         
         try:
-            # 1. Obtener emails históricos
-            print("\n📥 Obteniendo emails históricos...")
-            emails = self._fetch_historical_emails()
-            self.stats['emails_analyzed'] = len(emails)
-            print(f"✅ {len(emails)} emails obtenidos")
+            # 1-2. Obtener y analizar emails históricos por lotes (con checkpoints)
+            print("\n📥 Obteniendo y analizando emails históricos...")
+            self._scan_mailbox(learning_session)
+            self.stats['emails_analyzed'] = self.aggregate.emails
+            print(f"✅ {self.aggregate.emails} emails analizados")
+            
+            print("\n🔍 Calculando tiempos de respuesta...")
+            self.aggregate.compute_response_times()
             
-            # 2. Analizar patrones
-            print("\n🔍 Analizando patrones...")
-            self._analyze_emails(emails)
+            # 3-7. Guardar resultados (upserts por lotes, una sola transacción)
             
             # 3. Guardar perfiles de remitentes
             print("\n💾 Guardando perfiles de remitentes...")
@@ -165,6 +180,7 @@ class HistoricalScraper:
             learning_session.duration_minutes = (
                 (datetime.now() - learning_session.started_at).seconds // 60
             )
+            learning_session.checkpoint = None
             self.session.commit()
             
             print("\n✅ Análisis completado exitosamente!")
@@ -172,58 +188,176 @@ class HistoricalScraper:
             
             return self.stats
             
+        except KeyboardInterrupt:
+            self.session.rollback()
+            learning_session.status = 'cancelled'
+            learning_session.completed_at = datetime.now()
+            self.session.commit()
+            
+            print(f"\n⏸️ Análisis interrumpido. Reanudar con --resume {learning_session.id}")
+            raise
+            
         except Exception as e:
+            # Descartar los upserts parciales antes de registrar el fallo
+            # (el último checkpoint ya quedó guardado)
+            self.session.rollback()
             learning_session.status = 'failed'
             learning_session.error_message = str(e)
             learning_session.completed_at = datetime.now()
             self.session.commit()
             
             print(f"\n❌ Error en análisis: {str(e)}")
+            print(f"♻️ Reanudar con --resume {learning_session.id}")
             raise
     
-    def _fetch_historical_emails(self) -> List[Dict]:
-        """Obtiene emails históricos de Gmail"""
+    def _resume_session(self, session_id: int) -> Optional[LearningSession]:
+        """
+        Carga el checkpoint de una sesión interrumpida
         
-        date_limit = datetime.now() - timedelta(days=30 * self.months)
-        query = f"after:{date_limit.strftime('%Y/%m/%d')}"
+        Args:
+            session_id: ID de la sesión (0 = la última con checkpoint)
         
-        try:
-            messages = self.gmail.service.users().messages().list(
-                userId='me',
-                q=query,
-                maxResults=500  # Límite por seguridad, ajustar según necesidad
-            ).execute()
-            
-            emails = []
-            
-            if 'messages' in messages:
-                total = len(messages['messages'])
-                print(f"📊 Procesando {total} mensajes...")
-                
-                for idx, msg in enumerate(messages['messages'], 1):
-                    if idx % 50 == 0:
-                        print(f"   Procesados: {idx}/{total}")
-                    
-                    email_data = self._get_email_details(msg['id'])
-                    if email_data:
-                        emails.append(email_data)
-            
-            return emails
+        Returns:
+            Sesión reanudada, o None si no hay nada que reanudar
+        """
+        query = self.session.query(LearningSession).filter(
+            LearningSession.checkpoint.isnot(None),
+            LearningSession.status.in_(RESUMABLE_STATUSES)
+        )
+        if session_id:
+            query = query.filter(LearningSession.id == session_id)
+        
+        learning_session = query.order_by(LearningSession.id.desc()).first()
+        if learning_session is None:
+            print("⚠️ No hay sesión interrumpida para reanudar, se inicia una nueva")
+            return None
+        
+        checkpoint = learning_session.checkpoint
+        self.aggregate = LearningAggregate.from_dict(_unpack_aggregate(checkpoint))
+        self._page_token = checkpoint.get('page_token')
+        self._last_id = checkpoint.get('last_id')
+        self._query = checkpoint['query']
+        
+        learning_session.status = 'running'
+        learning_session.error_message = None
+        learning_session.completed_at = None
+        self.session.commit()
+        
+        print(f"♻️ Reanudando sesión #{learning_session.id}: "
+              f"{self.aggregate.emails} emails ya analizados ({self._query})")
+        return learning_session
+    
+    def _save_checkpoint(self, learning_session: LearningSession):
+        """
+        Guarda el avance: cursor (página siguiente y último ID analizado)
+        y agregado parcial comprimido
+        
+        No se guardan los IDs analizados: los checkpoints se cortan en un
+        límite de página, así que la página siguiente basta para continuar.
+        """
+        
+        codec, data = compress_body(json.dumps(self.aggregate.to_dict(), separators=(',', ':')))
+        learning_session.checkpoint = {
+            'query': self._query,
+            'page_token': self._page_token,
+            'last_id': self._last_id,
+            'codec': codec,
+            'aggregate': base64.b64encode(data).decode('ascii')
+        }
+        learning_session.checkpoint_at = datetime.now()
+        learning_session.emails_scanned = self.aggregate.emails
+        self.session.commit()
+    
+    def _scan_mailbox(self, learning_session: LearningSession):
+        """
+        Recorre el buzón página a página y analiza por lotes
+        
+        Tras cada lote (al terminar una página) guarda un checkpoint; al
+        reanudar se continúa desde la página siguiente. El lote es de
+        CHECKPOINT_EVERY emails o CHECKPOINT_GROWTH de los ya analizados,
+        lo que sea mayor.
+        """
+        
+        if self._query is None:
+            date_limit = datetime.now() - timedelta(days=30 * self.months)
+            self._query = f"after:{date_limit.strftime('%Y/%m/%d')}"
+        
+        batch = []
+        
+        while True:
+            response = self._list_page(self._page_token)
             
-        except Exception as e:
-            print(f"❌ Error obteniendo emails: {str(e)}")
-            return []
+            for message_id in (msg['id'] for msg in response.get('messages', [])):
+                email_data = self._get_email_details(message_id)
+                if email_data:
+                    batch.append(email_data)
+            
+            next_token = response.get('nextPageToken')
+            
+            batch_size = max(CHECKPOINT_EVERY, int(self.aggregate.emails * CHECKPOINT_GROWTH))
+            if batch and (len(batch) >= batch_size or not next_token):
+                self._analyze_emails(batch)
+                self._last_id = batch[-1]['id']
+                self._page_token = next_token
+                self._save_checkpoint(learning_session)
+                print(f"   Analizados: {self.aggregate.emails} (checkpoint guardado)")
+                batch = []
+            
+            if not next_token:
+                break
+            self._page_token = next_token
+    
+    def _list_page(self, page_token: Optional[str]) -> Dict:
+        """Lista una página de IDs (si el token expiró, busca el cursor desde el inicio)"""
+        
+        if page_token:
+            try:
+                return self.gmail.source.list_messages(self._query, page_token, PAGE_SIZE)
+            except HttpError as e:
+                if e.resp.status != 400:
+                    raise
+                print(f"⚠️ Token de página inválido ({e}), se busca el último email analizado")
+                return self._seek_last_id()
+        
+        return self.gmail.source.list_messages(self._query, max_results=PAGE_SIZE)
+    
+    def _seek_last_id(self) -> Dict:
+        """
+        Recorre el listado desde el inicio (solo IDs) hasta el último email
+        analizado y devuelve el resto de esa página
+        
+        Si ese email ya no aparece, el agregado parcial no se puede
+        continuar sin contar emails dos veces: se reinicia el análisis.
+        """
+        
+        token = None
+        while True:
+            response = self.gmail.source.list_messages(self._query, token, PAGE_SIZE)
+            ids = [msg['id'] for msg in response.get('messages', [])]
+            if self._last_id in ids:
+                response['messages'] = response['messages'][ids.index(self._last_id) + 1:]
+                return response
+            token = response.get('nextPageToken')
+            if not token:
+                break
+        
+        print("⚠️ No se encontró el último email analizado, se reinicia el análisis")
+        self.aggregate = LearningAggregate(self.aggregate.internal_domain, self.aggregate.bounded)
+        self._last_id = None
+        return self.gmail.source.list_messages(self._query, max_results=PAGE_SIZE)
     
     def _get_email_details(self, message_id: str) -> Optional[Dict]:
-        """Obtiene detalles completos de un email"""
+        """
+        Obtiene detalles completos de un email
+        
+        Los errores de la API (cuota, red) se propagan para que la sesión
+        quede con su checkpoint y se pueda reanudar; un mensaje malformado
+        se omite.
+        """
+        
+        message = self.gmail.source.get_message(message_id)
         
         try:
-            message = self.gmail.service.users().messages().get(
-                userId='me',
-                id=message_id,
-                format='full'
-            ).execute()
-            
             headers = {h['name']: h['value'] for h in message['payload']['headers']}
             
             return {
@@ -237,142 +371,44 @@ class HistoricalScraper:
                 'in_reply_to': headers.get('In-Reply-To', ''),
                 'references': headers.get('References', ''),
                 'labels': message.get('labelIds', []),
-                'has_attachments': 'parts' in message['payload'] and 
-                                   any(p.get('filename') for p in message['payload'].get('parts', []))
+                'has_attachments': bool(walk_payload(message['payload'], bodies=False)['attachments'])
             }
             
-        except Exception as e:
+        except (KeyError, TypeError):
             return None
     
     def _analyze_emails(self, emails: List[Dict]):
-        """Analiza todos los emails y extrae patrones"""
-        
-        internal_domain = os.getenv('INTERNAL_DOMAIN', '@usach.cl')  # Ajustar según empresa
-        
-        for email in emails:
-            # Extraer email del remitente
-            sender_match = re.search(r'<(.+?)>', email['from'])
-            sender_email = sender_match.group(1) if sender_match else email['from']
-            
-            is_internal = internal_domain in sender_email
-            
-            # Analizar remitente externo
-            if not is_internal:
-                self._analyze_sender(sender_email, email)
-            else:
-                # Analizar autor interno
-                self._analyze_internal_author(sender_email, email)
-            
-            # Analizar hilo
-            self._analyze_thread(email['thread_id'], email, is_internal)
-    
-    def _analyze_sender(self, sender_email: str, email: Dict):
-        """Analiza patrones de un remitente externo"""
-        
-        stats = self.sender_stats[sender_email]
-        stats['total'] += 1
-        
-        subject = email['subject'].lower()
-        
-        # Detectar urgencia
-        urgency = self._detect_urgency(subject)
-        stats['urgency_counts'][urgency] += 1
-        
-        # Detectar intención
-        intent = self._detect_intent(subject)
-        stats['intent_counts'][intent] += 1
-        
-        # Detectar acción
-        action = self._detect_action(subject)
-        stats['action_counts'][action] += 1
-        
-        # Attachments
-        if email['has_attachments']:
-            stats['has_attachments'] += 1
-        
-        stats['subjects'].append(subject)
-    
-    def _analyze_internal_author(self, author_email: str, email: Dict):
-        """Analiza patrones de autor interno"""
-        
-        stats = self.internal_stats[author_email]
-        stats['total'] += 1
-        
-        # Detectar forwards
-        if email['in_reply_to'] or 'fwd' in email['subject'].lower():
-            stats['forwarded'] += 1
-        
-        # Detectar replies
-        if email['in_reply_to']:
-            stats['replied'] += 1
-        
-        # Contar CCs
-        if email['cc']:
-            stats['cc_count'] += len(email['cc'].split(','))
-        
-        # Detectar rol por keywords en subject
-        subject_lower = email['subject'].lower()
-        if any(kw in subject_lower for kw in ['venta', 'cliente', 'comercial']):
-            stats['roles_detected']['ventas'] += 1
-        elif any(kw in subject_lower for kw in ['operacion', 'produccion', 'logistica']):
-            stats['roles_detected']['operaciones'] += 1
-        elif any(kw in subject_lower for kw in ['compra', 'proveedor']):
-            stats['roles_detected']['compras'] += 1
-    
-    def _analyze_thread(self, thread_id: str, email: Dict, is_internal: bool):
-        """Analiza patrones de un hilo"""
-        
-        stats = self.thread_stats[thread_id]
-        stats['messages'] += 1
-        
-        sender_match = re.search(r'<(.+?)>', email['from'])
-        sender = sender_match.group(1) if sender_match else email['from']
-        stats['participants'].add(sender)
-        
-        if is_internal:
-            stats['internal_count'] += 1
-        else:
-            stats['external_count'] += 1
-        
-        if 'fwd' in email['subject'].lower():
-            stats['has_forward'] = True
+        """
+        Analiza todos los emails y extrae patrones
         
-        if email['cc']:
-            stats['has_cc'] = True
+        Con volumen suficiente reparte los emails en shards sobre un pool
+        de procesos; cada shard produce un agregado parcial que se combina
+        con el acumulado actual.
+        """
         
-        if email['has_attachments']:
-            stats['has_attachments'] = True
+        partial = analyze_parallel(
+            emails, self.aggregate.internal_domain, self.workers, self.aggregate.bounded
+        )
+        self.aggregate.merge(partial)
     
     def _detect_urgency(self, text: str) -> str:
         """Detecta nivel de urgencia por keywords"""
-        
-        for level, keywords in self.URGENCY_KEYWORDS.items():
-            if any(kw in text for kw in keywords):
-                return level
-        return 'media'
+        return self.classifier.classify(text)['urgency']
     
     def _detect_intent(self, text: str) -> str:
         """Detecta intención por keywords"""
-        
-        for intent, keywords in self.INTENT_KEYWORDS.items():
-            if any(kw in text for kw in keywords):
-                return intent
-        return 'otro'
+        return self.classifier.classify(text)['intent']
     
     def _detect_action(self, text: str) -> str:
         """Detecta acción requerida"""
-        
-        for action, keywords in self.ACTION_KEYWORDS.items():
-            if any(kw in text for kw in keywords):
-                return action
-        return 'crear_tarea'
+        return self.classifier.classify(text)['action']
     
     def _save_sender_profiles(self):
-        """Guarda perfiles de remitentes en BD"""
-    
-        # Rollback por si hay error previo
-        self.session.rollback()
-    
+        """Guarda perfiles de remitentes en BD (upsert por email)"""
+        
+        now = datetime.now()
+        rows = []
+        
         for sender_email, stats in self.sender_stats.items():
             if stats['total'] < 3:  # Mínimo 3 emails para crear perfil
                 continue
@@ -386,30 +422,46 @@ class HistoricalScraper:
             urgency_confidence = stats['urgency_counts'][most_common_urgency] / stats['total']
             confidence = min(urgency_confidence * (stats['total'] / 10), 1.0)
             
+            # Tiempo promedio que tarda la empresa en responderle
+            avg_response = average(stats['response_sum'], stats['response_count'])
+            
             # Extraer dominio y empresa
             domain = sender_email.split('@')[1] if '@' in sender_email else ''
             empresa = domain.split('.')[0].title() if domain else ''
             
-            profile = SenderProfile(
-                email=sender_email,
-                domain=domain,
-                empresa=empresa,
-                category='proveedor' if 'proveedor' in empresa.lower() else 'cliente',
-                inferred_intent=most_common_intent,
-                typical_action=most_common_action,
-                typical_urgency=most_common_urgency,
-                emails_analyzed=stats['total'],
-                confidence_score=confidence,
-                last_seen=datetime.now()
-            )
-            
-            self.session.merge(profile)
-            self.stats['senders_identified'] += 1
-        
-        self.session.commit()
+            rows.append({
+                'email': sender_email,
+                'domain': domain,
+                'empresa': empresa,
+                'category': 'proveedor' if 'proveedor' in empresa.lower() else 'cliente',
+                'inferred_intent': most_common_intent,
+                'typical_action': most_common_action,
+                'typical_urgency': most_common_urgency,
+                'avg_response_time_hours': round(avg_response / 3600, 1) if avg_response is not None else None,
+                'emails_analyzed': stats['total'],
+                'confidence_score': confidence,
+                'urgency_counts': dict(stats['urgency_counts']),
+                'intent_counts': dict(stats['intent_counts']),
+                'last_seen': now,
+                'updated_at': now
+            })
+        
+        upsert(
+            self.session, SenderProfile, rows,
+            index_elements=['email'],
+            update_columns=[
+                'domain', 'empresa', 'category', 'inferred_intent', 'typical_action',
+                'typical_urgency', 'avg_response_time_hours', 'emails_analyzed', 'confidence_score',
+                'urgency_counts', 'intent_counts', 'last_seen', 'updated_at'
+            ]
+        )
+        self.stats['senders_identified'] += len(rows)
     
     def _save_internal_profiles(self):
-        """Guarda perfiles de autores internos"""
+        """Guarda perfiles de autores internos (upsert por email)"""
+        
+        now = datetime.now()
+        rows = []
         
         for author_email, stats in self.internal_stats.items():
             if stats['total'] < 3:
@@ -418,23 +470,33 @@ class HistoricalScraper:
             # Inferir rol
             most_common_role = stats['roles_detected'].most_common(1)
             role = most_common_role[0][0] if most_common_role else 'otro'
-            
-            profile = InternalAuthorProfile(
-                email=author_email,
-                role=role,
-                tends_to_forward=stats['forwarded'] / stats['total'] > 0.3,
-                tends_to_cc_multiple=stats['cc_count'] / stats['total'] > 2,
-                emails_analyzed=stats['total'],
-                last_seen=datetime.now()
-            )
-            
-            self.session.merge(profile)
-            self.stats['internal_authors_identified'] += 1
-        
-        self.session.commit()
+            avg_response = average(stats['response_sum'], stats['response_count'])
+            
+            rows.append({
+                'email': author_email,
+                'role': role,
+                'avg_response_minutes': round(avg_response / 60) if avg_response is not None else None,
+                'tends_to_forward': stats['forwarded'] / stats['total'] > 0.3,
+                'tends_to_cc_multiple': stats['cc_count'] / stats['total'] > 2,
+                'emails_analyzed': stats['total'],
+                'threads_participated': stats['threads'],
+                'last_seen': now
+            })
+        
+        upsert(
+            self.session, InternalAuthorProfile, rows,
+            index_elements=['email'],
+            update_columns=[
+                'role', 'avg_response_minutes', 'tends_to_forward', 'tends_to_cc_multiple',
+                'emails_analyzed', 'threads_participated', 'last_seen'
+            ]
+        )
+        self.stats['internal_authors_identified'] += len(rows)
     
     def _save_thread_patterns(self):
-        """Guarda patrones de hilos"""
+        """Guarda patrones de hilos (upsert por thread_id)"""
+        
+        rows = []
         
         for thread_id, stats in self.thread_stats.items():
             if stats['messages'] < 2:  # Solo hilos con múltiples mensajes
@@ -448,24 +510,40 @@ class HistoricalScraper:
             else:
                 complexity = 'baja'
             
-            pattern = ThreadPattern(
-                thread_id=thread_id,
-                total_messages=stats['messages'],
-                internal_participants=stats['internal_count'],
-                external_participants=stats['external_count'],
-                has_forward=stats['has_forward'],
-                has_cc=stats['has_cc'],
-                has_attachments=stats['has_attachments'],
-                inferred_complexity=complexity
-            )
-            
-            self.session.merge(pattern)
-            self.stats['threads_analyzed'] += 1
-        
-        self.session.commit()
+            # Duración del hilo (primer a último mensaje)
+            resolution_hours = None
+            if stats['start_time'] and stats['end_time']:
+                resolution_hours = round((stats['end_time'] - stats['start_time']).total_seconds() / 3600)
+            
+            rows.append({
+                'thread_id': thread_id,
+                'total_messages': stats['messages'],
+                'internal_participants': stats['internal_count'],
+                'external_participants': stats['external_count'],
+                'has_forward': stats['has_forward'],
+                'has_cc': stats['has_cc'],
+                'has_attachments': stats['has_attachments'],
+                'inferred_complexity': complexity,
+                'time_to_resolution_hours': resolution_hours,
+                'started_at': stats['start_time'],
+                'closed_at': stats['end_time']
+            })
+        
+        upsert(
+            self.session, ThreadPattern, rows,
+            index_elements=['thread_id'],
+            update_columns=[
+                'total_messages', 'internal_participants', 'external_participants',
+                'has_forward', 'has_cc', 'has_attachments', 'inferred_complexity',
+                'time_to_resolution_hours', 'started_at', 'closed_at'
+            ]
+        )
+        self.stats['threads_analyzed'] += len(rows)
     
     def _generate_rules(self):
-        """Genera reglas automáticas basadas en patrones"""
+        """Genera reglas automáticas basadas en patrones (upsert por rule_name)"""
+        
+        rows = []
         
         # Reglas por remitente
         for sender_email, stats in self.sender_stats.items():
@@ -476,46 +554,42 @@ class HistoricalScraper:
             most_common_action = stats['action_counts'].most_common(1)[0][0]
             
             if stats['urgency_counts'][most_common_urgency] / stats['total'] > 0.7:
-                rule = LearnedRule(
-                    rule_name=f"Auto: {sender_email}",
-                    rule_type='sender',
-                    trigger_condition=json.dumps({'sender': sender_email}),
-                    action=most_common_action,
-                    urgency=most_common_urgency,
-                    confidence=stats['urgency_counts'][most_common_urgency] / stats['total'],
-                    times_triggered=0
-                )
-                
-                self.session.merge(rule)
-                self.stats['rules_generated'] += 1
-        
-        self.session.commit()
+                rows.append({
+                    'rule_name': f"Auto: {sender_email}",
+                    'rule_type': 'sender',
+                    'trigger_condition': json.dumps({'sender': sender_email}),
+                    'action': most_common_action,
+                    'urgency': most_common_urgency,
+                    'confidence': stats['urgency_counts'][most_common_urgency] / stats['total'],
+                    'times_triggered': 0
+                })
+        
+        # times_triggered solo se fija al crear la regla
+        upsert(
+            self.session, LearnedRule, rows,
+            index_elements=['rule_name'],
+            update_columns=['trigger_condition', 'action', 'urgency', 'confidence']
+        )
+        self.stats['rules_generated'] += len(rows)
     
     def _save_keywords(self):
-        """Guarda palabras clave encontradas"""
-        
-        # Contar todas las palabras en subjects
-        all_words = Counter()
+        """Guarda palabras clave encontradas (upsert por keyword + categoría)"""
         
-        for stats in self.sender_stats.values():
-            for subject in stats['subjects']:
-                words = re.findall(r'\w+', subject.lower())
-                all_words.update(words)
+        # Palabras de los subjects, contadas durante el análisis
+        all_words = self.aggregate.word_counts
         
         # Guardar top keywords
-        for word, count in all_words.most_common(50):
-            if len(word) < 3 or word in ['de', 'la', 'el', 'en', 'para']:
-                continue
-            
-            keyword = KeywordPattern(
-                keyword=word,
-                category='otro',
-                times_found=count
-            )
-            
-            self.session.merge(keyword)
-        
-        self.session.commit()
+        rows = [
+            {'keyword': word, 'category': 'otro', 'times_found': count}
+            for word, count in all_words.most_common(50)
+            if len(word) >= 3 and word not in ['de', 'la', 'el', 'en', 'para']
+        ]
+        
+        upsert(
+            self.session, KeywordPattern, rows,
+            index_elements=['keyword', 'category'],
+            update_columns=['times_found']
+        )
     
     def _print_summary(self):
         """Imprime resumen de análisis"""
@@ -528,6 +602,15 @@ class HistoricalScraper:
         print(f"🏢 Autores internos: {self.stats['internal_authors_identified']}")
         print(f"🔗 Hilos analizados: {self.stats['threads_analyzed']}")
         print(f"⚙️  Reglas generadas: {self.stats['rules_generated']}")
+        
+        # Tiempos de respuesta promedio (todos los remitentes externos)
+        senders = self.sender_stats.values()
+        ours = average(sum(s['response_sum'] for s in senders), sum(s['response_count'] for s in senders))
+        theirs = average(sum(s['reply_sum'] for s in senders), sum(s['reply_count'] for s in senders))
+        if ours is not None:
+            print(f"⏱️  Respuesta interna promedio: {ours / 3600:.1f} h")
+        if theirs is not None:
+            print(f"⏱️  Respuesta de remitentes promedio: {theirs / 3600:.1f} h")
         print("="*60)
 
 
@@ -537,13 +620,26 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Análisis histórico de Gmail')
     parser.add_argument('--months', type=int, default=6, help='Meses a analizar')
     parser.add_argument('--mode', choices=['full', 'senders-only'], default='full')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Procesos para el análisis (por defecto todos los núcleos)')
+    parser.add_argument('--source', default=None,
+                        help='Archivo mbox, Maildir o directorio .eml en vez de Gmail')
+    parser.add_argument('--resume', type=int, nargs='?', const=0, default=None,
+                        help='Reanudar una sesión interrumpida (sin ID: la última)')
+    parser.add_argument('--bounded', action='store_true',
+                        help='Memoria acotada por remitente/hilo para buzones muy grandes '
+                             '(conteos aproximados)')
     
     args = parser.parse_args()
+    setup_logging()
     
-    scraper = HistoricalScraper(months=args.months)
+    scraper = HistoricalScraper(
+        months=args.months, workers=args.workers, bounded=args.bounded,
+        source=LocalMailSource(args.source) if args.source else None
+    )
     
     try:
-        stats = scraper.run_full_analysis()
+        stats = scraper.run_full_analysis(resume=args.resume)
         print("\n✅ Proceso completado exitosamente")
         print(f"📊 Ver resultados en base de datos: sender_profiles, learned_rules")
         
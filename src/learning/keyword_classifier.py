@@ -0,0 +1,182 @@
+"""
+Clasificador de keywords multi-patrón (urgencia / intención / acción)
+
+Compila todas las keywords en una sola expresión regular con forma de
+trie (prefijos comunes factorizados, equivalente a un autómata
+Aho–Corasick sin backtracking entre alternativas) y clasifica las tres
+dimensiones en una sola pasada sobre el texto.
+
+Las keywords solo calzan como palabras completas: "ya" no calza en
+"playa" ni "oc" en "stock".
+
+Uso:
+    from learning.keyword_classifier import classify_text
+    classify_text("URGENTE: cotización malla")
+    # {'urgency': 'critica', 'intent': 'cotizacion', 'action': 'escalar'}
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+
+# Palabras clave por categoría (el orden define la prioridad: gana la
+# primera categoría con al menos una keyword presente)
+URGENCY_KEYWORDS = {
+    'critica': ['urgente', 'urgentes', 'urgentemente', 'urgencia', 'emergencia', 'inmediato',
+                'crítico', 'críticos', 'hoy mismo', 'ahora', 'ya'],
+    'alta': ['pronto', 'prioritario', 'importante', 'necesario', 'asap'],
+    'media': ['cuando puedas', 'esta semana', 'revisar'],
+    'baja': ['info', 'informativo', 'fyi', 'para conocimiento']
+}
+
+INTENT_KEYWORDS = {
+    'cotizacion': ['cotización', 'cotizar', 'precio', 'cuánto cuesta', 'presupuesto'],
+    'orden_compra': ['orden de compra', 'oc', 'pedido', 'comprar'],
+    'reclamo': ['reclamo', 'problema', 'error', 'mal', 'incorrecto', 'queja'],
+    'soporte': ['ayuda', 'soporte', 'apoyo', 'consulta', 'duda'],
+    'seguimiento': ['seguimiento', 'estado', 'avance', 'progreso', '¿cómo va?'],
+    'urgente': ['urgente', 'urgentes', 'urgentemente', 'urgencia', 'emergencia', 'inmediato',
+                'crítico', 'crítica', 'críticos']
+}
+
+ACTION_KEYWORDS = {
+    'crear_tarea': ['por favor', 'necesito', 'podrían', 'solicito'],
+    'escalar': ['urgente', 'gerencia', 'dirección', 'prioritario'],
+    'requiere_respuesta': ['¿', 'consulta', 'pregunta', 'confirmar']
+}
+
+DEFAULTS = {
+    'urgency': 'media',
+    'intent': 'otro',
+    'action': 'crear_tarea'
+}
+
+
+def _is_word(char: str) -> bool:
+    return bool(re.match(r'\w', char))
+
+
+def _keyword_regex(keyword: str):
+    """Regex de una sola keyword con límites de palabra donde corresponde"""
+    start = r'(?<!\w)' if _is_word(keyword[0]) else ''
+    end = r'(?!\w)' if _is_word(keyword[-1]) else ''
+    return re.compile(start + re.escape(keyword) + end)
+
+
+def _trie_pattern(keywords: List[str]) -> str:
+    """
+    Construye una alternación con forma de trie
+
+    Cada keyword que termina en carácter de palabra exige (?!\\w) al final;
+    el final de la keyword va como última alternativa para preferir la
+    coincidencia más larga.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node: dict, prev_is_word: bool) -> str:
+        options = [
+            re.escape(char) + build(child, _is_word(char))
+            for char, child in sorted((k, v) for k, v in node.items() if k)
+        ]
+        if '' in node:
+            options.append(r'(?!\w)' if prev_is_word else '')
+        if len(options) == 1:
+            return options[0]
+        return '(?:' + '|'.join(options) + ')'
+
+    return build(trie, False)
+
+
+class KeywordClassifier:
+    """Clasifica urgencia, intención y acción en una sola pasada"""
+
+    def __init__(self, urgency: Dict[str, List[str]] = None,
+                 intent: Dict[str, List[str]] = None,
+                 action: Dict[str, List[str]] = None):
+        dimensions = {
+            'urgency': urgency or URGENCY_KEYWORDS,
+            'intent': intent or INTENT_KEYWORDS,
+            'action': action or ACTION_KEYWORDS,
+        }
+
+        # Etiquetas por dimensión en orden de prioridad
+        self._labels = {dim: list(cats) for dim, cats in dimensions.items()}
+
+        # keyword → [(dimensión, rango de la categoría)]
+        self._hits: Dict[str, List[Tuple[str, int]]] = {}
+        for dim, categories in dimensions.items():
+            for rank, keywords in enumerate(categories.values()):
+                for keyword in keywords:
+                    self._hits.setdefault(keyword.lower(), []).append((dim, rank))
+
+        word_start = [kw for kw in self._hits if _is_word(kw[0])]
+        other_start = [kw for kw in self._hits if not _is_word(kw[0])]
+        parts = []
+        if word_start:
+            parts.append(r'(?<!\w)' + _trie_pattern(word_start))
+        if other_start:
+            parts.append(_trie_pattern(other_start))
+        self._regex = re.compile('|'.join(parts))
+
+        # Las coincidencias no se solapan: una keyword larga también
+        # acredita las keywords que contiene ('¿cómo va?' ⊃ '¿')
+        own_hits = dict(self._hits)
+        for keyword in own_hits:
+            for sub, hits in own_hits.items():
+                if sub != keyword and _keyword_regex(sub).search(keyword):
+                    self._hits[keyword] = self._hits[keyword] + hits
+
+    def classify(self, text: str) -> Dict[str, str]:
+        """
+        Clasifica un texto (asunto, cuerpo) en las tres dimensiones
+
+        Args:
+            text: Texto a clasificar (se pasa a minúsculas)
+
+        Returns:
+            Dict con 'urgency', 'intent' y 'action'
+        """
+        best = {}
+        for match in self._regex.finditer((text or '').lower()):
+            for dim, rank in self._hits[match.group(0)]:
+                if rank < best.get(dim, len(self._labels[dim])):
+                    best[dim] = rank
+
+        return {
+            dim: self._labels[dim][best[dim]] if dim in best else default
+            for dim, default in DEFAULTS.items()
+        }
+
+    def has_category(self, text: str, dim: str, label: str) -> bool:
+        """Indica si el texto contiene alguna keyword de una categoría"""
+        target = (dim, self._labels[dim].index(label))
+        return any(
+            target in self._hits[match.group(0)]
+            for match in self._regex.finditer((text or '').lower())
+        )
+
+    def keywords_found(self, text: str) -> List[str]:
+        """Keywords presentes en el texto (en orden de aparición)"""
+        return [m.group(0) for m in self._regex.finditer((text or '').lower())]
+
+
+@lru_cache(maxsize=1)
+def default_classifier() -> KeywordClassifier:
+    """Instancia compartida (la compilación se hace una sola vez por proceso)"""
+    return KeywordClassifier()
+
+
+def classify_text(text: str) -> Dict[str, str]:
+    """Atajo: clasifica con el clasificador por defecto"""
+    return default_classifier().classify(text)
+
+
+def is_urgent(text: str) -> bool:
+    """Atajo: el texto contiene alguna keyword de intención 'urgente'"""
+    return default_classifier().has_category(text, 'intent', 'urgente')
@@ -0,0 +1,356 @@
+"""
+Aprendizaje continuo desde el pipeline en vivo
+
+EmailProcessor informa cada email procesado y el dashboard informa el
+resultado de cada tarea (completada / cancelada). Las observaciones se
+acumulan en memoria y se escriben por lotes:
+
+- sender_profiles: conteos por urgencia / intención, y desde ellos
+  typical_urgency, inferred_intent, confianza, emails_analyzed y last_seen.
+  Igual que HistoricalScraper, se ignoran los remitentes internos y un
+  remitente nuevo solo obtiene perfil al acumular MIN_PROFILE_EMAILS emails
+- learned_rules: times_triggered, times_resolved y success_rate de la
+  regla 'Auto: <remitente>' generada por HistoricalScraper
+
+El flush ocurre cada FLUSH_EVERY observaciones, cada FLUSH_INTERVAL
+segundos desde un hilo en segundo plano (así los resultados del
+dashboard no esperan a la próxima observación) y al terminar el proceso.
+
+Uso:
+    from learning.online_learner import get_online_learner
+    learner = get_online_learner()
+    learner.observe_email(email_data['sender_email'], email_data['subject'])
+    learner.record_outcome(sender_email, 'completada', estado_anterior='pendiente')
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, update
+
+from database.connection import session_scope
+from database.models import SenderProfile, LearnedRule
+from database.upsert import upsert
+from learning.aggregates import extract_address
+from learning.keyword_classifier import default_classifier
+
+logger = logging.getLogger(__name__)
+
+
+ONLINE_LEARNING_ENABLED = os.getenv('ONLINE_LEARNING', 'true').lower() == 'true'
+FLUSH_EVERY = int(os.getenv('ONLINE_LEARNING_FLUSH_EVERY', '50'))
+FLUSH_INTERVAL = float(os.getenv('ONLINE_LEARNING_FLUSH_SECONDS', '60'))
+INTERNAL_DOMAIN = os.getenv('INTERNAL_DOMAIN', '@usach.cl')
+
+# Mínimo de emails para crear un perfil (mismo umbral que HistoricalScraper)
+MIN_PROFILE_EMAILS = 3
+# Tope de remitentes en espera: sobre él se descartan los vistos hace más tiempo
+MAX_HELD_SENDERS = int(os.getenv('ONLINE_LEARNING_MAX_HELD', '10000'))
+
+# Resultado de una tarea → éxito de la regla que la originó
+OUTCOMES = {'completada': True, 'cancelada': False}
+
+
+def rule_name_for(sender_email: str) -> str:
+    """Nombre de la regla por remitente (mismo formato que HistoricalScraper)"""
+    return f"Auto: {sender_email}"
+
+
+def _new_sender_buffer() -> Dict:
+    return {'total': 0, 'urgency_counts': Counter(), 'intent_counts': Counter(), 'last_seen': None}
+
+
+def _merge_buffer(buffer: Dict, other: Dict):
+    """Suma al buffer de un remitente las observaciones de otro"""
+    buffer['total'] += other['total']
+    buffer['urgency_counts'].update(other['urgency_counts'])
+    buffer['intent_counts'].update(other['intent_counts'])
+    buffer['last_seen'] = max(filter(None, (buffer['last_seen'], other['last_seen'])), default=None)
+
+
+def _confidence(consistency: float, total: int) -> float:
+    """Misma fórmula que HistoricalScraper._save_sender_profiles"""
+    return min(consistency * (total / 10), 1.0)
+
+
+def _stored_counts(profile: Optional[SenderProfile]) -> Tuple[Counter, Counter]:
+    """
+    Conteos de urgencia e intención guardados en un perfil
+
+    Los perfiles anteriores a urgency_counts solo tienen typical_urgency y
+    la confianza: se siembra la urgencia típica con los emails que la
+    confianza implica (confianza * 10, cota inferior si estaba saturada).
+
+    Returns:
+        (urgency_counts, intent_counts)
+    """
+    if profile is None:
+        return Counter(), Counter()
+    if profile.urgency_counts is not None:
+        return Counter(profile.urgency_counts), Counter(profile.intent_counts or {})
+
+    total = profile.emails_analyzed or 0
+    agreeing = min(round((profile.confidence_score or 0.0) * 10), total)
+    urgency_counts, intent_counts = Counter(), Counter()
+    if profile.typical_urgency and agreeing:
+        urgency_counts[profile.typical_urgency] = agreeing
+    if profile.inferred_intent and agreeing:
+        intent_counts[profile.inferred_intent] = agreeing
+    return urgency_counts, intent_counts
+
+
+class OnlineLearner:
+    """Acumula observaciones del pipeline y las escribe por lotes"""
+
+    def __init__(self, flush_every: int = FLUSH_EVERY, flush_interval: float = FLUSH_INTERVAL):
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.classifier = default_classifier()
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        # Remitentes nuevos bajo MIN_PROFILE_EMAILS: esperan entre flushes
+        self._held = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._reset()
+
+    def _reset(self):
+        self._senders = defaultdict(_new_sender_buffer)
+        self._triggers = Counter()
+        self._outcomes = defaultdict(lambda: [0, 0])   # regla → [éxitos, resueltas]
+
+    # =========================================================================
+    # OBSERVACIONES
+    # =========================================================================
+
+    def observe_email(self, sender: str, subject: str, seen_at: Optional[datetime] = None):
+        """
+        Registra un email procesado por el pipeline
+
+        Args:
+            sender: Campo From del email
+            subject: Asunto
+            seen_at: Fecha del email (por defecto ahora)
+        """
+        sender_email = extract_address(sender)
+        if not sender_email or sender_email.endswith(INTERNAL_DOMAIN):
+            return
+
+        classification = self.classifier.classify(subject)
+
+        with self._lock:
+            buffer = self._senders[sender_email]
+            buffer['total'] += 1
+            buffer['urgency_counts'][classification['urgency']] += 1
+            buffer['intent_counts'][classification['intent']] += 1
+            buffer['last_seen'] = seen_at or datetime.now()
+            self._triggers[rule_name_for(sender_email)] += 1
+            self._pending += 1
+
+        self._maybe_flush()
+
+    def record_outcome(self, sender: str, estado: str, estado_anterior: Optional[str] = None):
+        """
+        Registra el cambio de estado de una tarea hecho por un operador
+
+        Si la tarea ya estaba cerrada (p. ej. completada → cancelada) se
+        descuenta el resultado anterior en vez de contarla dos veces.
+
+        Args:
+            sender: Campo From del email que originó la tarea
+            estado: Estado nuevo de la tarea
+            estado_anterior: Estado previo de la tarea
+        """
+        successes = int(OUTCOMES.get(estado, False)) - int(OUTCOMES.get(estado_anterior, False))
+        resolved = int(estado in OUTCOMES) - int(estado_anterior in OUTCOMES)
+        if not successes and not resolved:
+            return
+
+        sender_email = extract_address(sender)
+        if not sender_email:
+            return
+
+        with self._lock:
+            outcome = self._outcomes[rule_name_for(sender_email)]
+            outcome[0] += successes
+            outcome[1] += resolved
+            self._pending += 1
+
+        self._maybe_flush()
+
+    # =========================================================================
+    # ESCRITURA
+    # =========================================================================
+
+    def _maybe_flush(self):
+        if self._pending >= self.flush_every or \
+                time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def start(self):
+        """Inicia el hilo de flush periódico (idempotente)"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='online-learner-flush', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo de flush periódico y escribe lo pendiente"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while True:
+            wait = self.flush_interval - (time.monotonic() - self._last_flush)
+            if self._stop.wait(max(wait, 0)):
+                return
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def flush(self) -> int:
+        """
+        Escribe las observaciones acumuladas en una transacción
+
+        Returns:
+            Número de observaciones escritas
+        """
+        with self._lock:
+            if not self._pending:
+                self._last_flush = time.monotonic()
+                return 0
+            senders, triggers, outcomes = self._senders, self._triggers, self._outcomes
+            # Solo vuelven a consultarse los remitentes en espera con emails nuevos
+            for sender_email, buffer in senders.items():
+                if sender_email in self._held:
+                    _merge_buffer(buffer, self._held.pop(sender_email))
+            pending = self._pending
+            self._reset()
+            self._pending = 0
+            self._last_flush = time.monotonic()
+
+        try:
+            with session_scope() as session:
+                held = self._write_profiles(session, senders)
+                self._write_rules(session, triggers, outcomes)
+            with self._lock:
+                self._held.update(held)
+                if len(self._held) > MAX_HELD_SENDERS:
+                    recent = sorted(self._held.items(), key=lambda item: item[1]['last_seen'], reverse=True)
+                    self._held = dict(recent[:MAX_HELD_SENDERS])
+            logger.info(f"🧠 Aprendizaje continuo: {pending} observaciones guardadas")
+            return pending
+        except Exception as e:
+            # Aprendizaje best-effort: no debe interrumpir el pipeline
+            logger.warning(f"⚠️ No se pudo guardar el aprendizaje continuo ({pending} observaciones): {e}")
+            return 0
+
+    def _write_profiles(self, session, senders: Dict[str, Dict]) -> Dict[str, Dict]:
+        """
+        Suma los conteos de urgencia / intención a sender_profiles y recalcula el perfil
+
+        Returns:
+            Buffers de remitentes sin perfil que aún no llegan a MIN_PROFILE_EMAILS
+        """
+        if not senders:
+            return {}
+
+        # FOR UPDATE: otro proceso no puede sumar sobre los mismos conteos a la vez
+        existing = {
+            profile.email: profile for profile in session.query(SenderProfile).filter(
+                SenderProfile.email.in_(list(senders))
+            ).with_for_update()
+        }
+
+        now = datetime.now()
+        rows = []
+        held = {}
+        for sender_email, buffer in senders.items():
+            profile = existing.get(sender_email)
+            if profile is None and buffer['total'] < MIN_PROFILE_EMAILS:
+                held[sender_email] = buffer
+                continue
+            urgency_counts, intent_counts = _stored_counts(profile)
+            urgency_counts.update(buffer['urgency_counts'])
+            intent_counts.update(buffer['intent_counts'])
+            total = ((profile.emails_analyzed or 0) if profile else 0) + buffer['total']
+
+            urgency = urgency_counts.most_common(1)[0][0]
+            domain = sender_email.split('@')[1] if '@' in sender_email else ''
+            rows.append({
+                'email': sender_email,
+                'domain': domain,
+                'empresa': domain.split('.')[0].title() if domain else '',
+                'typical_urgency': urgency,
+                'inferred_intent': intent_counts.most_common(1)[0][0],
+                'urgency_counts': dict(urgency_counts),
+                'intent_counts': dict(intent_counts),
+                'emails_analyzed': total,
+                'confidence_score': _confidence(urgency_counts[urgency] / total, total),
+                'last_seen': buffer['last_seen'],
+                'updated_at': now
+            })
+
+        upsert(
+            session, SenderProfile, rows,
+            index_elements=['email'],
+            update_columns=[
+                'typical_urgency', 'inferred_intent', 'urgency_counts', 'intent_counts',
+                'emails_analyzed', 'confidence_score', 'last_seen', 'updated_at'
+            ]
+        )
+        return held
+
+    def _write_rules(self, session, triggers: Counter, outcomes: Dict[str, list]):
+        """Suma disparos y resultados a las reglas existentes (sin crear reglas)"""
+        table = LearnedRule.__table__
+        rate = func.coalesce(table.c.success_rate, 0.0)
+        resolved_before = func.coalesce(table.c.times_resolved, 0)
+
+        for rule_name, count in triggers.items():
+            session.execute(
+                update(table)
+                .where(table.c.rule_name == rule_name)
+                .values(times_triggered=func.coalesce(table.c.times_triggered, 0) + count)
+            )
+
+        for rule_name, (successes, resolved) in outcomes.items():
+            if not successes and not resolved:
+                continue
+            resolved_after = resolved_before + resolved
+            # success_rate primero: MySQL evalúa el SET de izquierda a derecha
+            # y debe usar el times_resolved anterior. Un cambio completada →
+            # cancelada puede restar: sin tareas resueltas la tasa vuelve a 0
+            session.execute(
+                update(table)
+                .where(table.c.rule_name == rule_name)
+                .ordered_values(
+                    (table.c.success_rate,
+                     func.coalesce((rate * resolved_before + successes) / func.nullif(resolved_after, 0), 0.0)),
+                    (table.c.times_resolved, resolved_after),
+                )
+            )
+
+
+@lru_cache(maxsize=1)
+def get_online_learner() -> Optional[OnlineLearner]:
+    """Instancia compartida por proceso (None si ONLINE_LEARNING=false)"""
+    if not ONLINE_LEARNING_ENABLED:
+        return None
+
+    learner = OnlineLearner()
+    learner.start()
+    atexit.register(learner.stop)
+    return learner
@@ -0,0 +1,82 @@
+"""
+Pre-clasificación barata de prioridad para ordenar el backlog
+
+Combina dos señales que no requieren IA:
+- keywords del asunto (KeywordClassifier: urgencia e intención 'urgente')
+- urgencia típica del remitente (ProfileCache), ponderada por la
+  confianza del perfil; los perfiles por dominio cuentan la mitad. Si
+  históricamente se le responde rápido (avg_response_time_hours bajo
+  SLOW_RESPONSE_HOURS) suma hasta RESPONSE_BONUS puntos
+
+El puntaje (0-100) ordena la cola de trabajos y el lote de
+process_new_emails; la banda del puntaje es la prioridad del email.
+
+Uso:
+    from learning.priority_scorer import score_email
+    score_email('URGENTE: cobertor roto', 'Cliente <a@cliente.cl>')
+    # {'score': 100, 'prioridad': 'urgente', 'fuente': 'keywords'}
+"""
+
+from typing import Dict, Optional
+
+from learning.keyword_classifier import default_classifier
+from learning.profile_cache import ProfileCache, get_profile_cache
+
+
+URGENCY_SCORE = {'critica': 100, 'alta': 70, 'media': 40, 'baja': 10}
+NEUTRAL_SCORE = URGENCY_SCORE['media']
+DOMAIN_WEIGHT = 0.5
+
+# Bono por tiempo de respuesta histórico: completo con respuesta
+# inmediata, decrece linealmente hasta 0 en SLOW_RESPONSE_HOURS
+RESPONSE_BONUS = 20
+SLOW_RESPONSE_HOURS = 24.0
+
+# Puntaje mínimo de cada prioridad (de mayor a menor)
+PRIORITY_BANDS = (('urgente', 90), ('alta', 60), ('normal', 30), ('baja', 0))
+
+
+def priority_band(score: int) -> str:
+    """Prioridad (PRIORIDADES_TAREA) correspondiente a un puntaje"""
+    for prioridad, minimo in PRIORITY_BANDS:
+        if score >= minimo:
+            return prioridad
+    return 'baja'
+
+
+def score_email(subject: str, sender: str, cache: Optional[ProfileCache] = None) -> Dict:
+    """
+    Puntaje de prioridad de un email
+
+    Args:
+        subject: Asunto
+        sender: Campo From
+        cache: Caché de perfiles (por defecto la compartida del proceso)
+
+    Returns:
+        Dict con score (0-100), prioridad y fuente ('keywords' o 'perfil')
+    """
+    classifier = default_classifier()
+    keyword_score = URGENCY_SCORE[classifier.classify(subject)['urgency']]
+    if classifier.has_category(subject, 'intent', 'urgente'):
+        keyword_score = URGENCY_SCORE['critica']
+
+    profile_score = 0.0
+    match = (cache or get_profile_cache()).lookup(sender)
+    if match and match['profile']['kind'] == 'sender':
+        profile = match['profile']
+        confidence = profile.get('confidence_score') or 0.0
+        if match['match'] == 'domain':
+            confidence *= DOMAIN_WEIGHT
+        urgency = URGENCY_SCORE.get(profile.get('typical_urgency'), NEUTRAL_SCORE)
+        profile_score = confidence * urgency + (1 - confidence) * NEUTRAL_SCORE
+        hours = profile.get('avg_response_time_hours')
+        if hours is not None:
+            profile_score += confidence * RESPONSE_BONUS * max(0.0, 1 - hours / SLOW_RESPONSE_HOURS)
+
+    score = int(round(min(max(keyword_score, profile_score), 100)))
+    return {
+        'score': score,
+        'prioridad': priority_band(score),
+        'fuente': 'perfil' if profile_score > keyword_score else 'keywords',
+    }
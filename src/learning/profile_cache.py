@@ -0,0 +1,396 @@
+"""
+Caché en memoria de perfiles aprendidos para el pipeline en vivo
+
+Carga sender_profiles e internal_author_profiles de una vez al iniciar
+y responde cada consulta sin ir a la BD:
+
+- por email exacto (perfil del remitente o del autor interno)
+- por dominio, para remitentes desconocidos de empresas conocidas
+  (perfil agregado de los remitentes de ese dominio); los dominios de
+  correo público (PUBLIC_DOMAINS: gmail.com, hotmail.com...) no tienen
+  perfil por dominio
+
+Cada REFRESH_INTERVAL segundos compara una versión barata de las tablas
+(filas y último id de sender_profiles; filas, emails y último visto de
+internal_author_profiles). Si cambió, se recarga todo; si no, solo se
+releen los perfiles con updated_at posterior a la última lectura (los
+que tocó el aprendizaje continuo) y los dominios afectados. La caché de emails exactos es LRU y acotada a MAX_ENTRIES:
+si la tabla no cabe, un email que no está en memoria se busca una vez en
+la BD y el resultado (incluso "no existe") queda en la caché.
+
+stats() expone aciertos, fallos, consultas a la BD y antigüedad de los
+datos (segundos desde la última verificación de versión).
+
+Uso:
+    from learning.profile_cache import get_profile_cache
+    cache = get_profile_cache()
+    match = cache.lookup(email_data['sender_email'])
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func
+
+from database.connection import session_scope
+from database.models import SenderProfile, InternalAuthorProfile
+from learning.aggregates import extract_address
+
+logger = logging.getLogger(__name__)
+
+
+MAX_ENTRIES = int(os.getenv('PROFILE_CACHE_SIZE', '10000'))
+REFRESH_INTERVAL = float(os.getenv('PROFILE_CACHE_REFRESH_SECONDS', '60'))
+
+# Dominios de correo público: sus remitentes no comparten un perfil
+PUBLIC_DOMAINS = frozenset(
+    domain.strip().lower() for domain in os.getenv(
+        'PROFILE_PUBLIC_DOMAINS',
+        'gmail.com,googlemail.com,hotmail.com,hotmail.es,outlook.com,outlook.es,live.com,'
+        'msn.com,yahoo.com,yahoo.es,icloud.com,me.com,aol.com,protonmail.com,proton.me,gmx.com'
+    ).split(',') if domain.strip()
+)
+
+SENDER_COLUMNS = (
+    SenderProfile.email, SenderProfile.domain, SenderProfile.empresa,
+    SenderProfile.category, SenderProfile.inferred_intent, SenderProfile.typical_action,
+    SenderProfile.typical_urgency, SenderProfile.avg_response_time_hours,
+    SenderProfile.emails_analyzed, SenderProfile.confidence_score,
+)
+
+INTERNAL_COLUMNS = (
+    InternalAuthorProfile.email, InternalAuthorProfile.role,
+    InternalAuthorProfile.avg_response_minutes, InternalAuthorProfile.emails_analyzed,
+    InternalAuthorProfile.threads_participated,
+)
+
+
+def _domain_of(email: str) -> str:
+    return email.split('@', 1)[1] if '@' in email else ''
+
+
+def _sender_profile(row) -> Dict:
+    email, domain, empresa, category, intent, action, urgency, hours, total, confidence = row
+    return {
+        'kind': 'sender',
+        'email': email.lower(),
+        'domain': (domain or _domain_of(email)).lower(),
+        'empresa': empresa,
+        'category': category,
+        'inferred_intent': intent,
+        'typical_action': action,
+        'typical_urgency': urgency,
+        'avg_response_time_hours': float(hours) if hours is not None else None,
+        'emails_analyzed': total or 0,
+        'confidence_score': confidence or 0.0,
+    }
+
+
+def _internal_profile(row) -> Dict:
+    email, role, minutes, total, threads = row
+    return {
+        'kind': 'internal',
+        'email': email.lower(),
+        'domain': _domain_of(email).lower(),
+        'role': role,
+        'avg_response_minutes': minutes,
+        'emails_analyzed': total or 0,
+        'threads_participated': threads or 0,
+    }
+
+
+def _domain_profiles(profiles: Iterable[Dict]) -> Dict[str, Dict]:
+    """
+    Perfil agregado por dominio (sin los dominios de PUBLIC_DOMAINS)
+
+    Urgencia, intención y categoría son las más frecuentes ponderadas por
+    emails_analyzed; la confianza es la media ponderada multiplicada por
+    la fracción de emails que coincide con la urgencia elegida.
+    """
+    groups = defaultdict(list)
+    for profile in profiles:
+        if profile['domain'] and profile['domain'] not in PUBLIC_DOMAINS:
+            groups[(profile['kind'], profile['domain'])].append(profile)
+
+    result = {}
+    # Los perfiles externos tienen prioridad sobre los internos del mismo dominio
+    for (kind, domain), members in sorted(groups.items(), key=lambda item: item[0][0] == 'sender'):
+        weights = [max(p['emails_analyzed'], 1) for p in members]
+        total = sum(weights)
+
+        def weighted_mode(field):
+            counts = Counter()
+            for profile, weight in zip(members, weights):
+                if profile.get(field):
+                    counts[profile[field]] += weight
+            return counts.most_common(1)[0] if counts else (None, 0)
+
+        summary = {'kind': kind, 'email': None, 'domain': domain,
+                   'emails_analyzed': sum(p['emails_analyzed'] for p in members),
+                   'profiles': len(members)}
+
+        if kind == 'sender':
+            urgency, agreeing = weighted_mode('typical_urgency')
+            confidence = sum(p['confidence_score'] * w for p, w in zip(members, weights)) / total
+            timed = [(p['avg_response_time_hours'], w) for p, w in zip(members, weights)
+                     if p['avg_response_time_hours'] is not None]
+            summary.update({
+                'empresa': members[0]['empresa'],
+                'category': weighted_mode('category')[0],
+                'inferred_intent': weighted_mode('inferred_intent')[0],
+                'typical_action': weighted_mode('typical_action')[0],
+                'typical_urgency': urgency,
+                'avg_response_time_hours': (sum(h * w for h, w in timed) / sum(w for _, w in timed)
+                                            if timed else None),
+                'confidence_score': confidence * agreeing / total,
+            })
+        else:
+            summary['role'] = weighted_mode('role')[0]
+
+        result[domain] = summary
+    return result
+
+
+class ProfileCache:
+    """Perfiles por email y por dominio, precargados y refrescados por versión"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, refresh_interval: float = REFRESH_INTERVAL):
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.RLock()
+        self._by_email: 'OrderedDict[str, Optional[Dict]]' = OrderedDict()
+        self._by_domain: Dict[str, Dict] = {}
+        self._complete = False
+        self._version = None
+        self._watermark = None   # mayor updated_at de sender_profiles leído
+        self._loaded_at = None
+        self._checked_at = None
+        self._counters = Counter()
+
+    # =========================================================================
+    # CARGA
+    # =========================================================================
+
+    def preload(self) -> int:
+        """
+        Carga ambas tablas en memoria (dos consultas)
+
+        Returns:
+            Número de perfiles cargados por email
+        """
+        with session_scope() as session:
+            version = self._read_version(session)
+            watermark = session.query(func.max(SenderProfile.updated_at)).scalar()
+            profiles = [_sender_profile(row) for row in session.query(*SENDER_COLUMNS)]
+            profiles += [_internal_profile(row) for row in session.query(*INTERNAL_COLUMNS)]
+
+        profiles.sort(key=lambda profile: profile['emails_analyzed'], reverse=True)
+        by_email = OrderedDict()
+        # Los más activos al final del orden LRU (últimos en ser desalojados)
+        for profile in reversed(profiles[:self.max_entries]):
+            by_email[profile['email']] = profile
+
+        with self._lock:
+            self._by_email = by_email
+            self._by_domain = _domain_profiles(profiles)
+            self._complete = len(profiles) <= self.max_entries
+            self._version = version
+            self._watermark = watermark
+            self._loaded_at = self._checked_at = time.monotonic()
+            self._counters['reloads'] += 1
+
+        logger.info(f"🗂️ Caché de perfiles: {len(by_email)} perfiles, {len(self._by_domain)} dominios")
+        return len(by_email)
+
+    @staticmethod
+    def _read_version(session):
+        """
+        Versión barata de las tablas
+
+        En sender_profiles solo cuenta filas y último id: el aprendizaje
+        continuo actualiza emails_analyzed / updated_at en cada flush y eso
+        se resuelve con _refresh_changed(), sin recargar todo.
+        """
+        senders = session.query(
+            func.count(SenderProfile.id),
+            func.max(SenderProfile.id)
+        ).one()
+        internals = session.query(
+            func.count(InternalAuthorProfile.id),
+            func.sum(InternalAuthorProfile.emails_analyzed),
+            func.max(InternalAuthorProfile.last_seen)
+        ).one()
+        return tuple(senders) + tuple(internals)
+
+    def refresh_if_stale(self, force: bool = False) -> bool:
+        """
+        Recarga si la versión de las tablas cambió (como mucho cada refresh_interval)
+
+        Args:
+            force: Verificar la versión aunque no haya pasado el intervalo
+
+        Returns:
+            True si se recargaron los perfiles
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._version is None:
+                force = True
+            elif not force and now - self._checked_at < self.refresh_interval:
+                return False
+            # Evitar que otros hilos verifiquen al mismo tiempo
+            self._checked_at = now
+
+        try:
+            if self._version is not None:
+                with session_scope() as session:
+                    version = self._read_version(session)
+                    self._counters['version_checks'] += 1
+                    if version == self._version:
+                        self._refresh_changed(session)
+                        return False
+            self.preload()
+            return True
+        except Exception as e:
+            # Se siguen sirviendo los perfiles anteriores
+            self._counters['refresh_errors'] += 1
+            logger.warning(f"⚠️ No se pudo refrescar la caché de perfiles: {e}")
+            return False
+
+    def _refresh_changed(self, session):
+        """Relee los perfiles de remitentes actualizados desde la última lectura"""
+        query = session.query(*SENDER_COLUMNS, SenderProfile.updated_at)
+        if self._watermark is None:
+            query = query.filter(SenderProfile.updated_at.isnot(None))
+        else:
+            # >=: una fila escrita en el mismo instante que la marca no se pierde
+            query = query.filter(SenderProfile.updated_at >= self._watermark)
+        rows = query.all()
+        if not rows:
+            return
+
+        changed = [_sender_profile(row[:-1]) for row in rows]
+        watermark = max(row[-1] for row in rows)
+        with self._lock:
+            changed = [profile for profile in changed if self._by_email.get(profile['email']) != profile]
+        if not changed:
+            return
+        domains = {profile['domain'] for profile in changed} - PUBLIC_DOMAINS - {''}
+        by_domain = {}
+        if domains:
+            by_domain = _domain_profiles(
+                _sender_profile(row) for row in
+                session.query(*SENDER_COLUMNS).filter(SenderProfile.domain.in_(domains))
+            )
+
+        with self._lock:
+            for profile in changed:
+                if profile['email'] in self._by_email or self._complete:
+                    self._by_email[profile['email']] = profile
+            self._by_domain.update(by_domain)
+            self._watermark = watermark
+            self._counters['partial_refreshes'] += 1
+
+    # =========================================================================
+    # CONSULTAS
+    # =========================================================================
+
+    def lookup(self, sender: str) -> Optional[Dict]:
+        """
+        Perfil del remitente: exacto, o agregado de su dominio
+
+        Args:
+            sender: Campo From o dirección de email
+
+        Returns:
+            Dict con 'match' ('email' o 'domain') y 'profile', o None
+        """
+        address = extract_address(sender)
+        email = address.lower()
+        if not email:
+            return None
+
+        self.refresh_if_stale()
+
+        with self._lock:
+            if email in self._by_email:
+                self._by_email.move_to_end(email)
+                profile = self._by_email[email]
+                cached = True
+            else:
+                profile = None
+                cached = self._complete
+
+        if not cached:
+            profile = self._fetch(email, address)
+
+        if profile is not None:
+            self._counters['hits'] += 1
+            return {'match': 'email', 'profile': profile}
+
+        domain_profile = self._by_domain.get(_domain_of(email))
+        if domain_profile is not None:
+            self._counters['domain_hits'] += 1
+            return {'match': 'domain', 'profile': domain_profile}
+
+        self._counters['misses'] += 1
+        return None
+
+    def _fetch(self, email: str, address: str) -> Optional[Dict]:
+        """Busca un email que no cupo en la caché y guarda el resultado"""
+        self._counters['db_lookups'] += 1
+        try:
+            with session_scope() as session:
+                row = session.query(*SENDER_COLUMNS).filter(SenderProfile.email.in_({email, address})).first()
+                profile = _sender_profile(row) if row else None
+                if profile is None:
+                    row = session.query(*INTERNAL_COLUMNS).filter(
+                        InternalAuthorProfile.email.in_({email, address})
+                    ).first()
+                    profile = _internal_profile(row) if row else None
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo consultar el perfil de {email}: {e}")
+            return None
+
+        with self._lock:
+            self._by_email[email] = profile
+            self._by_email.move_to_end(email)
+            while len(self._by_email) > self.max_entries:
+                self._by_email.popitem(last=False)
+                self._counters['evictions'] += 1
+        return profile
+
+    def stats(self) -> Dict:
+        """
+        Métricas de la caché
+
+        Returns:
+            Dict con contadores, hit_rate y staleness_seconds
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            lookups = sum(counters.get(key, 0) for key in ('hits', 'domain_hits', 'misses'))
+            now = time.monotonic()
+            return {
+                **counters,
+                'entries': len(self._by_email),
+                'domains': len(self._by_domain),
+                'complete': self._complete,
+                'lookups': lookups,
+                'hit_rate': counters.get('hits', 0) / lookups if lookups else 0.0,
+                'domain_hit_rate': counters.get('domain_hits', 0) / lookups if lookups else 0.0,
+                'staleness_seconds': now - self._checked_at if self._checked_at else None,
+                'loaded_seconds_ago': now - self._loaded_at if self._loaded_at else None,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_profile_cache() -> ProfileCache:
+    """Instancia compartida por proceso (se precarga en la primera consulta)"""
+    return ProfileCache()
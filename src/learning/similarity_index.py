@@ -0,0 +1,300 @@
+"""
+Clasificación por similitud con emails históricos (índice local)
+
+Cada email se representa con un vector de n-gramas hasheados (palabras
+y pares de palabras del asunto y del cuerpo, tf sublineal, norma L2) en
+una matriz NumPy. Una consulta es un producto matriz-vector (coseno) y un
+top-k con argpartition: del orden de un milisegundo por email.
+
+Las etiquetas salen de tareas ya cerradas:
+- prioridad: la más alta entre las tareas del email
+- resultado: 'completada' si alguna se completó, 'cancelada' si todas
+  se cancelaron
+
+La predicción es un voto de los k vecinos ponderado por similitud; la
+confianza es el acuerdo del voto, reducida si el vecino más cercano no
+alcanza MATCH_SIMILARITY. EmailProcessor usa la predicción directamente si la confianza
+supera MIN_CONFIDENCE y en otro caso consulta a Gemini.
+
+Uso:
+    python scripts/build_similarity_index.py      # construir / actualizar
+
+    from learning.similarity_index import get_similarity_index
+    index = get_similarity_index()     # se recarga si el archivo cambió
+    prediction = index.predict(subject, body_text) if index else None
+"""
+
+import logging
+import os
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from database.models import EmailProcesado, Tarea, PRIORIDADES_TAREA
+
+logger = logging.getLogger(__name__)
+
+
+INDEX_PATH = os.getenv('SIMILARITY_INDEX_PATH', 'data/similarity_index.npz')
+DIMENSIONS = int(os.getenv('SIMILARITY_DIMENSIONS', '1024'))
+MAX_ITEMS = int(os.getenv('SIMILARITY_MAX_ITEMS', '20000'))
+TOP_K = int(os.getenv('SIMILARITY_TOP_K', '10'))
+MIN_CONFIDENCE = float(os.getenv('SIMILARITY_MIN_CONFIDENCE', '0.75'))
+REVIEW_CONFIDENCE = float(os.getenv('SIMILARITY_REVIEW_CONFIDENCE', '0.5'))
+# Similitud desde la cual el vecino más cercano se considera "el mismo tipo de
+# email"; por debajo, la confianza se reduce en proporción
+MATCH_SIMILARITY = float(os.getenv('SIMILARITY_MATCH', '0.35'))
+
+# El asunto pesa más que el cuerpo; el cuerpo se trunca (firmas, hilos citados)
+SUBJECT_WEIGHT = 2.0
+BODY_CHARS = 2000
+
+_TOKEN_RE = re.compile(r'\w+')
+
+RESULTADOS = ('completada', 'cancelada')
+
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or '').lower()) if len(t) > 1]
+
+
+def _features(text: str) -> List[str]:
+    """Palabras y pares de palabras consecutivas"""
+    words = _tokens(text)
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def vectorize(subject: str, body: str, dimensions: int = DIMENSIONS) -> np.ndarray:
+    """
+    Vector hasheado de un email
+
+    Args:
+        subject: Asunto
+        body: Cuerpo en texto plano
+        dimensions: Tamaño del vector
+
+    Returns:
+        Vector float32 de norma 1 (o ceros si no hay texto)
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for text, weight in ((subject, SUBJECT_WEIGHT), ((body or '')[:BODY_CHARS], 1.0)):
+        for feature in _features(text):
+            # crc32 es determinístico entre procesos (a diferencia de hash())
+            h = zlib.crc32(feature.encode('utf-8'))
+            vector[h % dimensions] += weight if h & 0x80000000 else -weight
+
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def labels_for(tareas: Sequence) -> Optional[Dict[str, str]]:
+    """
+    Etiquetas de un email a partir de sus tareas (None si alguna sigue abierta)
+
+    Args:
+        tareas: Secuencia de (prioridad, estado)
+    """
+    if not tareas or any(estado not in RESULTADOS for _, estado in tareas):
+        return None
+    prioridad = max((p or 'normal' for p, _ in tareas), key=PRIORIDADES_TAREA.index)
+    resultado = 'completada' if any(e == 'completada' for _, e in tareas) else 'cancelada'
+    return {'prioridad': prioridad, 'resultado': resultado}
+
+
+class SimilarityIndex:
+    """Vecinos más cercanos por coseno sobre vectores hasheados"""
+
+    def __init__(self, dimensions: int = DIMENSIONS):
+        self.dimensions = dimensions
+        self.vectors = np.zeros((0, dimensions), dtype=np.float32)
+        self.email_ids = np.zeros(0, dtype=np.int64)
+        self.prioridades = np.zeros(0, dtype='<U16')
+        self.resultados = np.zeros(0, dtype='<U16')
+
+    def __len__(self) -> int:
+        return len(self.email_ids)
+
+    # =========================================================================
+    # CONSTRUCCIÓN
+    # =========================================================================
+
+    def add(self, items: List[Dict]):
+        """
+        Agrega emails etiquetados
+
+        Args:
+            items: Dicts con email_id, subject, body_text, prioridad y resultado
+        """
+        if not items:
+            return
+        vectors = np.vstack([
+            vectorize(item['subject'], item['body_text'], self.dimensions) for item in items
+        ])
+        self.vectors = np.vstack([self.vectors, vectors])
+        self.email_ids = np.concatenate([self.email_ids, [item['email_id'] for item in items]])
+        self.prioridades = np.concatenate([self.prioridades, [item['prioridad'] for item in items]])
+        self.resultados = np.concatenate([self.resultados, [item['resultado'] for item in items]])
+
+    @classmethod
+    def build(cls, session, max_items: int = MAX_ITEMS, dimensions: int = DIMENSIONS,
+              batch_size: int = 1000) -> 'SimilarityIndex':
+        """
+        Construye el índice con los emails más recientes cuyas tareas están cerradas
+
+        Args:
+            session: Sesión de SQLAlchemy
+            max_items: Máximo de emails en el índice
+            dimensions: Tamaño de los vectores
+            batch_size: Filas por lote al leer de la BD
+
+        Returns:
+            SimilarityIndex
+        """
+        index = cls(dimensions)
+
+        tareas = {}
+        for email_id, prioridad, estado in session.query(
+            Tarea.email_id, Tarea.prioridad, Tarea.estado
+        ).filter(Tarea.email_id.isnot(None)).yield_per(batch_size):
+            tareas.setdefault(email_id, []).append((prioridad, estado))
+
+        labeled = {}
+        for email_id, items in tareas.items():
+            labels = labels_for(items)
+            if labels:
+                labeled[email_id] = labels
+        ids = sorted(labeled, reverse=True)[:max_items]
+
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            rows = session.query(
+                EmailProcesado.id, EmailProcesado.subject, EmailProcesado.body_text
+            ).filter(EmailProcesado.id.in_(chunk))
+            index.add([
+                {'email_id': email_id, 'subject': subject, 'body_text': body_text, **labeled[email_id]}
+                for email_id, subject, body_text in rows
+            ])
+
+        return index
+
+    # =========================================================================
+    # CONSULTAS
+    # =========================================================================
+
+    def neighbors(self, vector: np.ndarray, k: int = TOP_K):
+        """Índices y similitudes de los k vecinos más cercanos (orden descendente)"""
+        sims = self.vectors @ vector
+        k = min(k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return top, sims[top]
+
+    def predict(self, subject: str, body_text: str, k: int = TOP_K) -> Optional[Dict]:
+        """
+        Predice prioridad y resultado por voto de los k vecinos
+
+        Args:
+            subject: Asunto
+            body_text: Cuerpo en texto plano
+            k: Número de vecinos
+
+        Returns:
+            Dict con prioridad, resultado, confianza, similitud y email_id del
+            vecino más cercano; None si el índice está vacío o no hay texto
+        """
+        if not len(self):
+            return None
+        vector = vectorize(subject, body_text, self.dimensions)
+        if not vector.any():
+            return None
+
+        top, sims = self.neighbors(vector, k)
+        weights = np.clip(sims, 0.0, None)
+        total = weights.sum()
+        if not total:
+            return None
+
+        def vote(labels):
+            scores = {}
+            for label, weight in zip(labels[top], weights):
+                scores[label] = scores.get(label, 0.0) + float(weight)
+            best = max(scores, key=scores.get)
+            return str(best), scores[best] / float(total)
+
+        prioridad, acuerdo_prioridad = vote(self.prioridades)
+        resultado, acuerdo_resultado = vote(self.resultados)
+        similitud = float(sims[0])
+        confianza = min(acuerdo_prioridad, acuerdo_resultado) * min(similitud / MATCH_SIMILARITY, 1.0)
+
+        return {
+            'prioridad': prioridad,
+            'resultado': resultado,
+            'confianza': round(confianza, 3),
+            'similitud': round(similitud, 3),
+            'email_id': int(self.email_ids[top[0]]),
+        }
+
+    # =========================================================================
+    # PERSISTENCIA
+    # =========================================================================
+
+    def save(self, path: str = INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Archivo temporal + rename: un proceso en marcha nunca lee un índice a medias
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                vectors=self.vectors,
+                email_ids=self.email_ids,
+                prioridades=self.prioridades,
+                resultados=self.resultados,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> 'SimilarityIndex':
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(data['vectors'].shape[1])
+            index.vectors = data['vectors']
+            index.email_ids = data['email_ids']
+            index.prioridades = data['prioridades']
+            index.resultados = data['resultados']
+        return index
+
+
+# Índice cargado por proceso y mtime del archivo del que se leyó
+_loaded = {'mtime': None, 'index': None}
+_load_lock = threading.Lock()
+
+
+def get_similarity_index() -> Optional[SimilarityIndex]:
+    """
+    Índice compartido por proceso (None si no se ha construido)
+
+    Cada llamada compara el mtime del archivo: si build_similarity_index.py
+    lo reescribió, se vuelve a cargar (el modo --daemon toma el índice
+    nuevo sin reiniciar).
+    """
+    try:
+        mtime = os.stat(INDEX_PATH).st_mtime_ns
+    except OSError:
+        return None
+    if _loaded['mtime'] == mtime:
+        return _loaded['index']
+
+    with _load_lock:
+        if _loaded['mtime'] != mtime:
+            try:
+                index = SimilarityIndex.load(INDEX_PATH)
+                logger.info(f"🧭 Índice de similitud: {len(index)} emails etiquetados")
+            except Exception as e:
+                # Archivo a medio escribir o dañado: se reintenta cuando cambie
+                logger.warning(f"⚠️ No se pudo cargar el índice de similitud {INDEX_PATH}: {e}")
+                index = _loaded['index']
+            _loaded['mtime'], _loaded['index'] = mtime, index
+        return _loaded['index']
@@ -0,0 +1,256 @@
+"""
+Estructuras probabilísticas de memoria acotada para el análisis histórico
+
+- CountMinSketch: frecuencia aproximada (sobreestima, nunca subestima)
+- HeavyHitters: top-k de elementos más frecuentes sobre un Count-Min
+- HyperLogLog: cardinalidad aproximada (participantes distintos)
+- DistinctCounter: set exacto mientras es chico, HyperLogLog sobre ese tamaño
+
+Todas son combinables con merge() si comparten dimensiones, de modo que
+los agregados de cada shard (ver learning.aggregates) se pueden reducir,
+y serializables a JSON con to_dict() / from_dict() (checkpoints).
+El hash es determinístico (blake2b) y no depende de PYTHONHASHSEED, por
+lo que dos procesos distintos ubican un mismo elemento en las mismas celdas.
+"""
+
+import base64
+import hashlib
+import math
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+
+_MASK64 = (1 << 64) - 1
+
+
+def _hash64(item: str) -> int:
+    digest = hashlib.blake2b(item.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class CountMinSketch:
+    """Matriz depth x width de contadores"""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = [array('Q', bytes(8 * width)) for _ in range(depth)]
+
+    def _cells(self, item: str):
+        # Doble hashing: h1 + i * h2 (Kirsch–Mitzenmacher)
+        x = _hash64(item)
+        h1, h2 = x & 0xFFFFFFFF, (x >> 32) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, item: str, count: int = 1) -> int:
+        """Suma count al elemento y retorna su frecuencia estimada"""
+        estimate = None
+        for row, col in zip(self.table, self._cells(item)):
+            row[col] += count
+            estimate = row[col] if estimate is None else min(estimate, row[col])
+        return estimate
+
+    def estimate(self, item: str) -> int:
+        return min(row[col] for row, col in zip(self.table, self._cells(item)))
+
+    def merge(self, other: 'CountMinSketch') -> 'CountMinSketch':
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("CountMinSketch con dimensiones distintas")
+        for ours, theirs in zip(self.table, other.table):
+            for col, value in enumerate(theirs):
+                if value:
+                    ours[col] += value
+        return self
+
+    def to_dict(self) -> Dict:
+        return {
+            'width': self.width,
+            'depth': self.depth,
+            'table': [base64.b64encode(row.tobytes()).decode('ascii') for row in self.table]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CountMinSketch':
+        sketch = cls(data['width'], data['depth'])
+        for row, encoded in zip(sketch.table, data['table']):
+            row[:] = array('Q', base64.b64decode(encoded))
+        return sketch
+
+
+class HeavyHitters:
+    """
+    Top-k aproximado con la misma interfaz básica que Counter
+
+    Mantiene a lo más k candidatos; un elemento nuevo reemplaza al
+    candidato de menor frecuencia estimada si lo supera.
+    """
+
+    def __init__(self, k: int = 200, width: int = 2048, depth: int = 4):
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        self.candidates = {}
+        # Cota inferior del candidato más débil (las estimaciones solo crecen)
+        self._floor = 0
+
+    def add(self, item: str, count: int = 1):
+        estimate = self.sketch.add(item, count)
+
+        if item in self.candidates or len(self.candidates) < self.k:
+            self.candidates[item] = estimate
+            return
+
+        if estimate <= self._floor:
+            return
+
+        weakest = min(self.candidates, key=self.candidates.get)
+        self._floor = self.candidates[weakest]
+        if estimate > self._floor:
+            del self.candidates[weakest]
+            self.candidates[item] = estimate
+
+    def update(self, items: Iterable[str]):
+        """Cuenta cada elemento del iterable (como Counter.update)"""
+        for item in items:
+            self.add(item)
+
+    def merge(self, other: 'HeavyHitters') -> 'HeavyHitters':
+        self.sketch.merge(other.sketch)
+        pool = set(self.candidates) | set(other.candidates)
+        ranked = sorted(((self.sketch.estimate(item), item) for item in pool), reverse=True)
+        self.candidates = {item: estimate for estimate, item in ranked[:self.k]}
+        self._floor = 0
+        return self
+
+    def most_common(self, n: int = None) -> List[Tuple[str, int]]:
+        ranked = sorted(self.candidates.items(), key=lambda kv: (-kv[1], kv[0]))
+        return ranked if n is None else ranked[:n]
+
+    def to_dict(self) -> Dict:
+        return {'k': self.k, 'sketch': self.sketch.to_dict(), 'candidates': self.candidates}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'HeavyHitters':
+        hitters = cls(data['k'])
+        hitters.sketch = CountMinSketch.from_dict(data['sketch'])
+        hitters.candidates = dict(data['candidates'])
+        return hitters
+
+
+class HyperLogLog:
+    """
+    Conteo aproximado de elementos distintos en 2^precision bytes
+
+    Soporta add(), len() y |= como un set, para poder reemplazar
+    a los sets de participantes sin cambiar el código que los usa.
+    """
+
+    def __init__(self, precision: int = 8):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item: str):
+        x = _hash64(item)
+        index = x >> (64 - self.precision)
+        rest = (x << self.precision) & _MASK64
+        rank = 64 - rest.bit_length() + 1 if rest else 64 - self.precision + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        # Corrección de rango bajo (linear counting)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return estimate
+
+    def __len__(self) -> int:
+        return int(round(self.count()))
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        if self.precision != other.precision:
+            raise ValueError("HyperLogLog con precisión distinta")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def __ior__(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        return self.merge(other)
+
+    def to_dict(self) -> Dict:
+        return {
+            'precision': self.precision,
+            'registers': base64.b64encode(bytes(self.registers)).decode('ascii')
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'HyperLogLog':
+        hll = cls(data['precision'])
+        hll.registers = bytearray(base64.b64decode(data['registers']))
+        return hll
+
+
+class DistinctCounter:
+    """
+    Elementos distintos: exacto mientras son pocos, HyperLogLog después
+
+    Un hilo típico tiene 1-3 participantes; un HyperLogLog de precisión 8
+    (256 bytes) ocupa más que ese set. Se guarda el set hasta
+    `exact_max` elementos y solo al superarlo se pasa al sketch, así que
+    la memoria queda acotada sin perder exactitud en el caso común.
+    """
+
+    def __init__(self, exact_max: int = 16, precision: int = 8):
+        self.exact_max = exact_max
+        self.precision = precision
+        self.items = set()
+        self.hll = None
+
+    def _promote(self):
+        self.hll = HyperLogLog(self.precision)
+        for item in self.items:
+            self.hll.add(item)
+        self.items = set()
+
+    def add(self, item: str):
+        if self.hll is not None:
+            self.hll.add(item)
+            return
+        self.items.add(item)
+        if len(self.items) > self.exact_max:
+            self._promote()
+
+    def __len__(self) -> int:
+        return len(self.hll) if self.hll is not None else len(self.items)
+
+    def merge(self, other: 'DistinctCounter') -> 'DistinctCounter':
+        if other.hll is None:
+            for item in other.items:
+                self.add(item)
+            return self
+        if self.hll is None:
+            self._promote()
+        self.hll.merge(other.hll)
+        return self
+
+    def __ior__(self, other: 'DistinctCounter') -> 'DistinctCounter':
+        return self.merge(other)
+
+    def to_dict(self) -> Dict:
+        data = {'exact_max': self.exact_max, 'precision': self.precision}
+        if self.hll is not None:
+            data['hll'] = self.hll.to_dict()
+        else:
+            data['items'] = sorted(self.items)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DistinctCounter':
+        counter = cls(data['exact_max'], data['precision'])
+        if 'hll' in data:
+            counter.hll = HyperLogLog.from_dict(data['hll'])
+        else:
+            counter.items = set(data['items'])
+        return counter
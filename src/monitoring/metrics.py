@@ -0,0 +1,308 @@
+"""
+Métricas del pipeline (contadores, histogramas y gauges en memoria)
+
+Cada proceso acumula sus métricas en REGISTRY y las publica de dos formas:
+- formato de texto de Prometheus (render_prometheus), servido en /metrics
+- snapshots periódicos en log_sistema (modulo='metrics'), para que el
+  dashboard exponga también las métricas de los procesadores y workers,
+  que corren en otros procesos o máquinas
+
+Uso:
+    from monitoring.metrics import GMAIL_SECONDS, timed
+    with timed(GMAIL_SECONDS, operacion='list'):
+        ...
+"""
+
+import math
+import os
+import socket
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+SNAPSHOT_INTERVAL = float(os.getenv('METRICS_SNAPSHOT_SECONDS', '60'))
+SNAPSHOT_MAX_AGE = timedelta(minutes=int(os.getenv('METRICS_SNAPSHOT_MAX_AGE_MINUTES', '15')))
+SNAPSHOT_MODULE = 'metrics'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    tipo = ''
+
+    def __init__(self, name: str, ayuda: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.ayuda = ayuda
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._series: Dict[LabelValues, object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name}: se esperaban las etiquetas {self.labels}, no {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def series(self) -> List[Tuple[Dict[str, str], object]]:
+        with self._lock:
+            return [(dict(zip(self.labels, key)), value) for key, value in self._series.items()]
+
+
+class Counter(_Metric):
+    """Valor que solo crece (eventos, tokens, bytes)"""
+    tipo = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._series.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Valor instantáneo (profundidad de cola, tamaño de caché)"""
+    tipo = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def value(self, **labels) -> Optional[float]:
+        return self._series.get(self._key(labels))
+
+
+class Histogram(_Metric):
+    """Distribución de duraciones en buckets acumulados"""
+    tipo = 'histogram'
+
+    def __init__(self, name: str, ayuda: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, ayuda, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            data = self._series.get(key)
+            if data is None:
+                data = self._series[key] = {'counts': [0] * len(self.buckets), 'count': 0, 'sum': 0.0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data['counts'][i] += 1
+                    break
+            data['count'] += 1
+            data['sum'] += value
+
+    def series(self):
+        # Copia con buckets acumulados (le = límite superior inclusivo)
+        result = []
+        for labels, data in super().series():
+            acumulado, cumulative = 0, []
+            for count in data['counts']:
+                acumulado += count
+                cumulative.append(acumulado)
+            result.append((labels, {'buckets': cumulative, 'count': data['count'], 'sum': data['sum']}))
+        return result
+
+
+class Registry:
+    """Conjunto de métricas de un proceso"""
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+        self.instancia = f"{socket.gethostname()}:{os.getpid()}"
+        self._last_snapshot = 0.0
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, ayuda: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, ayuda, labels))
+
+    def gauge(self, name: str, ayuda: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, ayuda, labels))
+
+    def histogram(self, name: str, ayuda: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, ayuda, labels, buckets))
+
+    def snapshot(self) -> Dict:
+        """Estado serializable a JSON (detalles de log_sistema)"""
+        return {
+            'instancia': self.instancia,
+            'timestamp': datetime.now().isoformat(),
+            'metricas': {
+                name: {
+                    'tipo': metric.tipo,
+                    'ayuda': metric.ayuda,
+                    **({'le': list(metric.buckets)} if metric.tipo == 'histogram' else {}),
+                    'series': [{'labels': labels, 'valor': value} for labels, value in metric.series()],
+                }
+                for name, metric in self.metrics.items()
+            }
+        }
+
+
+REGISTRY = Registry()
+
+# =============================================================================
+# MÉTRICAS DEL PIPELINE
+# =============================================================================
+
+GMAIL_SECONDS = REGISTRY.histogram(
+    'bot_gmail_api_seconds', 'Latencia de llamadas a la fuente de correo', ['operacion'])
+GMAIL_ERRORS = REGISTRY.counter(
+    'bot_gmail_api_errors_total', 'Errores de llamadas a la fuente de correo', ['operacion'])
+API_RETRIES = REGISTRY.counter(
+    'bot_api_reintentos_total', 'Re-intentos por límite de tasa o error transitorio', ['api', 'codigo'])
+GMAIL_TOKEN_REFRESHES = REGISTRY.counter(
+    'bot_gmail_token_renovaciones_total', 'Renovaciones del token OAuth de Gmail', ['resultado'])
+ATTACHMENT_SECONDS = REGISTRY.histogram(
+    'bot_adjunto_parse_seconds', 'Tiempo de procesamiento de adjuntos por tipo', ['tipo'])
+GEMINI_SECONDS = REGISTRY.histogram(
+    'bot_gemini_seconds', 'Latencia de Gemini', ['resultado'])
+GEMINI_TOKENS = REGISTRY.counter(
+    'bot_gemini_tokens_total', 'Tokens de Gemini', ['tipo'])
+DB_TRANSACTION_SECONDS = REGISTRY.histogram(
+    'bot_db_transaccion_seconds', 'Duración de transacciones (session_scope)', ['resultado'])
+EMAIL_SECONDS = REGISTRY.histogram(
+    'bot_email_seconds', 'Tiempo total de procesamiento por email', ['resultado'])
+EMAILS_TOTAL = REGISTRY.counter(
+    'bot_emails_total', 'Emails procesados por resultado', ['resultado'])
+CYCLE_SECONDS = REGISTRY.histogram(
+    'bot_ciclo_seconds', 'Duración de cada ciclo del servicio', ['modo'],
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+QUEUE_DEPTH = REGISTRY.gauge(
+    'bot_cola_trabajos', 'Trabajos en cola_trabajos por estado', ['estado'])
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    """Observa la duración del bloque (también si lanza una excepción)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+# =============================================================================
+# EXPOSICIÓN
+# =============================================================================
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in sorted(labels.items())) + '}'
+
+
+def render_prometheus(snapshots: Iterable[Dict]) -> str:
+    """
+    Formato de texto de Prometheus (0.0.4) a partir de uno o más snapshots
+
+    Cada serie lleva la etiqueta 'instancia' del proceso que la midió.
+    """
+    families: Dict[str, Dict] = {}
+    for snapshot in snapshots:
+        for name, data in snapshot['metricas'].items():
+            family = families.setdefault(name, {**data, 'series': []})
+            for serie in data['series']:
+                family['series'].append(({**serie['labels'], 'instancia': snapshot['instancia']}, serie['valor']))
+
+    lines = []
+    for name, family in sorted(families.items()):
+        lines.append(f"# HELP {name} {family['ayuda']}")
+        lines.append(f"# TYPE {name} {family['tipo']}")
+        for labels, value in family['series']:
+            if family['tipo'] == 'histogram':
+                for bound, count in zip(list(family['le']) + [math.inf], value['buckets'] + [value['count']]):
+                    lines.append(f"{name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def record_snapshot(force: bool = False, registry: Registry = REGISTRY) -> bool:
+    """
+    Guarda el snapshot del proceso en log_sistema (como mucho cada SNAPSHOT_INTERVAL)
+
+    En la misma transacción elimina los snapshots (de cualquier instancia)
+    más antiguos que SNAPSHOT_MAX_AGE: latest_snapshots() no los usa y
+    log_sistema no crece con una fila por minuto y proceso.
+
+    Args:
+        force: Guardar aunque no haya pasado el intervalo (fin de ejecución)
+        registry: Registro a guardar
+
+    Returns:
+        True si se guardó
+    """
+    now = time.monotonic()
+    if not force and now - registry._last_snapshot < SNAPSHOT_INTERVAL:
+        return False
+    registry._last_snapshot = now
+
+    from database.connection import session_scope
+    from database.models import LogSistema
+
+    try:
+        with session_scope() as session:
+            session.add(LogSistema(
+                nivel='info',
+                modulo=SNAPSHOT_MODULE,
+                mensaje=f"Snapshot de métricas {registry.instancia}",
+                detalles=registry.snapshot()
+            ))
+            session.query(LogSistema).filter(
+                LogSistema.modulo == SNAPSHOT_MODULE,
+                LogSistema.timestamp < datetime.now() - SNAPSHOT_MAX_AGE
+            ).delete(synchronize_session=False)
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo guardar el snapshot de métricas: {e}")
+        return False
+
+
+def latest_snapshots(session, exclude: Optional[str] = None) -> List[Dict]:
+    """
+    Último snapshot de cada instancia en los últimos SNAPSHOT_MAX_AGE
+
+    Args:
+        session: Sesión de SQLAlchemy
+        exclude: Instancia a omitir (la del proceso que consulta)
+    """
+    from database.models import LogSistema
+
+    rows = session.query(LogSistema.detalles).filter(
+        LogSistema.modulo == SNAPSHOT_MODULE,
+        LogSistema.timestamp >= datetime.now() - SNAPSHOT_MAX_AGE
+    ).order_by(LogSistema.timestamp.desc(), LogSistema.id.desc())
+
+    latest = {}
+    for (detalles,) in rows:
+        if detalles and detalles.get('instancia') not in latest and detalles.get('instancia') != exclude:
+            latest[detalles['instancia']] = detalles
+    return list(latest.values())
@@ -0,0 +1,33 @@
+"""
+Configuración compartida de los tests
+
+Los módulos del proyecto se importan como en los scripts (src/ en el
+path: `from database.x import ...`). El fixture `db` inicializa el gestor
+global de conexión sobre un SQLite temporal (esquema desde los modelos)
+y lo libera al terminar el test.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Agregar src del proyecto al path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / 'src'))
+
+# Sin .env del desarrollador: cada test define la BD que usa
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from database.connection import db_manager
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Gestor de conexión sobre un SQLite vacío en tmp_path"""
+    db_manager.initialize(f"sqlite:///{tmp_path / 'test.db'}")
+    yield db_manager
+    db_manager.Session.remove()
+    db_manager.engine.dispose()
+    db_manager.engine = db_manager.session_factory = db_manager.Session = None
@@ -0,0 +1,130 @@
+import json
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from learning import aggregates
+from learning.aggregates import LearningAggregate, analyze_parallel
+
+
+def _emails():
+    def email(msg_id, sender, thread, date, subject='Pedido cobertor', **extra):
+        return {'id': msg_id, 'thread_id': thread, 'from': sender, 'to': 'ventas@usach.cl',
+                'cc': extra.get('cc', ''), 'subject': subject, 'date': date,
+                'in_reply_to': extra.get('in_reply_to', ''), 'references': '', 'labels': [],
+                'has_attachments': extra.get('has_attachments', False)}
+
+    return [
+        email('1', 'Cliente <cliente@agricola.cl>', 't1', 'Mon, 19 Oct 2026 09:00:00 -0300',
+              'URGENTE: cobertor roto', has_attachments=True),
+        email('2', 'Ventas <ventas@usach.cl>', 't1', 'Mon, 19 Oct 2026 10:30:00 -0300',
+              'Re: URGENTE: cobertor roto', in_reply_to='<1>', cc='a@usach.cl, b@usach.cl'),
+        email('3', 'cliente@agricola.cl', 't1', 'Mon, 19 Oct 2026 12:30:00 -0300',
+              'Re: URGENTE: cobertor roto', in_reply_to='<2>'),
+        email('4', 'otro@campo.cl', 't2', 'Tue, 20 Oct 2026 08:00:00 -0300', 'Cotización malla'),
+    ]
+
+
+def _summary(aggregate):
+    """Vista comparable del agregado (tras calcular tiempos de respuesta)"""
+    aggregate.compute_response_times()
+    return {
+        'emails': aggregate.emails,
+        'senders': {email: (s['total'], dict(s['urgency_counts']), s['response_count'],
+                            s['response_sum'], s['reply_count'], s['has_attachments'])
+                    for email, s in aggregate.sender_stats.items()},
+        'internals': {email: (s['total'], s['replied'], s['cc_count'], s['threads'], s['response_sum'])
+                      for email, s in aggregate.internal_stats.items()},
+        'threads': {thread: (s['messages'], len(s['participants']), s['has_cc'], s['start_time'], s['end_time'])
+                    for thread, s in aggregate.thread_stats.items()},
+    }
+
+
+@pytest.mark.parametrize('bounded', [False, True])
+def test_to_dict_from_dict_roundtrip(bounded):
+    aggregate = LearningAggregate('@usach.cl', bounded).add_emails(_emails())
+
+    # Pasa por JSON como en el checkpoint de learning_sessions
+    data = json.loads(json.dumps(aggregate.to_dict()))
+    restored = LearningAggregate.from_dict(data)
+
+    assert restored.bounded == bounded
+    assert _summary(restored) == _summary(aggregate)
+    if bounded:
+        assert restored.word_counts.most_common(3) == aggregate.word_counts.most_common(3)
+    else:
+        assert restored.word_counts == aggregate.word_counts
+
+
+def test_response_times():
+    summary = _summary(LearningAggregate('@usach.cl').add_emails(_emails()))
+
+    # 1.5 h hasta la respuesta interna y 2 h hasta la réplica del cliente
+    assert summary['senders']['cliente@agricola.cl'][2:5] == (1, 5400.0, 1)
+    assert summary['internals']['ventas@usach.cl'] == (1, 1, 2, 1, 5400.0)
+    assert summary['threads']['t1'][:3] == (3, 2, True)
+
+
+@pytest.mark.parametrize('bounded', [False, True])
+def test_restored_aggregate_keeps_accumulating(bounded):
+    emails = _emails()
+    whole = LearningAggregate('@usach.cl', bounded).add_emails(emails)
+
+    partial = LearningAggregate('@usach.cl', bounded).add_emails(emails[:2])
+    resumed = LearningAggregate.from_dict(json.loads(json.dumps(partial.to_dict())))
+    resumed.merge(LearningAggregate('@usach.cl', bounded).add_emails(emails[2:]))
+
+    assert _summary(resumed) == _summary(whole)
+
+
+def test_analyze_parallel_matches_single_process(monkeypatch):
+    # Un shard por email: ejercita el pool y el merge con hilos repartidos
+    monkeypatch.setattr(aggregates, 'MIN_EMAILS_PER_SHARD', 1)
+    emails = _emails()
+
+    parallel = analyze_parallel(emails, '@usach.cl', workers=2)
+
+    assert _summary(parallel) == _summary(LearningAggregate('@usach.cl').add_emails(emails))
+
+
+def test_bounded_thread_keeps_oldest_events_and_estimates_participants():
+    base = _emails()[0]
+    emails = [dict(base, id=str(i), **{'from': f'c{i}@agricola.cl'},
+                   date=f'Mon, 19 Oct 2026 {i // 60:02d}:{i % 60:02d}:00 -0300')
+              for i in reversed(range(aggregates.BOUNDED_THREAD_EVENTS + 30))]
+
+    thread = LearningAggregate('@usach.cl', bounded=True).add_emails(emails).thread_stats['t1']
+
+    assert thread['messages'] == len(emails)
+    assert len(thread['events']) == aggregates.BOUNDED_THREAD_EVENTS
+    assert thread['events'][0][1] == 'c0@agricola.cl'
+    assert thread['events'] == sorted(thread['events'])
+    # Sobre 16 participantes se estima con HyperLogLog (error ~6.5% con precisión 8)
+    assert len(thread['participants']) == pytest.approx(len(emails), rel=0.2)
+
+
+def test_merge_rejects_mixed_modes():
+    with pytest.raises(ValueError):
+        LearningAggregate('@usach.cl').merge(LearningAggregate('@usach.cl', bounded=True))
+
+
+def test_checkpoint_aggregate_compressed_and_legacy():
+    from learning.historical_scraper import HistoricalScraper, _unpack_aggregate
+
+    scraper = HistoricalScraper.__new__(HistoricalScraper)
+    scraper.aggregate = LearningAggregate('@usach.cl').add_emails(_emails())
+    scraper._query, scraper._page_token, scraper._last_id = 'after:2026/04/19', 'p2', '4'
+    scraper.session = mock.Mock()
+    learning_session = SimpleNamespace()
+
+    scraper._save_checkpoint(learning_session)
+    checkpoint = json.loads(json.dumps(learning_session.checkpoint))
+
+    assert isinstance(checkpoint['aggregate'], str)
+    restored = LearningAggregate.from_dict(_unpack_aggregate(checkpoint))
+    assert _summary(restored) == _summary(scraper.aggregate)
+
+    # Checkpoints anteriores: agregado como JSON plano
+    legacy = {'aggregate': json.loads(json.dumps(scraper.aggregate.to_dict()))}
+    assert _summary(LearningAggregate.from_dict(_unpack_aggregate(legacy))) == _summary(scraper.aggregate)
@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import pytest
+
+from database.bodies import compress_body, decompress_body, store_bodies, load_body, storage_report
+from database.connection import session_scope
+from database.models import EmailProcesado, EmailCuerpo
+
+
+HTML = '<html><body><p>Cotización malla antigranizo — 120 m ñandú</p>' + '<br>' * 500 + '</body></html>'
+
+
+@pytest.mark.parametrize('html', [HTML, '', 'á' * 10])
+def test_compress_roundtrip_zlib(html):
+    codec, data = compress_body(html, 'zlib')
+    assert codec == 'zlib'
+    assert decompress_body(codec, data) == html
+
+
+def test_compress_roundtrip_zstd():
+    pytest.importorskip('zstandard')
+    codec, data = compress_body(HTML, 'zstd')
+    assert codec == 'zstd'
+    assert decompress_body(codec, data) == HTML
+
+
+def test_decompress_empty():
+    assert decompress_body('zlib', None) == ''
+
+
+def _email(session, gmail_id):
+    email = EmailProcesado(gmail_id=gmail_id, sender_email='a@x.cl', subject='s',
+                           received_date=datetime(2026, 10, 19))
+    session.add(email)
+    session.flush()
+    return email.id
+
+
+def test_store_and_load_bodies(db):
+    with session_scope() as session:
+        first, second, empty = (_email(session, gmail_id) for gmail_id in ('g1', 'g2', 'g3'))
+        stored = store_bodies(session, [
+            {'email_id': first, 'body_html': HTML},
+            {'email_id': second, 'body_html': '<p>corto</p>'},
+            {'email_id': empty, 'body_html': ''},
+        ])
+    assert stored == 2
+
+    with session_scope() as session:
+        assert load_body(session, first) == HTML
+        assert load_body(session, second) == '<p>corto</p>'
+        assert load_body(session, empty) == ''
+
+        cuerpo = session.get(EmailCuerpo, first)
+        assert cuerpo.size_original == len(HTML.encode('utf-8'))
+        assert cuerpo.size_comprimido < cuerpo.size_original
+
+        report = storage_report(session)
+        assert report['cuerpos'] == 2
+        assert report['ratio'] > 1
+
+
+def test_store_bodies_replaces(db):
+    with session_scope() as session:
+        email_id = _email(session, 'g1')
+        store_bodies(session, [{'email_id': email_id, 'body_html': '<p>v1</p>'}])
+    with session_scope() as session:
+        store_bodies(session, [{'email_id': email_id, 'body_html': '<p>v2</p>'}])
+    with session_scope() as session:
+        assert load_body(session, email_id) == '<p>v2</p>'
+        assert session.query(EmailCuerpo).count() == 1
+
+
+def test_storage_report_empty(db):
+    with session_scope() as session:
+        assert storage_report(session) == {'cuerpos': 0, 'bytes_originales': 0, 'bytes_comprimidos': 0,
+                                           'ratio': None, 'por_codec': {}}
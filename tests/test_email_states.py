@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.email_states import (
+    transition, is_claimable, is_exhausted, is_stuck, InvalidTransition,
+    MAX_PROCESSING_ATTEMPTS, STUCK_AFTER
+)
+from database.models import EmailProcesado
+
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+def test_transition_to_processing_counts_attempt():
+    email = EmailProcesado(status='pending', attempts=0, error_message='anterior')
+
+    transition(email, 'processing', now=NOW)
+
+    assert email.status == 'processing'
+    assert email.attempts == 1
+    assert email.processing_started_at == NOW
+    assert email.status_changed_at == NOW
+    assert email.error_message is None
+
+
+def test_transition_error_then_retry():
+    email = EmailProcesado(status='pending', attempts=0)
+    transition(email, 'processing', now=NOW)
+    transition(email, 'error', error_message='x' * 6000, now=NOW)
+
+    assert email.status == 'error'
+    assert len(email.error_message) == 5000
+
+    transition(email, 'processing', now=NOW)
+    assert email.attempts == 2
+
+
+def test_transition_final_sets_processed_date():
+    email = EmailProcesado(status='processing', attempts=1)
+    transition(email, 'processed', now=NOW)
+    assert email.processed_date == NOW
+
+
+@pytest.mark.parametrize('current, new', [
+    ('pending', 'processed'),
+    ('processed', 'processing'),
+    ('no_data', 'error'),
+    ('error', 'processed'),
+])
+def test_transition_rejects_invalid(current, new):
+    email = EmailProcesado(status=current, attempts=1)
+    with pytest.raises(InvalidTransition):
+        transition(email, new, now=NOW)
+    assert email.status == current
+
+
+def test_is_claimable():
+    stuck_since = NOW - STUCK_AFTER - timedelta(minutes=1)
+
+    assert is_claimable(None, None, None, NOW)
+    assert is_claimable('pending', 0, None, NOW)
+    assert is_claimable('error', MAX_PROCESSING_ATTEMPTS - 1, None, NOW)
+    assert not is_claimable('error', MAX_PROCESSING_ATTEMPTS, None, NOW)
+    assert not is_claimable('processing', 1, NOW, NOW)
+    assert is_claimable('processing', 1, stuck_since, NOW)
+    assert not is_claimable('processing', MAX_PROCESSING_ATTEMPTS, stuck_since, NOW)
+    assert not is_claimable('processed', 1, None, NOW)
+    assert not is_claimable('no_data', 1, None, NOW)
+
+
+def test_is_stuck():
+    assert not is_stuck('processing', NOW - STUCK_AFTER, NOW)
+    assert is_stuck('processing', NOW - STUCK_AFTER - timedelta(seconds=1), NOW)
+    assert not is_stuck('error', NOW - timedelta(days=1), NOW)
+    assert not is_stuck('processing', None, NOW)
+
+
+def test_is_exhausted():
+    stuck_since = NOW - STUCK_AFTER - timedelta(minutes=1)
+
+    assert not is_exhausted('error', MAX_PROCESSING_ATTEMPTS - 1, None, NOW)
+    assert is_exhausted('error', MAX_PROCESSING_ATTEMPTS, None, NOW)
+    assert is_exhausted('processing', MAX_PROCESSING_ATTEMPTS, stuck_since, NOW)
+    assert not is_exhausted('processing', MAX_PROCESSING_ATTEMPTS, NOW, NOW)
+    assert not is_exhausted('processed', MAX_PROCESSING_ATTEMPTS, None, NOW)
@@ -0,0 +1,27 @@
+import pytest
+
+from learning.keyword_classifier import classify_text, is_urgent
+
+
+@pytest.mark.parametrize('text', [
+    'URGENTE: cobertor roto',
+    'Pedidos urgentes para mañana',
+    'Favor responder urgentemente',
+    'Urgencia cobertor cuartel 15',
+    'Repuestos críticos sin stock',
+])
+def test_urgent_inflections(text):
+    assert is_urgent(text)
+    assert classify_text(text)['urgency'] == 'critica'
+
+
+@pytest.mark.parametrize('text', ['Consulta malla antigranizo', 'Sin urgencias', 'insurgente'])
+def test_not_urgent(text):
+    # Palabra completa: 'urgencias' e 'insurgente' no son keywords
+    assert not is_urgent(text)
+
+
+def test_classify_defaults_and_intents():
+    assert classify_text('Cotización malla') == {'urgency': 'media', 'intent': 'cotizacion',
+                                                 'action': 'crear_tarea'}
+    assert classify_text('') == {'urgency': 'media', 'intent': 'otro', 'action': 'crear_tarea'}
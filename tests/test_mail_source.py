@@ -0,0 +1,56 @@
+import base64
+from email.message import EmailMessage
+
+import pytest
+
+from gmail_capture.mail_source import LocalMailSource, ROOT_ATTACHMENT_ID, PARSED_CACHE_SIZE
+from gmail_capture.mime import walk_payload
+
+
+@pytest.fixture
+def eml_dir(tmp_path):
+    # Mensaje que es en sí mismo el adjunto (parte raíz sin partId)
+    root = EmailMessage()
+    root['From'] = 'a@agricola.cl'
+    root['Subject'] = 'Orden'
+    root['Date'] = 'Mon, 19 Oct 2026 10:00:00 -0300'
+    root.set_content(b'RAIZ', maintype='application', subtype='pdf', filename='orden.pdf')
+    (tmp_path / 'a.eml').write_bytes(bytes(root))
+
+    multipart = EmailMessage()
+    multipart['From'] = 'b@agricola.cl'
+    multipart['Subject'] = 'Planilla'
+    multipart['Date'] = 'Mon, 19 Oct 2026 11:00:00 -0300'
+    multipart.set_content('Adjunto planilla')
+    multipart.add_attachment(b'HIJO', maintype='application', subtype='pdf', filename='hijo.pdf')
+    (tmp_path / 'b.eml').write_bytes(bytes(multipart))
+    return tmp_path
+
+
+def _attachments(source):
+    found = {}
+    for item in source.list_messages()['messages']:
+        payload = source.get_message(item['id'])['payload']
+        for attachment in walk_payload(payload, bodies=False)['attachments']:
+            data = source.get_attachment(item['id'], attachment['attachment_id'])['data']
+            found[attachment['filename']] = (attachment['attachment_id'], base64.urlsafe_b64decode(data))
+    return found
+
+
+def test_root_and_child_attachment_ids(eml_dir):
+    found = _attachments(LocalMailSource(str(eml_dir)))
+
+    assert found['orden.pdf'] == (ROOT_ATTACHMENT_ID, b'RAIZ')
+    assert found['hijo.pdf'] == ('1', b'HIJO')
+
+
+def test_parsed_cache_is_per_instance(eml_dir):
+    first, second = LocalMailSource(str(eml_dir)), LocalMailSource(str(eml_dir))
+    msg_id = first.list_messages()['messages'][0]['id']
+
+    first.get_message(msg_id)
+
+    assert list(first._parsed_cache) == [msg_id]
+    assert not second._parsed_cache
+    assert first._parsed(msg_id) is first._parsed(msg_id)
+    assert len(first._parsed_cache) <= PARSED_CACHE_SIZE
@@ -0,0 +1,81 @@
+import base64
+
+from gmail_capture.mime import html_to_text, walk_payload
+
+
+def _b64(text, charset='utf-8'):
+    return base64.urlsafe_b64encode(text.encode(charset)).decode('ascii')
+
+
+def _part(part_id, mime_type, data=None, filename='', charset=None, attachment_id=None):
+    headers = []
+    if charset:
+        headers.append({'name': 'Content-Type', 'value': f'{mime_type}; charset="{charset}"'})
+    body = {'size': 10}
+    if attachment_id:
+        body['attachmentId'] = attachment_id
+    elif data is not None:
+        body['data'] = data
+    return {'partId': part_id, 'mimeType': mime_type, 'filename': filename,
+            'headers': headers, 'body': body}
+
+
+def test_walk_payload_text_html_and_attachments():
+    payload = {
+        'partId': '', 'mimeType': 'multipart/mixed', 'filename': '', 'headers': [], 'body': {'size': 0},
+        'parts': [
+            {'partId': '0', 'mimeType': 'multipart/alternative', 'filename': '', 'headers': [],
+             'body': {'size': 0}, 'parts': [
+                 _part('0.0', 'text/plain', _b64('Cuartel 15, ñandú')),
+                 _part('0.1', 'text/html', _b64('<p>Cuartel 15</p>')),
+             ]},
+            _part('1', 'application/pdf', filename='orden.pdf', attachment_id='ATT1'),
+            _part('2', 'text/csv', _b64('a;b\n1;2'), filename='datos.csv'),
+        ]
+    }
+
+    result = walk_payload(payload)
+
+    assert result['body_text'] == 'Cuartel 15, ñandú'
+    assert result['body_html'] == '<p>Cuartel 15</p>'
+    assert [a['filename'] for a in result['attachments']] == ['orden.pdf', 'datos.csv']
+    pdf, csv = result['attachments']
+    assert pdf['attachment_id'] == 'ATT1' and pdf['part_id'] == '1'
+    assert pdf['mime_type'] == 'application/pdf'
+    # Adjunto chico inline: viene con data, sin attachmentId
+    assert csv['attachment_id'] is None and csv['data']
+
+
+def test_walk_payload_html_only_and_charset():
+    payload = _part('', 'text/html', _b64('<p>Reparación</p><br>malla', 'latin-1'), charset='iso-8859-1')
+
+    result = walk_payload(payload)
+
+    assert result['body_html'] == '<p>Reparación</p><br>malla'
+    assert 'Reparación' in result['body_text'] and 'malla' in result['body_text']
+    assert '<p>' not in result['body_text']
+
+
+def test_walk_payload_without_bodies():
+    payload = {
+        'partId': '', 'mimeType': 'multipart/mixed', 'filename': '', 'headers': [], 'body': {'size': 0},
+        'parts': [
+            _part('0', 'text/plain', _b64('hola')),
+            _part('1', 'text/plain', attachment_id='ATT2'),
+        ]
+    }
+
+    result = walk_payload(payload, bodies=False)
+
+    assert result['body_text'] == '' and result['body_html'] == ''
+    assert [a['filename'] for a in result['attachments']] == ['adjunto_1.txt']
+
+
+def test_html_to_text_drops_hidden_content():
+    html = ('<html><head><title>t</title><style>p {color: red}</style></head><body>'
+            '<!-- firma --><script>alert(1)</script>'
+            '<p>Pedido&nbsp;de &amp; malla</p><table><tr><td>Cuartel</td><td>15</td></tr></table>'
+            '<div>  </div><br><br>Saludos</body></html>')
+
+    assert html_to_text(html) == 'Pedido de & malla\nCuartel 15\nSaludos'
+    assert html_to_text('') == ''
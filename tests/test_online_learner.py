@@ -0,0 +1,147 @@
+import time
+
+import pytest
+
+from database.connection import session_scope
+from database.models import SenderProfile, LearnedRule
+from learning.online_learner import OnlineLearner, rule_name_for
+from learning.profile_cache import ProfileCache
+
+
+@pytest.fixture
+def learner(db):
+    # Sin flush automático: cada test decide cuándo escribir
+    return OnlineLearner(flush_every=10 ** 9, flush_interval=10 ** 9)
+
+
+def _profile(email):
+    with session_scope() as session:
+        profile = session.query(SenderProfile).filter(SenderProfile.email == email).one()
+        session.expunge(profile)
+        return profile
+
+
+def test_repeated_flushes_keep_consistency(learner):
+    # Mitad 'critica', mitad 'media': la consistencia es 0.5 en cada flush
+    for _ in range(4):
+        for subject in ('URGENTE cobertor roto', 'consulta malla'):
+            learner.observe_email('Cliente <c@agricola.cl>', subject)
+        learner.flush()
+
+    profile = _profile('c@agricola.cl')
+    assert profile.emails_analyzed == 8
+    assert sum(profile.urgency_counts.values()) == 8
+    assert profile.urgency_counts[profile.typical_urgency] == 4
+    assert profile.confidence_score == pytest.approx(min(0.5 * 8 / 10, 1.0))
+
+
+def _emails_analyzed():
+    with session_scope() as session:
+        return dict(session.query(SenderProfile.email, SenderProfile.emails_analyzed))
+
+
+def test_typical_urgency_follows_counts(learner):
+    for _ in range(3):
+        learner.observe_email('c@agricola.cl', 'URGENTE cobertor roto')
+    learner.flush()
+    assert _profile('c@agricola.cl').typical_urgency == 'critica'
+
+    for _ in range(4):
+        learner.observe_email('c@agricola.cl', 'consulta malla')
+    learner.flush()
+
+    profile = _profile('c@agricola.cl')
+    assert profile.typical_urgency == 'media'
+    assert profile.inferred_intent == max(profile.intent_counts, key=profile.intent_counts.get)
+
+
+def test_new_senders_wait_for_minimum_and_internal_are_skipped(learner):
+    learner.observe_email('Jefe <jefe@usach.cl>', 'URGENTE revisar pedido')
+    for _ in range(2):
+        learner.observe_email('nuevo@campo.cl', 'consulta malla')
+        learner.observe_email('unico@x.cl', 'consulta malla')
+        learner.flush()
+    learner.observe_email('unico@x.cl', 'consulta malla')
+    learner.flush()
+
+    # unico@x.cl llega a 3 entre flushes; nuevo@campo.cl sigue en espera
+    assert _emails_analyzed() == {'unico@x.cl': 3}
+
+    learner.observe_email('nuevo@campo.cl', 'consulta malla')
+    learner.flush()
+    assert _emails_analyzed() == {'unico@x.cl': 3, 'nuevo@campo.cl': 3}
+
+
+def test_flush_refreshes_cache_without_full_reload(learner):
+    with session_scope() as session:
+        session.add(SenderProfile(email='c@agricola.cl', domain='agricola.cl', typical_urgency='media',
+                                  emails_analyzed=5, confidence_score=0.5))
+    cache = ProfileCache(refresh_interval=10 ** 9)
+    cache.preload()
+
+    learner.observe_email('c@agricola.cl', 'URGENTE cobertor roto')
+    learner.observe_email('una.vez@otro.cl', 'URGENTE cobertor roto')
+    learner.flush()
+
+    assert cache.refresh_if_stale(force=True) is False
+    stats = cache.stats()
+    assert stats['reloads'] == 1 and stats['partial_refreshes'] == 1
+    assert cache.lookup('c@agricola.cl')['profile']['emails_analyzed'] == 6
+
+
+def test_legacy_profile_seeded_from_confidence(learner):
+    with session_scope() as session:
+        session.add(SenderProfile(email='old@x.cl', typical_urgency='alta',
+                                  emails_analyzed=20, confidence_score=0.6))
+
+    learner.observe_email('old@x.cl', 'consulta malla')
+    learner.flush()
+
+    profile = _profile('old@x.cl')
+    assert profile.emails_analyzed == 21
+    # confianza 0.6 → 6 emails 'alta' (cota inferior)
+    assert profile.urgency_counts['alta'] == 6
+    assert profile.typical_urgency == 'alta'
+
+
+def test_state_flip_counts_once(learner):
+    with session_scope() as session:
+        session.add(LearnedRule(rule_name=rule_name_for('c@agricola.cl'), rule_type='sender'))
+
+    learner.record_outcome('c@agricola.cl', 'completada', 'pendiente')
+    learner.flush()
+    learner.record_outcome('c@agricola.cl', 'cancelada', 'completada')
+    learner.flush()
+
+    with session_scope() as session:
+        rule = session.query(LearnedRule).one()
+        assert (rule.times_resolved, rule.success_rate) == (1, 0.0)
+
+    learner.record_outcome('c@agricola.cl', 'pendiente', 'cancelada')
+    learner.record_outcome('c@agricola.cl', 'en_proceso', 'pendiente')   # sin efecto
+    learner.flush()
+
+    with session_scope() as session:
+        rule = session.query(LearnedRule).one()
+        assert (rule.times_resolved, rule.success_rate) == (0, 0.0)
+
+
+def test_background_thread_flushes_outcomes(db):
+    with session_scope() as session:
+        session.add(LearnedRule(rule_name=rule_name_for('c@agricola.cl'), rule_type='sender'))
+
+    # flush_every alto: solo el hilo puede escribir el resultado
+    learner = OnlineLearner(flush_every=10 ** 9, flush_interval=0.5)
+    learner.start()
+    try:
+        learner.record_outcome('c@agricola.cl', 'completada', 'pendiente')
+        assert learner._pending == 1
+        deadline = time.monotonic() + 5
+        while learner._pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not learner._pending
+    finally:
+        learner.stop()
+
+    with session_scope() as session:
+        assert session.query(LearnedRule.times_resolved).scalar() == 1
@@ -0,0 +1,66 @@
+import pytest
+
+from learning.priority_scorer import (
+    PRIORITY_BANDS, RESPONSE_BONUS, URGENCY_SCORE, priority_band, score_email
+)
+
+
+class FakeCache:
+    """ProfileCache con perfiles fijos (sin BD)"""
+
+    def __init__(self, **matches):
+        self.matches = matches
+
+    def lookup(self, sender):
+        return self.matches.get(sender)
+
+
+def _match(urgency, confidence, match='email', kind='sender', hours=None):
+    return {'match': match, 'profile': {'kind': kind, 'typical_urgency': urgency,
+                                        'confidence_score': confidence,
+                                        'avg_response_time_hours': hours}}
+
+
+@pytest.mark.parametrize('score, prioridad', [
+    (100, 'urgente'), (90, 'urgente'), (89, 'alta'), (60, 'alta'), (59, 'normal'), (30, 'normal'), (0, 'baja'),
+])
+def test_priority_band(score, prioridad):
+    assert priority_band(score) == prioridad
+    assert PRIORITY_BANDS[-1] == ('baja', 0)
+
+
+def test_keywords_without_profile():
+    cache = FakeCache()
+    assert score_email('URGENTE: cobertor roto', 'a@x.cl', cache) == \
+        {'score': 100, 'prioridad': 'urgente', 'fuente': 'keywords'}
+    assert score_email('Consulta malla', 'a@x.cl', cache)['score'] == URGENCY_SCORE['media']
+
+
+def test_profile_raises_score_by_confidence():
+    cache = FakeCache(**{'a@x.cl': _match('critica', 1.0), 'b@x.cl': _match('critica', 0.5),
+                         'c@x.cl': _match('critica', 1.0, match='domain')})
+
+    assert score_email('Consulta malla', 'a@x.cl', cache) == \
+        {'score': 100, 'prioridad': 'urgente', 'fuente': 'perfil'}
+    # 0.5 * 100 + 0.5 * 40
+    assert score_email('Consulta malla', 'b@x.cl', cache)['score'] == 70
+    # Perfil por dominio: la confianza cuenta la mitad
+    assert score_email('Consulta malla', 'c@x.cl', cache)['score'] == 70
+
+
+def test_profile_never_lowers_keyword_score():
+    cache = FakeCache(**{'a@x.cl': _match('baja', 1.0), 'ventas@usach.cl': _match(None, 1.0, kind='internal')})
+
+    assert score_email('URGENTE: cobertor roto', 'a@x.cl', cache)['fuente'] == 'keywords'
+    assert score_email('Consulta malla', 'a@x.cl', cache)['score'] == URGENCY_SCORE['media']
+    # Los perfiles internos no aportan
+    assert score_email('Consulta malla', 'ventas@usach.cl', cache)['fuente'] == 'keywords'
+
+
+def test_fast_response_history_adds_bonus():
+    cache = FakeCache(**{'rapido@x.cl': _match('alta', 1.0, hours=0.0), 'medio@x.cl': _match('alta', 1.0, hours=12.0),
+                         'lento@x.cl': _match('alta', 1.0, hours=48.0)})
+
+    assert score_email('Consulta malla', 'rapido@x.cl', cache)['score'] == URGENCY_SCORE['alta'] + RESPONSE_BONUS
+    assert score_email('Consulta malla', 'medio@x.cl', cache)['score'] == URGENCY_SCORE['alta'] + RESPONSE_BONUS // 2
+    assert score_email('Consulta malla', 'lento@x.cl', cache)['score'] == URGENCY_SCORE['alta']
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.connection import session_scope
+from database.models import SenderProfile, InternalAuthorProfile
+from learning.profile_cache import ProfileCache
+
+BEFORE = datetime(2026, 10, 19, 9, 0)
+
+
+def _sender(email, urgency='media', total=10, confidence=0.8, **extra):
+    return SenderProfile(email=email, domain=email.split('@')[1], empresa=email.split('@')[1].split('.')[0],
+                         typical_urgency=urgency, emails_analyzed=total, confidence_score=confidence,
+                         updated_at=BEFORE, **extra)
+
+
+@pytest.fixture
+def cache(db):
+    with session_scope() as session:
+        session.add_all([
+            _sender('a@agricola.cl', 'critica', total=30),
+            _sender('b@agricola.cl', 'media', total=10),
+            _sender('c@gmail.com', 'alta'),
+            InternalAuthorProfile(email='ventas@usach.cl', role='ventas', emails_analyzed=50),
+        ])
+    cache = ProfileCache(refresh_interval=10 ** 9)
+    cache.preload()
+    return cache
+
+
+def test_lookup_by_email_and_domain(cache):
+    assert cache.lookup('Cliente <a@agricola.cl>')['profile']['typical_urgency'] == 'critica'
+    assert cache.lookup('ventas@usach.cl')['profile']['kind'] == 'internal'
+
+    match = cache.lookup('nuevo@agricola.cl')
+    assert match['match'] == 'domain'
+    profile = match['profile']
+    # Urgencia ponderada por emails: 30 'critica' contra 10 'media'
+    assert (profile['typical_urgency'], profile['emails_analyzed'], profile['profiles']) == ('critica', 40, 2)
+    assert profile['confidence_score'] == pytest.approx(0.8 * 30 / 40)
+
+    assert cache.stats()['domain_hits'] == 1
+
+
+def test_public_domains_have_no_domain_profile(cache):
+    assert cache.lookup('c@gmail.com')['match'] == 'email'
+    assert cache.lookup('otro@gmail.com') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_partial_refresh_from_watermark(cache):
+    with session_scope() as session:
+        profile = session.query(SenderProfile).filter(SenderProfile.email == 'b@agricola.cl').one()
+        profile.typical_urgency, profile.emails_analyzed = 'critica', 60
+        profile.updated_at = BEFORE + timedelta(minutes=5)
+
+    assert cache.refresh_if_stale(force=True) is False
+    # Sin cambios nuevos: la fila en la marca de agua no se vuelve a aplicar
+    assert cache.refresh_if_stale(force=True) is False
+
+    stats = cache.stats()
+    assert (stats['reloads'], stats['partial_refreshes']) == (1, 1)
+    assert cache.lookup('b@agricola.cl')['profile']['emails_analyzed'] == 60
+    assert cache.lookup('x@agricola.cl')['profile']['emails_analyzed'] == 90
+
+
+def test_new_row_triggers_full_reload(cache):
+    with session_scope() as session:
+        session.add(_sender('d@campo.cl'))
+
+    assert cache.refresh_if_stale(force=True) is True
+    assert cache.lookup('d@campo.cl')['match'] == 'email'
+    assert cache.stats()['reloads'] == 2
+
+
+def test_lru_eviction_when_table_does_not_fit(db):
+    with session_scope() as session:
+        session.add_all([_sender(f'u{i}@campo{i}.cl', total=i + 1) for i in range(5)])
+    cache = ProfileCache(max_entries=3, refresh_interval=10 ** 9)
+
+    # Se precargan los 3 más activos
+    assert cache.preload() == 3
+    assert not cache.stats()['complete']
+
+    assert cache.lookup('u0@campo0.cl')['match'] == 'email'     # consulta a la BD
+    assert cache.lookup('u0@campo0.cl')['match'] == 'email'     # ya en memoria
+    assert cache.lookup('nadie@campo9.cl') is None              # el "no existe" también se guarda
+    assert cache.lookup('nadie@campo9.cl') is None
+
+    stats = cache.stats()
+    assert (stats['db_lookups'], stats['evictions'], stats['entries']) == (2, 2, 3)
+    # Los desalojados son los menos usados: u2 (el menos activo de la precarga) y u3
+    assert cache.lookup('u4@campo4.cl')['match'] == 'email'
+    assert cache.stats()['db_lookups'] == 2
@@ -0,0 +1,62 @@
+import pytest
+
+from learning.similarity_index import SimilarityIndex, labels_for
+
+
+def _item(email_id, subject, prioridad, resultado='completada', body='Cuartel 15, fundo Los Robles'):
+    return {'email_id': email_id, 'subject': subject, 'body_text': body,
+            'prioridad': prioridad, 'resultado': resultado}
+
+
+@pytest.fixture
+def index():
+    index = SimilarityIndex(dimensions=256)
+    index.add([
+        _item(1, 'Reparación cobertor roto', 'urgente'),
+        _item(2, 'Reparación cobertor roto cuartel norte', 'urgente'),
+        _item(3, 'Reparación cobertor dañado', 'urgente', 'cancelada'),
+        _item(4, 'Cotización malla antigranizo', 'baja', body='Precio por metro de malla'),
+    ])
+    return index
+
+
+def test_labels_for():
+    assert labels_for([('alta', 'completada'), ('urgente', 'cancelada')]) == \
+        {'prioridad': 'urgente', 'resultado': 'completada'}
+    assert labels_for([(None, 'cancelada')]) == {'prioridad': 'normal', 'resultado': 'cancelada'}
+    # Alguna tarea abierta: el email todavía no tiene etiqueta
+    assert labels_for([('alta', 'completada'), ('baja', 'pendiente')]) is None
+    assert labels_for([]) is None
+
+
+def test_predict_votes_by_similarity(index):
+    prediction = index.predict('Reparación cobertor roto', 'Cuartel 15, fundo Los Robles', k=3)
+
+    assert prediction['email_id'] == 1
+    assert prediction['similitud'] == pytest.approx(1.0, abs=1e-3)
+    assert (prediction['prioridad'], prediction['resultado']) == ('urgente', 'completada')
+    # Un vecino 'cancelada' de tres: el acuerdo en resultado limita la confianza
+    assert 0.5 < prediction['confianza'] < 1.0
+
+
+def test_predict_low_similarity_lowers_confidence(index):
+    close = index.predict('Cotización malla antigranizo', 'Precio por metro de malla', k=1)
+    far = index.predict('Cotización', 'Despacho de bins a bodega', k=1)
+
+    assert close['prioridad'] == 'baja' and close['confianza'] == pytest.approx(1.0)
+    assert far['confianza'] < close['confianza']
+
+
+def test_predict_without_data(index):
+    assert SimilarityIndex(dimensions=256).predict('Reparación cobertor', '') is None
+    assert index.predict('', '') is None
+
+
+def test_save_and_load(index, tmp_path):
+    path = str(tmp_path / 'indice.npz')
+    index.save(path)
+
+    loaded = SimilarityIndex.load(path)
+
+    assert len(loaded) == 4
+    assert loaded.predict('Reparación cobertor roto', '') == index.predict('Reparación cobertor roto', '')
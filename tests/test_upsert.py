@@ -0,0 +1,88 @@
+from datetime import date, datetime
+
+from database.connection import session_scope
+from database.models import SenderProfile, DailyStat, EmailProcesado
+from database.rollups import apply_increments
+from database.upsert import upsert
+
+
+def _profiles(session):
+    return {
+        p.email: (p.empresa, p.emails_analyzed)
+        for p in session.query(SenderProfile).order_by(SenderProfile.email)
+    }
+
+
+def test_upsert_inserts_and_updates(db):
+    with session_scope() as session:
+        upsert(session, SenderProfile, [
+            {'email': 'a@x.cl', 'empresa': 'X', 'emails_analyzed': 3},
+            {'email': 'b@y.cl', 'empresa': 'Y', 'emails_analyzed': 1},
+        ], index_elements=['email'], update_columns=['empresa'], increment_columns=['emails_analyzed'])
+
+    with session_scope() as session:
+        sent = upsert(session, SenderProfile, [
+            {'email': 'a@x.cl', 'empresa': 'X2', 'emails_analyzed': 2},
+            {'email': 'c@z.cl', 'empresa': 'Z', 'emails_analyzed': 5},
+        ], index_elements=['email'], update_columns=['empresa'], increment_columns=['emails_analyzed'])
+
+    assert sent == 2
+    with session_scope() as session:
+        assert _profiles(session) == {
+            'a@x.cl': ('X2', 5),
+            'b@y.cl': ('Y', 1),
+            'c@z.cl': ('Z', 5),
+        }
+
+
+def test_upsert_without_update_columns_ignores_duplicates(db):
+    with session_scope() as session:
+        upsert(session, SenderProfile, [{'email': 'a@x.cl', 'empresa': 'X'}], index_elements=['email'])
+    with session_scope() as session:
+        upsert(session, SenderProfile, [{'email': 'a@x.cl', 'empresa': 'otra'}], index_elements=['email'])
+        assert _profiles(session) == {'a@x.cl': ('X', 0)}
+
+
+def test_upsert_in_chunks(db):
+    rows = [{'email': f'u{i}@x.cl', 'emails_analyzed': 1} for i in range(25)]
+    with session_scope() as session:
+        assert upsert(session, SenderProfile, rows, index_elements=['email'], chunk_size=10) == 25
+    with session_scope() as session:
+        assert session.query(SenderProfile).count() == 25
+
+
+def test_upsert_empty(db):
+    with session_scope() as session:
+        assert upsert(session, SenderProfile, [], index_elements=['email']) == 0
+
+
+def test_daily_stats_increments_on_composite_key(db):
+    dia = date(2026, 10, 19)
+    with session_scope() as session:
+        apply_increments(session, {(dia, 'emails', ''): (2, 0.0), (dia, 'latencia', ''): (1, 30.0)})
+    with session_scope() as session:
+        apply_increments(session, {(dia, 'emails', ''): (3, 0.0), (dia, 'emails', 'alta'): (1, 0.0)})
+
+    with session_scope() as session:
+        rows = {(r.metrica, r.clave): (r.cantidad, r.suma) for r in session.query(DailyStat)}
+    assert rows == {('emails', ''): (5, 0.0), ('latencia', ''): (1, 30.0), ('emails', 'alta'): (1, 0.0)}
+
+
+def test_email_upsert_on_retry_keeps_processing_state(db):
+    def save(subject):
+        # Mismas columnas que EmailProcessor al registrar un email
+        upsert(session, EmailProcesado, [{
+            'gmail_id': 'g1', 'sender_email': 'a@x.cl', 'subject': subject,
+            'received_date': datetime(2026, 10, 19), 'status': 'pending', 'attempts': 0,
+        }], index_elements=['gmail_id'], update_columns=['subject'])
+
+    with session_scope() as session:
+        save('v1')
+    with session_scope() as session:
+        session.query(EmailProcesado).update({'status': 'processing', 'attempts': 1})
+    with session_scope() as session:
+        save('v2')
+
+    with session_scope() as session:
+        email = session.query(EmailProcesado).one()
+        assert (email.subject, email.status, email.attempts) == ('v2', 'processing', 1)
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+
+from database import work_queue
+from database.connection import session_scope
+from database.models import TrabajoCola
+
+
+def _email(gmail_id, **extra):
+    return {'gmail_id': gmail_id, 'subject': f'Asunto {gmail_id}',
+            'received_date': datetime(2026, 10, 19, 9, 30), **extra}
+
+
+def test_enqueue_ignores_duplicates(db):
+    with session_scope() as session:
+        work_queue.enqueue(session, [_email('a'), _email('b')])
+    with session_scope() as session:
+        work_queue.enqueue(session, [_email('a')])
+        assert session.query(TrabajoCola).count() == 2
+        assert work_queue.queued_states(session, ['a', 'c']) == {'a': 'pendiente'}
+
+
+def test_claim_priority_and_payload(db):
+    with session_scope() as session:
+        work_queue.enqueue(session, [_email('bajo', queue_priority=10), _email('alto', queue_priority=90)])
+
+    with session_scope() as session:
+        jobs = work_queue.claim(session, 'w1', limit=1)
+
+    assert [job['gmail_id'] for job in jobs] == ['alto']
+    assert jobs[0]['intentos'] == 1
+    # Las fechas vuelven como datetime
+    assert jobs[0]['email']['received_date'] == datetime(2026, 10, 19, 9, 30)
+
+    with session_scope() as session:
+        # Un trabajo en proceso no se vuelve a entregar
+        assert [job['gmail_id'] for job in work_queue.claim(session, 'w2', limit=5)] == ['bajo']
+        assert work_queue.claim(session, 'w3', limit=5) == []
+
+
+def test_claim_expired_lease(db):
+    with session_scope() as session:
+        work_queue.enqueue(session, [_email('a')])
+    with session_scope() as session:
+        job = work_queue.claim(session, 'muerto', lease_seconds=60)[0]
+
+    later = datetime.now() + timedelta(seconds=120)
+    with session_scope() as session:
+        retaken = work_queue.claim(session, 'w2', now=later)
+    assert [j['id'] for j in retaken] == [job['id']]
+    assert retaken[0]['intentos'] == 2
+
+    # El worker original ya no puede completarlo ni renovarlo
+    with session_scope() as session:
+        assert not work_queue.complete(session, job['id'], 'muerto')
+        assert not work_queue.renew(session, job['id'], 'muerto')
+        assert work_queue.renew(session, job['id'], 'w2')
+
+
+def test_fail_retries_with_backoff_then_fails(db):
+    with session_scope() as session:
+        work_queue.enqueue(session, [_email('a')], max_intentos=2)
+
+    with session_scope() as session:
+        job = work_queue.claim(session, 'w1')[0]
+        assert work_queue.fail(session, job['id'], 'w1', 'error 1', retry_seconds=30) == 'pendiente'
+        row = session.get(TrabajoCola, job['id'])
+        assert row.disponible_desde > datetime.now() + timedelta(seconds=25)
+
+    with session_scope() as session:
+        # En backoff: todavía no se entrega
+        assert work_queue.claim(session, 'w1') == []
+
+    later = datetime.now() + timedelta(seconds=60)
+    with session_scope() as session:
+        job = work_queue.claim(session, 'w1', now=later)[0]
+        assert work_queue.fail(session, job['id'], 'w1', 'error 2') == 'fallido'
+
+    with session_scope() as session:
+        assert work_queue.claim(session, 'w1', now=later + timedelta(days=1)) == []
+        assert work_queue.queue_stats(session)['fallido'] == 1
+        assert work_queue.queued_states(session, ['a']) == {'a': 'fallido'}
+
+
+def test_fail_requires_own_lease(db):
+    with session_scope() as session:
+        work_queue.enqueue(session, [_email('a')])
+    with session_scope() as session:
+        job = work_queue.claim(session, 'w1')[0]
+        assert work_queue.fail(session, job['id'], 'otro', 'x') is None
+
+
+def test_purge_completed(db):
+    with session_scope() as session:
+        work_queue.enqueue(session, [_email('viejo'), _email('nuevo')])
+    with session_scope() as session:
+        for job in work_queue.claim(session, 'w1', limit=2):
+            work_queue.complete(session, job['id'], 'w1')
+        session.query(TrabajoCola).filter(TrabajoCola.gmail_id == 'viejo').update(
+            {'completado_at': datetime.now() - timedelta(days=30)}
+        )
+
+    with session_scope() as session:
+        assert work_queue.purge_completed(session, older_than_days=7) == 1
+        assert list(work_queue.queued_states(session, ['viejo', 'nuevo'])) == ['nuevo']
+
+
+def test_payload_roundtrip_without_raw_message():
+    email = _email('a', raw_message={'payload': 'x' * 100}, sender_email='ñandú@campo.cl')
+
+    decoded = work_queue.decode_payload(work_queue.encode_payload(email))
+
+    assert 'raw_message' not in decoded
+    assert decoded == {k: v for k, v in email.items() if k != 'raw_message'}
+
+
+def test_queue_stats_by_state(db):
+    with session_scope() as session:
+        work_queue.enqueue(session, [_email('a'), _email('b'), _email('c')])
+    with session_scope() as session:
+        job = work_queue.claim(session, 'w1')[0]
+        work_queue.complete(session, job['id'], 'w1')
+        work_queue.claim(session, 'w1')
+
+    with session_scope() as session:
+        stats = work_queue.queue_stats(session)
+    assert (stats['pendiente'], stats['en_proceso'], stats['completado'], stats['fallido']) == (1, 1, 1, 0)
+    assert stats['pendiente_mas_antiguo_s'] >= 0